@@ -0,0 +1,91 @@
+# cascade.py
+"""
+段階的な解析（NLP_CASCADE=1）のベンチマーク。
+
+常にモデル全体で解析する場合と、ルール（段階 1）で兆候があった時だけ
+モデル全体で解析し直す場合を、同じ文章で比べる。
+
+- escalation: モデル全体で解析し直した割合
+- recall    : モデル全体の結果の EntitySpan（位置とラベル）のうち、段階的な解析でも得られた割合
+- extra     : 段階的な解析だけで得られた EntitySpan の数
+- ms/doc    : 1 件あたりの時間（段階 1 + 解析し直した分）
+
+兆候（NLP_CASCADE_SIGNALS）の組み合わせごとに表示する。
+既定のコーパスは個人情報を含む文章（tweets.txt）と、含まない文章（plain_posts.txt）。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.cascade
+    python -m bench.cascade --corpus bench/data/tweets.txt --repeat 5
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from nlp import processor
+from nlp.pipeline import get_nlp
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+PLAIN_CORPUS = Path(__file__).parent / "data" / "plain_posts.txt"
+
+ALL_SIGNALS = ("person", "age", "place", "proper_noun")
+
+
+def span_keys(spans):
+    return {(span.start, span.end, span.label) for span in spans}
+
+
+def per_doc(func, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", nargs="+", default=[CORPUS, PLAIN_CORPUS])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = list(dict.fromkeys(text for path in args.corpus for text in load_corpus(path)))
+    nlp = get_nlp()
+    processor.warm_up()
+
+    full_docs = {text: nlp(text) for text in texts}
+    rule_docs = {text: processor.rule_doc(text) for text in texts}
+    full = {text: span_keys(processor.diagnose_doc(text, full_docs[text])) for text in texts}
+    t_full = per_doc(lambda text: processor.diagnose_doc(text, nlp(text)), texts, args.repeat)
+
+    configs = [("all", frozenset(ALL_SIGNALS))] + [
+        (f"-{name}", frozenset(ALL_SIGNALS) - {name}) for name in ALL_SIGNALS
+    ]
+    total = sum(len(keys) for keys in full.values())
+    print(f"texts: {len(texts)}, spans (full model): {total}")
+    print(f"{'signals':<14} {'escalation':>10} {'recall':>8} {'extra':>6} {'ms/doc':>8}")
+    print(f"{'full model':<14} {1:>10.1%} {1:>8.1%} {0:>6} {t_full:>8.2f}")
+    for name, signals in configs:
+        escalated = {text for text in texts if processor.cascade_signals(rule_docs[text], signals)}
+        found = hits = 0
+        for text in texts:
+            doc = full_docs[text] if text in escalated else rule_docs[text]
+            keys = span_keys(processor.diagnose_doc(text, doc))
+            hits += len(keys & full[text])
+            found += len(keys - full[text])
+
+        def cascade(text):
+            doc = processor.rule_doc(text)
+            if processor.cascade_signals(doc, signals):
+                doc = nlp(text)
+            processor.diagnose_doc(text, doc)
+
+        t = per_doc(cascade, texts, args.repeat)
+        print(
+            f"{name:<14} {len(escalated) / len(texts):>10.1%} {hits / total if total else 1:>8.1%} "
+            f"{found:>6} {t:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
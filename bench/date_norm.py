@@ -0,0 +1,182 @@
+# date_norm.py
+"""
+nlp.date_norm.normalize_datetime のベンチマーク。
+
+規則版（現在の normalize_datetime）と、以前の dateparser だけの版を
+bench/data/dates.txt の日時表現で実行し、1件あたりの時間と
+解釈できた割合（カバー率）を比較する。両者の結果が違う表現も表示する。
+あわせて、祝日判定（以前のリスト走査と HolidayIndex）と
+繰り返しの予定の検出・展開の1件あたりの時間も表示する。
+
+最後に、繰り返しの予定を含む文章を NLP のパイプライン（processor.tweet_spans）に通し、
+date として is_repeated 付きで返るか、繰り返しでない文章（「日々の」「日毎に」）が
+繰り返しにならないかを確かめる（期待と違うものがあれば終了コード 1）。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.date_norm
+    python -m bench.date_norm --repeat 5 --show-all
+"""
+
+import argparse
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import dateparser
+from dateutil import parser
+
+from nlp import date_norm, date_rules, recurrence
+from nlp.jp_holidays import get_holiday_index
+from nlp.processor import BASE_ISO
+
+CORPUS = Path(__file__).parent / "data" / "dates.txt"
+
+
+# =============================
+# 比較用: 以前の dateparser だけの版
+# =============================
+def normalize_datetime_dateparser(text, now_iso):
+    """規則導入前の normalize_datetime と同じ処理（iso だけ返す）"""
+    now = parser.isoparse(now_iso)
+    en_text = date_norm.JP_TO_EN.get(text, text)
+    parsed = dateparser.parse(
+        en_text,
+        settings={
+            "TIMEZONE": "Asia/Tokyo",
+            "RETURN_AS_TIMEZONE_AWARE": True,
+            "RELATIVE_BASE": now,
+            "PREFER_DATES_FROM": "future"
+        }
+    )
+    return None if parsed is None else parsed.isoformat()
+
+
+def normalize_datetime_rules(text, now_iso):
+    result = date_norm.normalize_datetime(text, now_iso)
+    return None if result is None else result["iso"]
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def timed(func, texts, repeat):
+    results = [func(t, BASE_ISO) for t in texts]   # 初回の読み込みを計測から外す
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(t, BASE_ISO) for t in texts]
+    return results, (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def bench_holidays(n=20000):
+    """祝日判定の1件あたりの時間（以前の ISO 文字列のリストと HolidayIndex）"""
+    index = get_holiday_index()
+    days = [parser.isoparse(BASE_ISO) + timedelta(days=i % 730) for i in range(n)]
+    # 以前の形式: 全期間の祝日の ISO 文字列のリスト（1955 年〜、約 1000 件）
+    holiday_list = [d.isoformat() for y in range(1955, 2028) for d, _ in index.holidays(y)]
+
+    start = time.perf_counter()
+    old = [d.date().isoformat() in holiday_list for d in days]
+    t_list = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    new = [index.is_holiday(d) for d in days]
+    t_index = (time.perf_counter() - start) / n
+    return len(holiday_list), t_list, t_index, old == new
+
+
+def bench_recurrence(texts, repeat):
+    """繰り返しの予定の検出 + 直近 RECURRENCE_EXPAND 件の展開の1件あたりの時間"""
+    now = parser.isoparse(BASE_ISO)
+    repeated = [t for t in texts if recurrence.parse(t, now) is not None]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            rule = recurrence.parse(t, now)
+            if rule is not None:
+                rule.occurrences(now, date_norm.RECURRENCE_EXPAND)
+    return repeated, (time.perf_counter() - start) / (repeat * len(texts))
+
+
+# パイプライン経由で繰り返しの予定と判定されるべき (文章, date の表現)
+PIPELINE_CHECKS = [
+    ("毎週金曜の夜は渋谷のバーにいます", "毎週金曜の夜"),
+    ("毎朝7時に新宿駅を通る", "毎朝7時"),
+    ("毎月15日に病院に行く", "毎月15日"),
+    ("隔週土曜はジムで筋トレ", "隔週土曜"),
+    ("平日は会社に行っています", "平日"),
+]
+# 繰り返しの予定を含まない（is_repeated の date が 1 つも無いこと）
+PIPELINE_NEGATIVES = [
+    "日々の積み重ねが大事だよね",
+    "日毎に寒くなってきた",
+]
+
+
+def check_pipeline():
+    """
+    PIPELINE_CHECKS・PIPELINE_NEGATIVES を tweet_spans に通し、
+    期待と違ったもの（繰り返しの date にならなかった・なってしまった文章）を返す
+    """
+    from nlp import processor
+
+    def repeated_dates(text):
+        return [
+            span.text for span in processor.tweet_spans(text)
+            if span.label == "date" and span.value and span.value["is_repeated"]
+        ]
+
+    cases = [(text, expected) for text, expected in PIPELINE_CHECKS] + [(text, None) for text in PIPELINE_NEGATIVES]
+    failures = []
+    for text, expected in cases:
+        repeated = repeated_dates(text)
+        ok = expected in repeated if expected is not None else not repeated
+        print(f"  {'OK' if ok else 'NG'} {text:<20} 繰り返し: {repeated}")
+        if not ok:
+            failures.append(text)
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=3, help="コーパスを繰り返す回数")
+    ap.add_argument("--show-all", action="store_true", help="全表現の結果を表示する")
+    args = ap.parse_args()
+
+    texts = load_corpus()
+    old, t_old = timed(normalize_datetime_dateparser, texts, args.repeat)
+    new, t_new = timed(normalize_datetime_rules, texts, args.repeat)
+
+    now = parser.isoparse(BASE_ISO)
+    fallback = sum(
+        1 for t in texts if recurrence.parse(t, now) is None and date_rules.parse(t, now) is None
+    )
+
+    print(f"base              : {BASE_ISO}")
+    print(f"expressions       : {len(texts)}")
+    print(f"dateparser per call: {t_old * 1e6:.1f} us, coverage {sum(r is not None for r in old) / len(texts):.0%}")
+    print(f"rules      per call: {t_new * 1e6:.1f} us, coverage {sum(r is not None for r in new) / len(texts):.0%}")
+    print(f"speedup           : {t_old / t_new:.1f}x")
+    print(f"fallback          : {fallback} 件（規則で解釈できず dateparser に回った表現）")
+
+    holidays, t_list, t_index, same = bench_holidays()
+    repeated, t_rec = bench_recurrence(texts, args.repeat)
+    print(f"holiday list      : {t_list * 1e6:.2f} us/call（{holidays} 件のリスト）")
+    print(f"holiday index     : {t_index * 1e6:.2f} us/call, same result: {same}")
+    print(f"recurrence        : {t_rec * 1e6:.1f} us/call, {len(repeated)} 件が繰り返し")
+
+    print()
+    for text, a, b in zip(texts, old, new):
+        if args.show_all or a != b:
+            print(f"  {text:<14} dateparser={a}  rules={b}")
+
+    print()
+    print("pipeline（processor.tweet_spans）:")
+    if check_pipeline():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
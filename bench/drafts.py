@@ -0,0 +1,62 @@
+# drafts.py
+"""
+下書きの差分解析（services.drafts）のベンチマーク。
+
+コーパスの文章をつないだ下書きを 1 文字ずつ入力していく様子を再現し、
+入力のたびに全文を解析し直す場合（tweet_spans）と、変わった文だけを解析する場合
+（draft_spans）の 1 回あたりの時間を、下書きの長さごとに比べる。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.drafts
+    python -m bench.drafts --sentences 5 20 --keystrokes 40
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from nlp import batcher, processor
+from services import drafts
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+
+def keystrokes(text, count):
+    """text の後ろ count 文字を 1 文字ずつ入力した時の、入力のたびのテキスト"""
+    return [text[:i] for i in range(len(text) - count + 1, len(text) + 1)]
+
+
+def timed(func, versions):
+    times = []
+    for text in versions:
+        start = time.perf_counter()
+        func(text)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS)
+    ap.add_argument("--sentences", type=int, nargs="+", default=[2, 10, 40], help="下書きの文の数")
+    ap.add_argument("--keystrokes", type=int, default=30, help="入力を再現する文字数")
+    args = ap.parse_args()
+
+    texts = load_corpus(args.corpus)
+    batcher.BATCH_ENABLED = False   # 1 件ずつなので、まとめ処理の待ち時間を計測に入れない
+    processor.warm_up()
+
+    print(f"{'sentences':>9} {'chars':>6} {'full':>10} {'draft':>10} {'speedup':>8}")
+    for n in args.sentences:
+        draft = "".join(texts[i % len(texts)] + "\n" for i in range(n)).rstrip("\n")
+        versions = keystrokes(draft, min(args.keystrokes, len(draft)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            drafts.draft_spans(f"bench-{n}", versions[0])   # 入力を始める前の下書き
+            t_full = timed(processor.tweet_spans, versions)
+            t_draft = timed(lambda text: drafts.draft_spans(f"bench-{n}", text), versions)
+        print(f"{n:>9} {len(draft):>6} {t_full * 1000:>7.2f} ms {t_draft * 1000:>7.2f} ms {t_full / t_draft:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
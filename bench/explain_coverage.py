@@ -0,0 +1,48 @@
+# explain_coverage.py
+"""
+テンプレートの説明文（services.explain_templates）でどれだけの投稿をカバーできるかの集計。
+
+コーパス（既定: bench/data/tweets.txt、1 行 1 投稿）を解析・採点し、
+テンプレートで済む割合と、LLM に回る形の内訳を表示する。
+本番の割合は GET /stats/explain で確認できる。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.explain_coverage
+    python -m bench.explain_coverage --corpus exported_posts.txt
+"""
+
+import argparse
+from collections import Counter
+
+from nlp.processor import tweet_diagnosis_many
+from services import explain_templates, scoring
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS)
+    args = ap.parse_args()
+
+    texts = load_corpus(args.corpus)
+    uncovered = Counter()
+    for _, nlp_result in tweet_diagnosis_many(texts):
+        direct = scoring.direct_scores(nlp_result)
+        indirect = scoring.indirect_scores(nlp_result)
+        if explain_templates.render(nlp_result, direct, indirect) is None:
+            uncovered["+".join(explain_templates.result_shape(nlp_result))] += 1
+
+    stats = explain_templates.stats()
+    print(f"投稿数        : {len(texts)}")
+    print(f"テンプレート  : {stats['template']}（{stats['template_rate']:.1%}）")
+    print(f"LLM（形が対象外）: {stats['llm_uncovered']}")
+    print("テンプレートの形:")
+    for shape, n in sorted(stats["by_shape"].items(), key=lambda kv: -kv[1]):
+        print(f"  {shape:<20} {n}")
+    print("LLM に回った形:")
+    for shape, n in uncovered.most_common():
+        print(f"  {shape:<20} {n}")
+
+
+if __name__ == "__main__":
+    main()
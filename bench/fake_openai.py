@@ -0,0 +1,111 @@
+# fake_openai.py
+"""
+試験・負荷試験用の OpenAI 互換サーバー（POST /v1/chat/completions のみ）。
+
+固定の説明文を、指定した遅延をかけて返す。stream=true なら断片ごとに SSE で返す。
+外部 API に接続せずに services.gpt_cliant を動かすために使う。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.fake_openai --port 8001 --latency-ms 800 --fail-rate 0.1
+
+アプリ側は次の環境変数で向け先を変える:
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 gpt_api_key=dummy fastapi dev --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "わたしがチェックしたよ！この投稿には、あなたやお友だちを特定できそうな情報が含まれているみたい。"
+    "場所や日時は、組み合わせると生活のパターンが分かっちゃうことがあるの。"
+    "公開する前に、少しだけぼかしてみようね。"
+)
+
+
+def create_app(latency_ms=300, chunk_chars=8, fail_rate=0.0):
+    app = FastAPI(title="fake-openai")
+    app.state.requests = 0
+
+    def completion_id():
+        return f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        if random.random() < fail_rate:
+            return JSONResponse(status_code=500, content={"error": {"message": "fake failure", "type": "server_error"}})
+
+        model = body.get("model", "fake")
+        created = int(time.time())
+        cid = completion_id()
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency_ms / 1000)
+            return {
+                "id": cid,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": REPLY},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        pieces = [REPLY[i:i + chunk_chars] for i in range(0, len(REPLY), chunk_chars)]
+
+        async def events():
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(latency_ms / 1000 / len(pieces))
+                chunk = {
+                    "id": cid,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": piece} if i == 0 else {"content": piece},
+                        "finish_reason": None,
+                    }],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            done = {
+                "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--latency-ms", type=float, default=300, help="1 回の応答にかける時間")
+    ap.add_argument("--chunk-chars", type=int, default=8, help="stream 時の 1 断片の文字数")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="500 を返す割合（再試行の確認用）")
+    args = ap.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.chunk_chars, args.fail_rate), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# gazetteer.py
+"""
+nlp.gazeteer.lookup_place のベンチマーク。
+
+索引版（現在の lookup_place）と、以前の全件走査版を
+同じ問い合わせ集合で実行し、結果の一致と1件あたりの時間を比較する。
+あわせて、CSV を dict に読み込んだ場合とバイナリファイルを mmap した場合の
+読み込み時間とメモリ増加量（tracemalloc）も表示する。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.gazetteer
+    python -m bench.gazetteer --queries 500 --seed 1
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from rapidfuzz import fuzz
+
+from nlp import gazeteer
+from nlp import gazeteer_artifact
+
+
+# =============================
+# 比較用: 以前の全件走査版
+# =============================
+def lookup_place_linear(name, places):
+    """索引導入前の lookup_place と同じ処理"""
+    for place in places:
+        if name == place["name"]:
+            return {"category": place["category"]}
+
+    candidates = []
+    for place in places:
+        if place["category"] == "駅":
+            if name.endswith("駅") and place["name"] in name:
+                candidates.append(place)
+        elif place["category"] in ("病院", "観光地", "学校"):
+            if place["name"] in name or name in place["name"]:
+                candidates.append(place)
+        else:
+            if place["name"] in name:
+                candidates.append(place)
+
+    if candidates:
+        best_place = max(candidates, key=lambda p: fuzz.ratio(name, p["name"]))
+        return {"category": best_place["category"]}
+    return {"category": "不明"}
+
+
+# =============================
+# 問い合わせ集合
+# =============================
+def make_queries(places, n, seed):
+    """NER が出しそうな文字列を CSV の施設名から作る"""
+    rng = random.Random(seed)
+    names = [p["name"] for p in places]
+    queries = []
+    for _ in range(n):
+        name = rng.choice(names)
+        kind = rng.randrange(5)
+        if kind == 0:
+            queries.append(name)                             # 完全一致
+        elif kind == 1:
+            queries.append(name[: max(2, len(name) // 2)])   # 前半だけ
+        elif kind == 2:
+            queries.append("東京都" + name + "前")            # 前後に語が付く
+        elif kind == 3:
+            queries.append(name.rstrip("駅") + "駅")          # 駅名っぽく
+        else:
+            queries.append(rng.choice(["田中", "渋谷", "新宿御苑", "大阪城", "中央"]))
+    return queries
+
+
+def measure_load(func):
+    """func の実行時間と、実行後も残る Python オブジェクトのメモリ量を測る"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = func()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, current
+
+
+def timed(func, queries):
+    start = time.perf_counter()
+    results = [func(q) for q in queries]
+    return results, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--queries", type=int, default=300, help="問い合わせ件数")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    (places, categories), t_csv, mem_csv = measure_load(gazeteer.load_places)
+    queries = make_queries(places, args.queries, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gazetteer.bin")
+        checksum = gazeteer_artifact.source_checksum(gazeteer.CSV_SOURCES)
+        start = time.perf_counter()
+        gazeteer_artifact.build_artifact(places, categories, checksum, path)
+        t_build = time.perf_counter() - start
+        size = os.path.getsize(path)
+        _, t_open, mem_open = measure_load(
+            lambda: gazeteer_artifact.open_artifact(gazeteer.load_places, gazeteer.CSV_SOURCES, path)
+        )
+
+    gazeteer.get_index()  # 検索対象のファイルが古ければここで作り直しておく
+    linear, t_linear = timed(lambda q: lookup_place_linear(q, places), queries)
+    indexed, t_indexed = timed(gazeteer.lookup_place, queries)
+
+    mismatches = [(q, a, b) for q, a, b in zip(queries, linear, indexed) if a != b]
+
+    print(f"places            : {len(places)}")
+    print(f"queries           : {len(queries)}")
+    print(f"csv load          : {t_csv * 1000:.1f} ms, {mem_csv / 2**20:.1f} MiB")
+    print(f"artifact build    : {t_build * 1000:.1f} ms, {size / 1024:.0f} KiB on disk")
+    print(f"artifact open     : {t_open * 1000:.1f} ms, {mem_open / 1024:.1f} KiB")
+    print(f"linear   per call : {t_linear / len(queries) * 1e6:.1f} us")
+    print(f"indexed  per call : {t_indexed / len(queries) * 1e6:.1f} us")
+    print(f"speedup           : {t_linear / t_indexed:.1f}x")
+    print(f"mismatches        : {len(mismatches)}")
+    for q, a, b in mismatches[:10]:
+        print(f"  {q!r}: linear={a} indexed={b}")
+
+
+if __name__ == "__main__":
+    main()
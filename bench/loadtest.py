@@ -0,0 +1,145 @@
+# loadtest.py
+"""
+/analyze の負荷試験。
+
+NLP_EXECUTION_MODE=process のワーカー数を変えながら uvicorn を起動し、
+同時接続数を一定にしてリクエストを送り続け、requests/sec と遅延を表示する。
+説明文の生成（OpenAI）は固定文字列に差し替えるので、外部 API には接続しない。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.loadtest                      # ワーカー数 1,2,4,...,CPUコア数
+    python -m bench.loadtest --workers 1 4 8 --concurrency 32 --duration 20
+    python -m bench.loadtest --mode thread        # 比較用: 従来のスレッドプール
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+TEXTS = [
+    "明日の10時に渋谷駅で田中さんと待ち合わせ。連絡は090-1234-5678まで。",
+    "東京大学の近くのカフェでバイト中。23歳です。",
+    "来週の金曜は京都の清水寺に行く予定！",
+    "今日はいい天気ですね。",
+    "メールは taro.yamada@example.com にください。〒150-0002",
+]
+
+
+def stub_app():
+    """説明文の生成を固定文字列にした FastAPI アプリ（uvicorn --factory 用）"""
+    from services import gpt_cliant
+    import main
+
+    async def explain(*args, **kwargs):
+        return "（負荷試験用の説明文）"
+
+    gpt_cliant.gpt_function = lambda *args, **kwargs: "（負荷試験用の説明文）"
+    gpt_cliant.gpt_function_async = explain
+    return main.app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, workers, max_queue, quiet=False):
+    port = free_port()
+    env = dict(
+        os.environ,
+        NLP_EXECUTION_MODE=mode,
+        NLP_POOL_WORKERS=str(workers),
+        NLP_POOL_MAX_QUEUE=str(max_queue),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.loadtest:stub_app", "--factory",
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL if quiet else None,   # quiet: アプリのデバッグ出力を捨てる
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/health").status_code == 200:
+                break
+        except httpx.TransportError:
+            time.sleep(0.5)
+    else:
+        proc.kill()
+        raise RuntimeError("サーバーが起動しませんでした")
+    return proc, url
+
+
+def run_load(url, concurrency, duration):
+    """同時接続数 concurrency で duration 秒間リクエストを送る"""
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(n):
+        with httpx.Client(base_url=url, timeout=60) as client:
+            i = n
+            while time.monotonic() < stop_at:
+                start = time.perf_counter()
+                r = client.post("/analyze", json={"text": TEXTS[i % len(TEXTS)]})
+                elapsed = time.perf_counter() - start
+                with lock:
+                    statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                    if r.status_code == 200:
+                        latencies.append(elapsed)
+                i += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, statuses
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *[2 ** k for k in range(1, 8) if 2 ** k < cpus], cpus})
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=["process", "thread"], default="process")
+    ap.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=10.0, help="計測秒数")
+    ap.add_argument("--warmup", type=float, default=2.0, help="計測前に流す秒数")
+    ap.add_argument("--max-queue", type=int, default=None,
+                    help="NLP_POOL_MAX_QUEUE（既定は同時接続数。小さくすると 429 の挙動を確認できる）")
+    args = ap.parse_args()
+
+    print(f"mode={args.mode} concurrency={args.concurrency} duration={args.duration}s cpus={cpus}")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'status'}")
+    for workers in args.workers:
+        max_queue = args.concurrency if args.max_queue is None else args.max_queue
+        proc, url = start_server(args.mode, workers, max_queue)
+        try:
+            run_load(url, args.concurrency, args.warmup)
+            latencies, statuses = run_load(url, args.concurrency, args.duration)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+        rps = len(latencies) / args.duration
+        if len(latencies) >= 2:
+            q = statistics.quantiles(latencies, n=100)
+            p50, p95 = q[49] * 1000, q[94] * 1000
+        else:
+            p50 = p95 = float("nan")
+        print(f"{workers:>7} {rps:>8.1f} {p50:>8.1f} {p95:>8.1f} {statuses}")
+
+
+if __name__ == "__main__":
+    main()
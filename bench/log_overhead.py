@@ -0,0 +1,177 @@
+# log_overhead.py
+"""
+デバッグ出力（ログ）のコストのベンチマーク。
+
+tweet_diagnosis + スコア計算を複数スレッドから同時に呼び、1 件あたりの時間を
+ログの出し方ごとに比べる。spaCy の解析（10ms 前後）に埋もれないように、既定では
+解析済みの Doc を使う（--with-nlp で解析も含める）。
+
+- previous     : 以前の print / pprint.pprint（投稿文・抽出したテキストをそのまま出す）
+- debug_sync   : DEBUG を呼び出したスレッドで書き出す（LOG_QUEUE=0）
+- debug_queue  : DEBUG を QueueListener のスレッドで整形・書き出す（LOG_QUEUE=1）
+- debug_sampled: debug_queue のうち --sample-rate の割合のリクエストだけ出す
+- info         : 本番の設定（LOG_LEVEL=INFO。リクエストごとの整形・書き出しは無い）
+
+出力先は --sink のファイル（既定: 一時ファイル）。端末やパイプに出す場合はもっと遅くなる。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.log_overhead
+    python -m bench.log_overhead --concurrency 8 --repeat 50 --sample-rate 0.01
+    python -m bench.log_overhead --with-nlp
+"""
+
+import argparse
+import contextlib
+import logging
+import pprint
+import queue
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueListener
+
+from nlp import logs, processor
+from nlp.pipeline import get_nlp
+from nlp.spans import result_dict
+from services import scoring
+from bench.pipeline_profiles import CORPUS, load_corpus
+from bench.suite import summarize
+
+FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+
+
+# =============================
+# 比較用: 以前の版
+# =============================
+def pretty_print_previous(title, data):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    pprint.pprint(data)
+
+
+def scores_previous(nlp_result):
+    """以前の direct_scores / indirect_scores と同じ print を出してスコアを計算する"""
+    for name in ("direct_scores", "indirect_scores"):
+        print(f"--- {name} デバッグ開始 ---")
+        print(f"入力データ: {nlp_result}")
+        total = 0
+        for label in ("phone", "email", "person", "postal", "date", "age"):
+            count = nlp_result.get(label, [None, 0])[1]
+            total += count
+            print(f"ラベル: '{label}', 個数: {count}, 現在の合計: {total}")
+        print(f"最終的な生スコア: {total}")
+        print(f"最終スコア (上限100): {min(total, 100)}")
+        print(f"--- {name} デバッグ終了 ---\n")
+    return scoring.direct_scores(nlp_result), scoring.indirect_scores(nlp_result)
+
+
+def analyze_previous(text):
+    print({text})
+    spans = processor.tweet_spans(text)
+    pretty_print_previous("抽出されたエンティティ", spans)
+    final_results = result_dict(spans)
+    pretty_print_previous("最終結果", final_results)
+    return scores_previous(final_results)
+
+
+def analyze_current(text):
+    token = logs.start_request()
+    try:
+        nlp_result = processor.tweet_diagnosis(text)
+        return scoring.direct_scores(nlp_result), scoring.indirect_scores(nlp_result)
+    finally:
+        logs.end_request(token)
+
+
+# =============================
+# ログの設定
+# =============================
+@contextlib.contextmanager
+def logging_mode(mode, sink, sample_rate):
+    """mode のログ設定にする（終わったら元に戻す）"""
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level, logs.LOG_SAMPLE_RATE
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    listener = None
+
+    root.handlers = []
+    root.setLevel(logging.INFO if mode in ("info", "previous") else logging.DEBUG)
+    logs.LOG_SAMPLE_RATE = sample_rate if mode == "debug_sampled" else 1.0
+    if mode in ("debug_queue", "debug_sampled", "info"):
+        log_queue = queue.SimpleQueue()
+        root.addHandler(logs._DeferredQueueHandler(log_queue))
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+    else:
+        root.addHandler(handler)
+    try:
+        with contextlib.redirect_stdout(sink):
+            yield
+    finally:
+        if listener is not None:
+            listener.stop()
+        root.handlers, level, logs.LOG_SAMPLE_RATE = saved
+        root.setLevel(level)
+
+
+def run(func, texts, repeat, concurrency):
+    def timed(text):
+        t = time.perf_counter()
+        func(text)
+        return time.perf_counter() - t
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(func, texts))     # ウォームアップ
+        items = [text for _ in range(repeat) for text in texts]
+        start = time.perf_counter()
+        latencies = list(pool.map(timed, items))
+        return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS)
+    ap.add_argument("--repeat", type=int, default=50, help="コーパスを繰り返す回数")
+    ap.add_argument("--concurrency", type=int, default=8, help="同時に呼ぶスレッド数")
+    ap.add_argument("--sample-rate", type=float, default=0.01, help="debug_sampled で出す割合")
+    ap.add_argument("--sink", help="ログの出力先ファイル（既定: 一時ファイル）")
+    ap.add_argument("--with-nlp", action="store_true", help="spaCy の解析も含めて測る")
+    args = ap.parse_args()
+
+    texts = load_corpus(args.corpus)
+    processor.warm_up()
+    if not args.with_nlp:
+        docs = dict(zip(texts, get_nlp().pipe(texts)))
+        processor.parse_texts = lambda chunks: [docs[chunk] for chunk in chunks]
+    modes = {
+        "previous": analyze_previous,
+        "debug_sync": analyze_current,
+        "debug_queue": analyze_current,
+        "debug_sampled": analyze_current,
+        "info": analyze_current,
+    }
+
+    with (open(args.sink, "w", encoding="utf-8") if args.sink
+          else tempfile.TemporaryFile("w+", encoding="utf-8")) as sink:
+        results = {}
+        for mode, func in modes.items():
+            before = sink.tell()
+            with logging_mode(mode, sink, args.sample_rate):
+                results[mode] = run(func, texts, args.repeat, args.concurrency)
+            results[mode]["written_kib"] = (sink.tell() - before) / 1024
+
+    base = results["previous"]["mean_ms"]
+    print(f"texts: {len(texts)}, repeat: {args.repeat}, concurrency: {args.concurrency}", file=sys.stderr)
+    print(f"{'mode':<14} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'per s':>9} {'written KiB':>12}  vs previous")
+    for mode, r in results.items():
+        print(
+            f"{mode:<14} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['mean_ms']:>9.3f} "
+            f"{r['throughput_per_s']:>9.1f} {r['written_kib']:>12.1f}  {(r['mean_ms'] / base - 1) * 100:+.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# long_inputs.py
+"""
+長いテキストの分割（NLP_CHUNK_CHARS / NLP_CHAR_BUDGET、nlp/processor.py）のベンチマーク。
+
+コーパスの文章を改行でつないだ長さの違うテキストを作り、
+1 つの Doc として解析する場合（nlp(text)）と、文の区切りで分けて nlp.pipe でまとめて
+解析する場合（tweet_spans）の 1 件あたりの時間と、1 文字あたりの時間を比べる。
+recall は 1 つの Doc として解析した結果の EntitySpan（位置とラベル）のうち、分けても得られた割合
+（NLP_CHAR_BUDGET より後ろは NLP で解析しないので、上限を超える長さでは下がる）。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.long_inputs
+    NLP_CHUNK_CHARS=200 NLP_CHAR_BUDGET=10000 python -m bench.long_inputs --lengths 1000 10000
+"""
+
+import argparse
+import statistics
+import time
+
+from nlp import batcher, processor
+from nlp.pipeline import get_nlp
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+
+def span_keys(spans):
+    return {(span.start, span.end, span.label) for span in spans}
+
+
+def timed(func, text, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS)
+    ap.add_argument("--lengths", type=int, nargs="+", default=[200, 1000, 3000, 10000], help="テキストの文字数")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = load_corpus(args.corpus)
+    batcher.BATCH_ENABLED = False   # 1 件ずつなので、まとめ処理の待ち時間を計測に入れない
+    nlp = get_nlp()
+    processor.warm_up()
+
+    print(f"NLP_CHUNK_CHARS={processor.CHUNK_CHARS}, NLP_CHAR_BUDGET={processor.CHAR_BUDGET}")
+    print(f"{'chars':>6} {'chunks':>6} {'whole ms':>9} {'chunked ms':>10} {'whole µs/ch':>11} {'chunked µs/ch':>13} {'recall':>7}")
+    for length in args.lengths:
+        text = ""
+        i = 0
+        while len(text) < length:
+            text += texts[i % len(texts)] + "\n"
+            i += 1
+        text = text[:length]
+
+        t_whole, whole = timed(lambda t: processor.diagnose_doc(t, nlp(t)), text, args.repeat)
+        t_chunked, chunked = timed(processor.tweet_spans, text, args.repeat)
+        ref = span_keys(whole)
+        recall = len(ref & span_keys(chunked)) / len(ref) if ref else 1.0
+        chunks = len(processor.chunk_bounds(text[:processor.CHAR_BUDGET], processor.CHUNK_CHARS))
+        print(
+            f"{length:>6} {chunks:>6} {t_whole * 1000:>9.1f} {t_chunked * 1000:>10.1f} "
+            f"{t_whole / length * 1e6:>11.1f} {t_chunked / length * 1e6:>13.1f} {recall:>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# pipeline_profiles.py
+"""
+nlp.pipeline のモデル・プロファイルごとの比較。
+
+(モデル, プロファイル) ごとに別プロセスで NLP を読み込み、
+読み込み時間・メモリ増加量（RSS）・1件あたりの解析時間と、
+基準の組み合わせ（既定: 先頭の組み合わせ）に対するエンティティの再現率を表示する。
+インストールされていないモデルは読み飛ばす。
+
+1件あたりの時間は揺れが大きい（tok2vec だけで実行ごとに 2 割ほど変わる）ので、
+組み合わせの並びを --rounds 回くり返して交互に計測し、プロセス内でも --repeat 回の中央値をとる。
+表示するのは各組み合わせの中央値。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.pipeline_profiles
+    python -m bench.pipeline_profiles --configs ja_ginza_electra:full ja_ginza_electra:entities ja_ginza:entities
+    python -m bench.pipeline_profiles --configs ja_ginza:full ja_ginza:entities --rounds 5
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+CORPUS = Path(__file__).parent / "data" / "tweets.txt"
+
+DEFAULT_CONFIGS = [
+    "ja_ginza_electra:full",
+    "ja_ginza_electra:entities",
+    "ja_ginza:full",
+    "ja_ginza:entities",
+]
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def peak_rss_mib():
+    # Linux の ru_maxrss は KiB 単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(model, profile, repeat):
+    """1 つの組み合わせを計測して JSON を標準出力に書く（子プロセス側）"""
+    from nlp.pipeline import load_nlp
+
+    texts = load_corpus()
+    base_rss = peak_rss_mib()
+    start = time.perf_counter()
+    nlp = load_nlp(model, profile)
+    load_s = time.perf_counter() - start
+    load_rss = peak_rss_mib() - base_rss
+
+    list(nlp.pipe(texts[:4]))  # ウォームアップ
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        docs = [nlp(t) for t in texts]
+        rounds.append((time.perf_counter() - start) / len(texts) * 1000)
+    per_doc_ms = statistics.median(rounds)
+
+    ents = [[[e.start_char, e.end_char, e.label_] for e in doc.ents] for doc in docs]
+    print(json.dumps({
+        "model": model,
+        "profile": profile,
+        "pipe_names": nlp.pipe_names,
+        "load_s": load_s,
+        "rss_mib": load_rss,
+        "per_doc_ms": per_doc_ms,
+        "ents": ents,
+    }))
+
+
+def recall(reference, ents):
+    """基準のエンティティ (開始, 終了, ラベル) のうち、同じものが出た割合"""
+    ref = {(i, *e) for i, doc in enumerate(reference) for e in doc}
+    got = {(i, *e) for i, doc in enumerate(ents) for e in doc}
+    return len(ref & got) / len(ref) if ref else 1.0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, help="モデル:プロファイル の並び（先頭が基準）")
+    ap.add_argument("--repeat", type=int, default=5, help="プロセス内でコーパスを解析する回数")
+    ap.add_argument("--rounds", type=int, default=3, help="組み合わせの並びを交互に計測する回数")
+    ap.add_argument("--child", nargs=2, metavar=("MODEL", "PROFILE"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(*args.child, args.repeat)
+        return
+
+    runs = {config: [] for config in args.configs}
+    for _ in range(args.rounds):
+        for config in args.configs:
+            if runs[config] is None:
+                continue
+            model, profile = config.split(":")
+            proc = subprocess.run(
+                [sys.executable, "-m", "bench.pipeline_profiles", "--child", model, profile, "--repeat", str(args.repeat)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{config}: 読み飛ばし（{proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else '失敗'}）")
+                runs[config] = None
+                continue
+            runs[config].append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    results = []
+    for config_runs in runs.values():
+        if config_runs:
+            result = dict(config_runs[0])
+            for key in ("load_s", "rss_mib", "per_doc_ms"):
+                result[key] = statistics.median(r[key] for r in config_runs)
+            results.append(result)
+    if not results:
+        return
+    reference = results[0]
+    print(f"基準: {reference['model']}:{reference['profile']}（{len(load_corpus())} 件、{args.rounds} 回の中央値）")
+    print(f"{'config':<28} {'load s':>7} {'RSS MiB':>8} {'ms/doc':>7} {'recall':>7}  components")
+    for r in results:
+        config = f"{r['model']}:{r['profile']}"
+        print(
+            f"{config:<28} {r['load_s']:>7.2f} {r['rss_mib']:>8.0f} {r['per_doc_ms']:>7.2f} "
+            f"{recall(reference['ents'], r['ents']):>7.3f}  {','.join(r['pipe_names'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# prenorm.py
+"""
+spaCy に渡す前の正規化（NLP_PRENORM=1、nlp/prenorm.py）のベンチマーク。
+
+同じ文章を、そのまま解析する場合と、正規化してから解析する場合で比べる。
+
+- chars / tokens: 1 件あたりの文字数・トークン数（Sudachi。モデルに transformer があれば wordpiece も）
+- ms/doc       : 1 件あたりの時間（正規化する場合は正規化の時間を含む）
+- recall       : そのまま解析した結果の EntitySpan（位置とラベル）のうち、正規化しても得られた割合
+                 （URL・@メンションの中のものは除く）
+- masked       : そのまま解析した結果のうち、URL・@メンションの中にあった EntitySpan の数
+- extra        : 正規化した場合だけ得られた EntitySpan の数
+
+既定のコーパスは URL・@メンション・絵文字・繰り返しを含む文章（noisy_posts.txt）と tweets.txt。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.prenorm
+    python -m bench.prenorm --corpus bench/data/noisy_posts.txt --repeat 5
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from nlp import processor
+from nlp.pipeline import get_nlp
+from nlp.prenorm import prenormalize
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+NOISY_CORPUS = Path(__file__).parent / "data" / "noisy_posts.txt"
+
+
+def span_keys(spans):
+    return {(span.start, span.end, span.label) for span in spans}
+
+
+def in_masks(key, norm):
+    """元のテキストの位置の key が、置き換えた箇所（URL・@メンション）に重なるか"""
+    ranges = [norm.original_span(s, e) for s, e in norm.masks]
+    return any(s < key[1] and key[0] < e for s, e in ranges)
+
+
+def per_doc(func, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", nargs="+", default=[NOISY_CORPUS, CORPUS])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    nlp = get_nlp()
+    processor.warm_up()
+    wordpieces = None
+    if "transformer" in nlp.pipe_names:
+        tokenizer = nlp.get_pipe("transformer").model.tokenizer
+        wordpieces = lambda text: len(tokenizer(text)["input_ids"])
+
+    def plain(text):
+        return processor.diagnose_doc(text, nlp(text))
+
+    def normalized(text):
+        norm = prenormalize(text)
+        return processor.diagnose_doc(text, nlp(norm.text), norm)
+
+    print(
+        f"{'corpus':<18} {'':<8} {'chars':>6} {'tokens':>7} {'wp':>6} {'ms/doc':>7} "
+        f"{'recall':>7} {'masked':>7} {'extra':>6}"
+    )
+    for path in args.corpus:
+        texts = list(dict.fromkeys(load_corpus(path)))
+        norms = [prenormalize(text).text for text in texts]
+        base = {text: span_keys(plain(text)) for text in texts}
+        hits = extra = masked = total = 0
+        for text in texts:
+            norm = prenormalize(text)
+            keys = span_keys(normalized(text))
+            for key in base[text]:
+                if in_masks(key, norm):
+                    masked += 1
+                else:
+                    total += 1
+                    hits += key in keys
+            extra += len(keys - base[text])
+
+        rows = []
+        for name, inputs, func in (("raw", texts, plain), ("prenorm", norms, normalized)):
+            rows.append((
+                name,
+                statistics.fmean(len(t) for t in inputs),
+                statistics.fmean(len(nlp.make_doc(t)) for t in inputs),
+                statistics.fmean(wordpieces(t) for t in inputs) if wordpieces else None,
+                per_doc(func, texts, args.repeat),
+            ))
+        t_norm = per_doc(prenormalize, texts, args.repeat)
+
+        for name, chars, tokens, wp, ms in rows:
+            wp_text = f"{wp:>6.1f}" if wp is not None else f"{'-':>6}"
+            tail = f" {hits / total if total else 1:>7.1%} {masked:>7} {extra:>6}" if name == "prenorm" else ""
+            print(f"{Path(path).name:<18} {name:<8} {chars:>6.1f} {tokens:>7.1f} {wp_text} {ms:>7.2f}{tail}")
+        (_, chars0, tokens0, _, ms0), (_, chars1, tokens1, _, ms1) = rows
+        print(
+            f"{'':<18} {'diff':<8} {1 - chars1 / chars0:>6.1%} {1 - tokens1 / tokens0:>7.1%} {'':>6} "
+            f"{ms0 - ms1:>7.2f}  (正規化 {t_norm * 1000:.0f} µs/doc)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# regex_rules.py
+"""
+nlp.regex_rules.extract_all のベンチマーク。
+
+1 回の走査版（現在の extract_all）と、以前の findall を 3 回 + 郵便番号ごとに
+全電話番号と数字を比べる版を、AnalyzeReq の上限（10000 文字）の入力で比較する。
+
+入力の種類
+- tweets  : bench/data/tweets.txt をつないだ文章（連絡先がまばら）
+- contacts: 電話番号・郵便番号・メールを多く含む文章（以前の版は件数の 2 乗で遅くなる）
+- fullwidth: contacts を全角にしたもの（以前の版はほとんど検出できない）
+
+郵便番号の件数は、以前の版より多くなることがある。以前の版は、離れた場所の電話番号に
+同じ数字の並びが含まれるだけで郵便番号を除いていたが、今は位置が重なる場合だけ除く。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.regex_rules
+    python -m bench.regex_rules --chars 10000 --repeat 20
+"""
+
+import argparse
+import random
+import re
+import time
+
+from nlp import regex_rules
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+
+# =============================
+# 比較用: 以前の版
+# =============================
+def extract_all_previous(text):
+    """1 回の走査にする前の extract_all と同じ処理"""
+    emails = regex_rules.EMAIL_PATTERN.findall(text)
+    phones = regex_rules.PHONE_PATTERN.findall(text)
+    postals_raw = regex_rules.POSTAL_PATTERN.findall(text)
+    postals = [
+        p for p in postals_raw
+        if all(re.sub(r"\D", "", p) not in re.sub(r"\D", "", phone) for phone in phones)
+    ]
+    result = {}
+    if emails:
+        result["emails"] = emails
+        result["emails_count"] = len(emails)
+    if phones:
+        result["phones"] = phones
+        result["phones_count"] = len(phones)
+    if postals:
+        result["postals"] = postals
+        result["postals_count"] = len(postals)
+    return result or None
+
+
+# =============================
+# 入力
+# =============================
+def fill(parts, chars, rng):
+    """parts から無作為に選んでつなぎ、chars 文字にする"""
+    out, size = [], 0
+    while size < chars:
+        part = rng.choice(parts)
+        out.append(part)
+        size += len(part)
+    return "".join(out)[:chars]
+
+
+def make_inputs(chars, seed):
+    rng = random.Random(seed)
+    tweets = load_corpus(CORPUS)
+    contacts = [
+        f"電話は0{rng.randint(70, 90)}-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}です。"
+        for _ in range(50)
+    ] + [
+        f"〒{rng.randint(100, 999)}-{rng.randint(1000, 9999)} 東京都。" for _ in range(50)
+    ] + [
+        f"mail: user{i}@example.com " for i in range(50)
+    ]
+    dense = fill(contacts + tweets[:5], chars, rng)
+    fullwidth = dense.translate({c - 0xFEE0: c for c in range(0xFF01, 0xFF5F)})
+    return {"tweets": fill(tweets, chars, rng), "contacts": dense, "fullwidth": fullwidth}
+
+
+def timed(func, text, repeat):
+    func(text)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(text)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def counts(result):
+    result = result or {}
+    return tuple(result.get(k, 0) for k in ("emails_count", "phones_count", "postals_count"))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chars", type=int, default=10000, help="入力の文字数")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"{'input':<10} {'previous':>12} {'single pass':>12} {'speedup':>8}  counts (email, phone, postal)")
+    for name, text in make_inputs(args.chars, args.seed).items():
+        old, t_old = timed(extract_all_previous, text, args.repeat)
+        new, t_new = timed(regex_rules.extract_all, text, args.repeat)
+        print(
+            f"{name:<10} {t_old * 1000:>9.2f} ms {t_new * 1000:>9.2f} ms {t_old / t_new:>7.1f}x"
+            f"  previous={counts(old)} single pass={counts(new)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
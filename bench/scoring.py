@@ -0,0 +1,99 @@
+# scoring.py
+"""
+services.scoring のベンチマーク。
+
+以前の 1 件ずつの Python のループ（重みはコード中の値）と、
+score_many（個数の行列を NumPy でまとめて計算）を、件数を変えて比較する。
+結果は無作為に作った {"label": [list, count]}。両者のスコアが一致することも確かめる。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.scoring
+    python -m bench.scoring --docs 10000 100000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from services import scoring
+
+
+# =============================
+# 比較用: 以前の版
+# =============================
+def direct_previous(nlp_result):
+    weights = {"phone": 35, "email": 30, "person": 15, "postal": 40, "date": 10, "age": 5}
+    total = 0
+    for label in ["phone", "email", "person", "postal", "date", "age"]:
+        value = nlp_result.get(label)
+        count = value[1] if value and isinstance(value, list) and len(value) >= 2 else 0
+        total += count * weights.get(label, 0)
+    return min(total, 100)
+
+
+def indirect_previous(nlp_result):
+    total = 0
+    for label in ["station", "hospital", "tourristspot", "place", "date"]:
+        value = nlp_result.get(label)
+        total += value[1] if value and isinstance(value, list) and len(value) >= 2 else 0
+    if total == 0:
+        return 0
+    return int(min(10 * (total ** 1.5), 100))
+
+
+# =============================
+# 入力
+# =============================
+def make_results(n, seed):
+    """1 件あたり 0〜4 種類のラベルを持つ結果を n 件作る"""
+    rng = random.Random(seed)
+    labels = scoring.CONFIG.labels
+    results = []
+    for _ in range(n):
+        result = {}
+        for label in rng.sample(labels, rng.randint(0, 4)):
+            count = rng.randint(1, 3)
+            result[label] = [["x"] * count, count]
+        results.append(result)
+    return results
+
+
+def timed(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = func()
+    return value, (time.perf_counter() - start) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"{'docs':>8} {'previous':>12} {'score_many':>12} {'(matrix)':>12} {'speedup':>8}")
+    for n in args.docs:
+        results = make_results(n, args.seed)
+        (old_d, old_i), t_old = timed(
+            lambda: ([direct_previous(r) for r in results], [indirect_previous(r) for r in results]),
+            args.repeat,
+        )
+        (new_d, new_i), t_new = timed(lambda: scoring.score_many(results), args.repeat)
+        counts = scoring.count_matrix(results)
+        _, t_matrix = timed(
+            lambda: (scoring.direct_matrix(counts), scoring.indirect_matrix(counts)), args.repeat
+        )
+        assert np.array_equal(new_d, old_d) and np.array_equal(new_i, old_i), "スコアが一致しません"
+        print(
+            f"{n:>8} {t_old * 1000:>9.2f} ms {t_new * 1000:>9.2f} ms {t_matrix * 1000:>9.2f} ms "
+            f"{t_old / t_new:>7.1f}x"
+        )
+    print("(matrix) は行列を作った後の計算だけの時間")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# spans.py
+"""
+解析結果の組み立て（spaCy の Doc → 結果）のベンチマーク。
+
+EntitySpan の並びから結果を作る現在の版（diagnose_doc + result_dict）と、
+以前のラベルごとの defaultdict + 正規化結果のタプルのリストから辞書を作る版を、
+解析済みの Doc で比較する（spaCy の解析自体は計測に含めない）。
+
+1 件あたりの時間と、tracemalloc で数えたメモリ確保の量（ピーク）を表示する。
+以前の版は日付・場所の最初の 1 件しか正規化しない不具合があったので、
+ここでは全件を正規化するように直したうえで比べる。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.spans
+    python -m bench.spans --repeat 20
+"""
+
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+from collections import defaultdict
+
+from nlp import processor
+from nlp.pipeline import get_nlp
+from nlp.regex_rules import extract_all
+from bench.pipeline_profiles import CORPUS, load_corpus
+
+
+# =============================
+# 比較用: 以前の版
+# =============================
+def diagnose_previous(tweet, doc):
+    """EntitySpan 導入前の collect_entities + diagnose_entities と同じ処理"""
+    entities = defaultdict(list)
+    for ent in doc.ents:
+        entities[ent.label_].append(ent.text)
+
+    contacts = extract_all(tweet) if tweet else None
+    normalized_dates = [
+        (text, processor.normalize_datetime(text, now_iso=processor.BASE_ISO))
+        for text in entities.get("DATE", [])
+    ]
+    normalized_places = [
+        (text, processor.lookup_place(text))
+        for label in processor.PLACE_LABELS
+        for text in entities.get(label, [])
+    ]
+
+    results = {}
+    persons = entities.get("Person", [])
+    if persons:
+        results["person"] = [persons, len(persons)]
+    valid_ages = [age for age in entities.get("Age", []) if "-" not in age]
+    if valid_ages:
+        results["age"] = [valid_ages, len(valid_ages)]
+    norm_dates = [norm for _, norm in normalized_dates]
+    if norm_dates:
+        results["date"] = [norm_dates, len(norm_dates)]
+    if contacts:
+        for key, label in (("emails", "email"), ("phones", "phone"), ("postals", "postal")):
+            if contacts.get(key):
+                results[label] = [contacts[key], len(contacts[key])]
+    grouped = {"station": [], "hospital": [], "tourristspot": [], "place": []}
+    for text, norm in normalized_places:
+        label = processor.PLACE_CATEGORY_LABELS.get(norm["category"])
+        if label is not None:
+            grouped[label].append(text)
+    for label, texts in grouped.items():
+        if texts:
+            results[label] = [texts, len(texts)]
+    return results
+
+
+def diagnose_spans(tweet, doc):
+    return processor.result_dict(processor.diagnose_doc(tweet, doc))
+
+
+def measure(func, pairs, repeat):
+    """1 件あたりの時間と、1 件あたりのメモリ確保のピーク（バイト）"""
+    for tweet, doc in pairs:    # 日付・gazetteer の初回の読み込みを計測から外す
+        func(tweet, doc)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for tweet, doc in pairs:
+            func(tweet, doc)
+    elapsed = (time.perf_counter() - start) / (repeat * len(pairs))
+
+    peaks = []
+    for tweet, doc in pairs:
+        tracemalloc.start()
+        func(tweet, doc)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return elapsed, sum(peaks) / len(peaks)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    texts = load_corpus(args.corpus)
+    pairs = list(zip(texts, get_nlp().pipe(texts)))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_old, mem_old = measure(diagnose_previous, pairs, args.repeat)
+        t_new, mem_new = measure(diagnose_spans, pairs, args.repeat)
+
+    print(f"documents         : {len(pairs)}")
+    print(f"previous per doc  : {t_old * 1e6:.1f} us, peak {mem_old / 1024:.1f} KiB")
+    print(f"spans    per doc  : {t_new * 1e6:.1f} us, peak {mem_new / 1024:.1f} KiB")
+    print(f"speedup           : {t_old / t_new:.2f}x, memory {mem_new / mem_old:.0%}")
+
+
+if __name__ == "__main__":
+    main()
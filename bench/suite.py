@@ -0,0 +1,255 @@
+# suite.py
+"""
+/analyze の処理全体のベンチマーク（段階ごと + HTTP）。
+
+固定のコーパス（既定: bench/data/tweets.txt）を段階ごとに実行し、
+1 件あたりの p50/p95/p99・スループット・ピーク RSS を表示する。
+結果は JSON で保存でき、--compare で前回（別のコミット）の JSON と比べられる。
+
+段階
+- nlp            : spaCy の解析（get_nlp()(text)）
+- contact_spans  : 正規表現でメール・電話番号・郵便番号を抽出
+- normalize_dates: DATE エンティティの日時の正規化（キャッシュなしの normalize_datetime）
+- lookup_places  : 場所エンティティの gazetteer 検索
+- scoring        : 直接・間接スコアの計算
+- tweet_diagnosis: 上記をまとめた 1 件の診断（まとめ処理のスレッドを含む）
+- http_analyze   : uvicorn で起動したアプリへの POST /analyze
+                   （説明文は固定文字列に差し替え、結果キャッシュは無効にする）
+
+外部 API には接続しないので、ネットワークの無い Linux でも実行できる。
+
+実行方法（プロジェクト直下で）:
+    python -m bench.suite
+    python -m bench.suite --repeat 5 --json bench-results.json
+    python -m bench.suite --json new.json --compare old.json
+    python -m bench.suite --skip-http
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import threading
+import time
+
+import httpx
+
+from bench.pipeline_profiles import CORPUS, load_corpus, peak_rss_mib
+
+
+def quiet(func):
+    """デバッグ出力（print）を捨てて func を呼ぶ関数を返す"""
+    def call(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args)
+    return call
+
+
+def summarize(latencies, elapsed):
+    """1 件ごとの時間（秒）の並びから p50/p95/p99（ms）とスループットを求める"""
+    if len(latencies) >= 2:
+        q = statistics.quantiles(latencies, n=100)
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else float("nan")
+    return {
+        "calls": len(latencies),
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "p99_ms": p99 * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "throughput_per_s": len(latencies) / elapsed if elapsed else float("nan"),
+    }
+
+
+def run_stage(func, inputs, repeat):
+    """inputs を repeat 回まわして 1 件ごとの時間を測る（最初の 1 周はウォームアップ）"""
+    for item in inputs:
+        func(item)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            t = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - t)
+    result = summarize(latencies, time.perf_counter() - start)
+    result["peak_rss_mib"] = peak_rss_mib()
+    return result
+
+
+# =============================
+# 段階ごと（同じプロセス内）
+# =============================
+def bench_stages(texts, repeat):
+    from nlp import date_norm, gazeteer, processor
+    from nlp.pipeline import get_nlp
+    from nlp.spans import result_dict
+    from services import scoring
+
+    nlp = get_nlp()
+    docs = [nlp(t) for t in texts]
+    date_texts = [e.text for doc in docs for e in doc.ents if e.label_ == "DATE"]
+    place_texts = [e.text for doc in docs for e in doc.ents if e.label_ in processor.PLACE_LABELS]
+    results = [result_dict(processor.diagnose_doc(t, doc)) for t, doc in zip(texts, docs)]
+
+    def score(nlp_result):
+        scoring.direct_scores(nlp_result)
+        scoring.indirect_scores(nlp_result)
+
+    stages = {
+        "nlp": (nlp, texts),
+        "contact_spans": (processor.contact_spans, texts),
+        "normalize_dates": (lambda t: date_norm.normalize_datetime(t, now_iso=processor.BASE_ISO), date_texts),
+        "lookup_places": (gazeteer.lookup_place, place_texts),
+        "scoring": (quiet(score), results),
+        "tweet_diagnosis": (quiet(processor.tweet_diagnosis), texts),
+    }
+    report = {}
+    for name, (func, inputs) in stages.items():
+        if not inputs:
+            continue
+        report[name] = run_stage(func, inputs, repeat)
+        report[name]["inputs"] = len(inputs)
+    return report
+
+
+# =============================
+# HTTP（別プロセスの uvicorn）
+# =============================
+def server_peak_rss_mib(pid):
+    """Linux の /proc から子プロセスのピーク RSS（VmHWM）を読む"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def bench_http(texts, repeat, concurrency):
+    from bench import loadtest
+
+    os.environ["RESULT_CACHE_ENABLED"] = "0"   # 同じ文章を繰り返すので、キャッシュで測れなくなる
+    proc, url = loadtest.start_server("thread", 1, concurrency, quiet=True)
+    try:
+        with httpx.Client(base_url=url, timeout=60) as client:
+            while client.get("/ready").status_code != 200:
+                time.sleep(0.2)
+            for text in texts:                  # ウォームアップ
+                client.post("/analyze", json={"text": text})
+
+        items = [text for _ in range(repeat) for text in texts]
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+        next_item = iter(range(len(items)))
+
+        def worker():
+            with httpx.Client(base_url=url, timeout=60) as client:
+                while True:
+                    with lock:
+                        i = next(next_item, None)
+                    if i is None:
+                        return
+                    t = time.perf_counter()
+                    r = client.post("/analyze", json={"text": items[i]})
+                    elapsed = time.perf_counter() - t
+                    with lock:
+                        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                        if r.status_code == 200:
+                            latencies.append(elapsed)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        result = summarize(latencies, time.perf_counter() - start)
+        result["concurrency"] = concurrency
+        result["statuses"] = {str(k): v for k, v in statuses.items()}
+        result["peak_rss_mib"] = server_peak_rss_mib(proc.pid)
+        return result
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+# =============================
+# 出力
+# =============================
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(report, previous=None):
+    print(f"{'stage':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per s':>9} {'RSS MiB':>8}", end="")
+    print("  p50 change" if previous else "")
+    for name, r in report["stages"].items():
+        line = (
+            f"{name:<16} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+            f"{r['throughput_per_s']:>9.1f} {r['peak_rss_mib']:>8.0f}"
+        )
+        old = (previous or {}).get("stages", {}).get(name)
+        if old:
+            line += f"  {(r['p50_ms'] / old['p50_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS)
+    ap.add_argument("--repeat", type=int, default=3, help="コーパスを繰り返す回数")
+    ap.add_argument("--concurrency", type=int, default=4, help="HTTP の同時接続数")
+    ap.add_argument("--skip-http", action="store_true", help="HTTP の計測を省く")
+    ap.add_argument("--json", help="結果を保存する JSON ファイル")
+    ap.add_argument("--compare", help="比べる前回の JSON ファイル")
+    args = ap.parse_args()
+
+    texts = load_corpus(args.corpus)
+    stages = bench_stages(texts, args.repeat)
+    if not args.skip_http:
+        stages["http_analyze"] = bench_http(texts, args.repeat, args.concurrency)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "corpus": str(args.corpus),
+            "texts": len(texts),
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "process_peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "stages": stages,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"比較: {args.compare}（commit {previous['meta'].get('commit')}）")
+    print_table(report, previous)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"保存しました: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,33 @@
 from __future__ import annotations
 
 import os
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.datastructures import MutableHeaders
+from dotenv import load_dotenv
+
+# .env はプロジェクトのモジュールより先に読み込む
+# （nlp.* ・services.* は import 時に環境変数から設定を読むため）
+load_dotenv()
 
 # ルーター（/analyze）を登録
 from services.analyzer import router as analyze_router
+from services import worker_pool
+from services import gpt_cliant
+from services.result_cache import cache_stats
+from services import explain_templates
+from services import drafts
+from nlp.batcher import batch_stats
+from nlp.processor import warm_up
+from nlp import logs, metrics
 
 
 # 設定
@@ -32,20 +49,56 @@ APP_VERSION = os.getenv("APP_VERSION", "0.1.0")
 APP_NAME = os.getenv("APP_NAME", "SNS Checker API")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
-)
+# 書き出しは別スレッド（nlp/logs.py の QueueListener）で行う
+logs.configure(LOG_LEVEL, "%(asctime)s [%(levelname)s] %(name)s - %(message)s")
 logger = logging.getLogger("app")
 
 
+# 起動・終了処理
+async def _warm_up(app: FastAPI):
+    """モデル等を読み込んで 1 件解析し、終わったら ready にする"""
+    try:
+        if worker_pool.process_mode():
+            # NLP_EXECUTION_MODE=process の場合はワーカープロセスを先に起動しておく
+            logger.info("NLPワーカープロセスを起動します")
+            await run_in_threadpool(worker_pool.get_pool().warm_up)
+        else:
+            logger.info("NLPモデルを読み込み、ウォームアップします")
+            await run_in_threadpool(warm_up)
+    except Exception:
+        logger.exception("ウォームアップに失敗しました")
+        return
+    app.state.ready = True
+    logger.info("ウォームアップ完了")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ウォームアップはバックグラウンドで行い、終わるまで /ready は 503 を返す
+    # （/health はその間も 200 を返す）
+    app.state.ready = False
+    try:
+        gpt_cliant.init_async_client()
+    except Exception:
+        # API キー未設定など。説明文の生成時に改めてエラーになる
+        logger.warning("OpenAI クライアントを作成できませんでした", exc_info=True)
+    app.state.warm_up_task = asyncio.create_task(_warm_up(app))
+    yield
+    app.state.ready = False
+    app.state.warm_up_task.cancel()
+    await gpt_cliant.close_async_client()
+    await run_in_threadpool(worker_pool.shutdown_pool)
+
+
 # FastAPI
 app = FastAPI(
     title=APP_NAME,
     version=APP_VERSION,
+    lifespan=lifespan,
     openapi_tags=[
         {"name": "health", "description": "疎通・確認用"},
         {"name": "analyze", "description": "テキスト解析"},
+        {"name": "stats", "description": "チューニング用の統計"},
     ],
 )
 
@@ -58,6 +111,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server-Timing（SERVER_TIMING=1 の場合のみ）
+class ServerTimingMiddleware:
+    """応答に段階ごとの時間（ms）と全体の時間を Server-Timing ヘッダーで付ける"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            # ストリーミングの応答ではヘッダーを送る時点までの段階だけが入る
+            if message["type"] == "http.response.start":
+                timings["total"] = time.perf_counter() - start
+                MutableHeaders(scope=message).append("Server-Timing", metrics.server_timing(timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.end_request(token)
+
+
+if metrics.SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+
+
+# 詳細ログの間引き（LOG_SAMPLE_RATE < 1 の場合のみ）
+class LogSamplingMiddleware:
+    """リクエストごとに詳細ログ（DEBUG）を出すかを決める"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = logs.start_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            logs.end_request(token)
+
+
+if logs.LOG_SAMPLE_RATE < 1:
+    app.add_middleware(LogSamplingMiddleware)
+
 # ルーター登録
 app.include_router(analyze_router, tags=["analyze"])
 
@@ -72,6 +179,44 @@ async def root():
 async def health():
     return {"ok": True}
 
+@app.get("/ready", tags=["health"])
+async def ready(request: Request):
+    """モデルの読み込みとウォームアップが終わっていれば 200、まだなら 503"""
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
 @app.get("/version", tags=["health"])
 async def version():
-    return {"version": APP_VERSION}
\ No newline at end of file
+    return {"version": APP_VERSION}
+
+
+# 統計
+@app.get("/stats/nlp-batch", tags=["stats"])
+async def nlp_batch_stats():
+    """nlp.pipe のまとめ処理のバッチサイズ分布"""
+    return batch_stats()
+
+
+@app.get("/stats/cache", tags=["stats"])
+async def result_cache_stats():
+    """解析結果キャッシュのヒット・ミス・追い出し件数"""
+    return cache_stats()
+
+
+@app.get("/stats/explain", tags=["stats"])
+async def explain_stats():
+    """説明文をテンプレートで返せた割合（LLM を省けたトラフィックの割合）"""
+    return explain_templates.stats()
+
+
+@app.get("/stats/drafts", tags=["stats"])
+async def draft_stats():
+    """下書きの差分解析で、前回の結果を使い回せた文の割合"""
+    return drafts.stats()
+
+
+@app.get("/metrics", tags=["stats"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """段階ごとの処理時間のヒストグラム（Prometheus のテキスト形式）"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
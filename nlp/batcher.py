@@ -0,0 +1,177 @@
+# batcher.py
+"""
+複数リクエストのテキストをまとめて spaCy にかけるためのモジュール。
+
+/analyze などのルートは NLP を run_in_threadpool（thread モード）で呼ぶので、
+同時に来たリクエストの解析は別々のスレッドで動く。
+各スレッドが nlp(text) を個別に呼ぶ代わりに、短い待ち時間の間に届いた
+テキストを集めて nlp.pipe でまとめて解析し、結果をそれぞれのスレッドに返す。
+まとめた解析が失敗した場合は 1 件ずつ解析し直し、失敗したテキストの呼び出し元にだけ例外を返す。
+
+設定（環境変数）
+- NLP_BATCH_ENABLED    : "0" でまとめ処理を無効化（従来どおり 1 件ずつ解析）
+- NLP_BATCH_MAX_SIZE   : 1 回にまとめる最大件数
+- NLP_BATCH_MAX_WAIT_MS: 最初の 1 件が届いてから待つ最大時間（ミリ秒）
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from .pipeline import get_nlp
+
+# =============================
+# 設定
+# =============================
+BATCH_ENABLED = os.getenv("NLP_BATCH_ENABLED", "1") != "0"
+BATCH_MAX_SIZE = int(os.getenv("NLP_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("NLP_BATCH_MAX_WAIT_MS", "5"))
+
+
+# =============================
+# まとめ処理
+# =============================
+class NlpBatcher:
+    """
+    テキストをキューに積み、専用スレッドが nlp.pipe でまとめて解析する。
+
+    parse() を呼んだスレッドは、自分のテキストの Doc ができるまで待つ。
+    """
+
+    def __init__(self, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS, nlp_getter=get_nlp):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._nlp_getter = nlp_getter
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # バッチサイズごとの実行回数（チューニング用）
+        self._sizes = Counter()
+        self._docs = 0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="nlp-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text):
+        """テキストを解析待ちに積み、Doc を受け取る Future を返す"""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def parse(self, text):
+        """テキストを解析して Doc を返す（まとめ処理が終わるまで待つ）"""
+        return self.submit(text).result()
+
+    def _collect(self):
+        """最初の 1 件を待ち、その後は上限件数か待ち時間まで追加で集める"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                nlp = self._nlp_getter()
+                docs = list(nlp.pipe(texts, batch_size=len(texts)))
+            except Exception:
+                # 1 件の失敗で同じバッチの全員を失敗させないよう、1 件ずつ解析し直す
+                self._run_each(batch)
+                continue
+
+            with self._lock:
+                self._sizes[len(batch)] += 1
+                self._docs += len(batch)
+            for (_, future), doc in zip(batch, docs):
+                future.set_result(doc)
+
+    def _run_each(self, batch):
+        for text, future in batch:
+            try:
+                doc = self._nlp_getter()(text)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            with self._lock:
+                self._sizes[1] += 1
+                self._docs += 1
+            future.set_result(doc)
+
+    def stats(self):
+        """バッチサイズのヒストグラムと集計値を返す"""
+        with self._lock:
+            sizes = dict(sorted(self._sizes.items()))
+            batches = sum(sizes.values())
+            docs = self._docs
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "docs": docs,
+            "mean_batch_size": docs / batches if batches else 0.0,
+            "batch_size_histogram": sizes,
+        }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """共有の NlpBatcher を返す（無効化されている場合は None）"""
+    global _batcher
+    if not BATCH_ENABLED:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = NlpBatcher()
+    return _batcher
+
+
+def parse_text(text):
+    """まとめ処理が有効ならバッチャー経由で、無効なら直接 nlp(text) で解析する"""
+    batcher = get_batcher()
+    if batcher is None:
+        return get_nlp()(text)
+    return batcher.parse(text)
+
+
+def parse_texts(texts):
+    """
+    複数のテキストを解析して Doc のリストを返す（長いテキストを分けたまとまりなど）。
+
+    まとめ処理が有効なら全件を一度にバッチャーに積み、同じ nlp.pipe にまとめる。
+    """
+    batcher = get_batcher()
+    if batcher is None:
+        return list(get_nlp().pipe(texts, batch_size=max(1, len(texts))))
+    futures = [batcher.submit(text) for text in texts]
+    return [future.result() for future in futures]
+
+
+def batch_stats():
+    batcher = get_batcher()
+    if batcher is None:
+        return {"enabled": False}
+    return batcher.stats()
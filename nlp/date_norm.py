@@ -5,21 +5,27 @@ ISO形式に正規化するモジュール。
 
 同時に以下の情報も返す:
 - 未来の日時かどうか
-- 繰り返しの予定かどうか
-- 祝日に該当するかどうか
+- 繰り返しの予定かどうか（繰り返しなら直近の発生日時も。recurrence）
+- 祝日に該当するかどうか（jp_holidays）
+
+日本語の日時表現はまず date_rules の規則で解釈し、
+規則で解釈できないものだけ dateparser に任せる（dateparser は 1 回数十 ms かかる）。
 """
 
 # =============================
 # ライブラリ読み込み
 # =============================
-import re
-import csv
+import os
 import dateparser
+from functools import lru_cache
 from dateutil import parser              # ISO形式の解析
 from dateutil.relativedelta import relativedelta  # 日付の加減算
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo            # タイムゾーン対応
 
+from nlp import date_rules, recurrence
+from nlp.jp_holidays import is_holiday
+
 # =============================
 # 補足説明
 # =============================
@@ -64,31 +70,26 @@ JP_TO_EN = {
 JST = ZoneInfo("Asia/Tokyo")
 
 # =============================
-# 祝日データの読み込み
+# 繰り返しの予定
 # =============================
-HOLIDAYS = []
-try:
-    # プロジェクト直下に "syukujitsu.csv" を配置する想定
-    with open("syukujitsu.csv", newline="", encoding="utf-8") as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            # CSV の 1列目に日付 (YYYY-MM-DD) がある前提
-            HOLIDAYS.append(row[0])
-except FileNotFoundError:
-    # ファイルが無い場合は仮のデータ
-    HOLIDAYS = ["祝日がありませんでした"]
+# 繰り返しの予定の場合に返す、直近の発生日時の件数
+RECURRENCE_EXPAND = int(os.getenv("RECURRENCE_EXPAND", "3"))
 
 # =============================
 # 日時正規化関数（祝日対応版）
 # =============================
-def normalize_datetime(text, now_iso=None):
-    now = datetime.now(JST) if now_iso is None else parser.isoparse(now_iso)
+@lru_cache(maxsize=64)
+def _parse_now(now_iso):
+    """基準日時の文字列を解析する（同じ基準日時で何度も呼ばれるのでキャッシュする）"""
+    return parser.isoparse(now_iso)
 
+
+def parse_with_dateparser(text, now):
+    """規則で解釈できない表現を dateparser で解析する（遅いので最後の手段）"""
     # 日本語を英語に変換（辞書にない場合はそのまま）
     en_text = JP_TO_EN.get(text, text)
 
-    # dateparser で解析
-    parsed = dateparser.parse(
+    return dateparser.parse(
         en_text,
         settings={
             "TIMEZONE": "Asia/Tokyo",
@@ -98,6 +99,29 @@ def normalize_datetime(text, now_iso=None):
         }
     )
 
+
+def normalize_datetime(text, now_iso=None):
+    now = datetime.now(JST) if now_iso is None else _parse_now(now_iso)
+
+    # 繰り返しの予定（毎週金曜 など）なら、直近の発生日時を求める
+    # （2月30日 のように発生日が見つからない規則は、繰り返しとして扱わない）
+    rule = recurrence.parse(text, now)
+    occurrences = rule.occurrences(now, RECURRENCE_EXPAND) if rule is not None else []
+    if occurrences:
+        return {
+            "date": text,
+            "iso": occurrences[0].isoformat(),
+            "is_future": True,              # 繰り返しの予定はこれからも起きる
+            "is_repeated": True,
+            "in_holiday": is_holiday(occurrences[0]),
+            "occurrences": [o.isoformat() for o in occurrences],
+        }
+
+    # 規則で解析し、解釈できなければ dateparser
+    parsed = date_rules.parse(text, now)
+    if parsed is None:
+        parsed = parse_with_dateparser(text, now)
+
     if parsed is None:
         return None
 
@@ -106,5 +130,5 @@ def normalize_datetime(text, now_iso=None):
         "iso": parsed.isoformat(),
         "is_future": parsed > now,
         "is_repeated": False,
-        "in_holiday": parsed.date().isoformat() in HOLIDAYS
+        "in_holiday": is_holiday(parsed)
     }
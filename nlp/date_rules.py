@@ -0,0 +1,365 @@
+# date_rules.py
+"""
+日本語の日時表現を、規則だけで datetime に変換するモジュール。
+
+dateparser は呼び出しごとに言語判定と多数の正規表現を試すので遅く、
+「8月20日(水)」「来週の金曜」「3日後の夜」のような日本語は解釈できないことも多い。
+ここでは日時表現をあらかじめコンパイルした 1 つの正規表現で部品に分け、
+基準日時から直接計算する。解釈できない部品が残った場合は None を返す
+（呼び出し側の date_norm で dateparser にフォールバックする）。
+
+対応する表現の例
+- 相対日    : 今日 明日 明後日 明々後日 昨日 一昨日
+- 相対週・月・年: 今週 来週 再来週 先週 先々週 / 来月 … / 来年 去年 …（〜末も可）
+- 曜日      : 金曜 金曜日 来週の金曜 (水)
+- 〜後/〜前 : 3日後 三日後 2週間後 1か月後 3ヶ月前 2時間後 30分後
+- 絶対日付  : 8月20日 8/20 2025年9月1日 2025/10/10 5日 8月
+- 和暦      : 令和7年8月15日 令和元年5月1日 平成31年4月30日
+- 時刻      : 10時 午後3時 午前10時半 15時30分 19:00
+- 時間帯    : 朝 昼 夕方 夜 深夜 正午 今朝 今夜 今晩
+"""
+
+import re
+import unicodedata
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+# =============================
+# 数字
+# =============================
+KANJI_DIGITS = {"〇": 0, "零": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+KANJI_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+NUM = r"[0-9]+|[〇零一二三四五六七八九十百千]+"
+
+# 「〜後/〜前」の数の上限（これより大きいものは解釈しない。timedelta の範囲を超えないように）
+MAX_RELATIVE = 10000
+# 時刻の上限（「25時」のような翌日への繰り越しは 47 時まで）
+MAX_HOUR = 47
+
+
+def to_int(text):
+    """算用数字・漢数字（二十五、十二、三 など）を int にする"""
+    if text.isdigit():
+        return int(text)
+    total, digit = 0, None
+    for ch in text:
+        if ch in KANJI_DIGITS:
+            digit = KANJI_DIGITS[ch]
+        else:
+            total += (1 if digit is None else digit) * KANJI_UNITS[ch]
+            digit = None
+    return total + (digit or 0)
+
+
+# =============================
+# 語彙
+# =============================
+RELATIVE_DAYS = {
+    "明々後日": 3, "明明後日": 3, "しあさって": 3,
+    "明後日": 2, "あさって": 2,
+    "明日": 1, "あした": 1, "あす": 1,
+    "今日": 0, "本日": 0, "きょう": 0,
+    "一昨日": -2, "おととい": -2,
+    "昨日": -1, "きのう": -1,
+}
+RELATIVE_PREFIX = {"再来": 2, "来": 1, "今": 0, "本": 0, "先々": -2, "先": -1, "去": -1, "一昨": -2, "昨": -1}
+
+WEEKDAYS = {"月": 0, "火": 1, "水": 2, "木": 3, "金": 4, "土": 5, "日": 6}
+
+# 時間帯 → (時刻が無い場合の時, 12 を足すか)
+PERIODS = {
+    "午前": (None, False), "AM": (None, False), "am": (None, False),
+    "午後": (None, True), "PM": (None, True), "pm": (None, True),
+    "朝": (8, False), "昼": (12, True), "正午": (12, False),
+    "夕方": (17, True), "夜": (19, True), "晩": (19, True),
+    "深夜": (23, False), "夜中": (23, False),
+}
+# 「今朝」「今夜」は 今日 + 時間帯
+TODAY_PERIODS = {"今朝": "朝", "今夜": "夜", "今晩": "夜"}
+# 「12時」を翌日の 0:00 とする時間帯（「夜12時」は真夜中。「昼12時」は正午のまま）
+MIDNIGHT_PERIODS = {"夜", "晩", "深夜", "夜中"}
+
+ERAS = {"令和": 2018, "平成": 1988, "昭和": 1925}
+
+UNIT_ALIASES = {
+    "日": "days", "日間": "days",
+    "週": "weeks", "週間": "weeks",
+    "か月": "months", "ヶ月": "months", "ケ月": "months", "カ月": "months", "ヵ月": "months", "箇月": "months",
+    "年": "years", "年間": "years",
+    "時間": "hours",
+    "分": "minutes",
+}
+
+
+def _alt(words):
+    """長い語を先に試すように並べた選択肢の正規表現"""
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+# =============================
+# 字句の正規表現（先に書いたものが優先）
+# =============================
+TOKEN = re.compile(
+    "|".join([
+        rf"(?P<era>{_alt(ERAS)})(?P<era_year>{NUM}|元)年(?:(?P<era_m>{NUM})月(?:(?P<era_d>{NUM})日)?)?",
+        rf"(?P<ymd_y>\d{{4}})[年/\-.](?P<ymd_m>{NUM})[月/\-.]?(?:(?P<ymd_d>{NUM})日?)?",
+        rf"(?P<rel_n>{NUM})(?P<rel_unit>{_alt(UNIT_ALIASES)})(?P<rel_dir>後|前)",
+        rf"(?P<today_period>{_alt(TODAY_PERIODS)})",
+        rf"(?P<rel_day>{_alt(RELATIVE_DAYS)})",
+        rf"(?P<rel_prefix>{_alt(RELATIVE_PREFIX)})(?P<rel_scope>週末|週|月末|月|年末|年)",
+        r"(?P<bare_end>週末|月末|年末)",
+        rf"(?P<md_m>{NUM})月(?P<md_d>{NUM})日",
+        r"(?P<slash_m>\d{1,2})/(?P<slash_d>\d{1,2})",
+        r"[(（](?P<paren_wd>[月火水木金土日])(?:曜日?)?[)）]",
+        r"(?P<wd>[月火水木金土日])曜日?",
+        rf"(?P<month>{NUM})月(?!曜)",
+        rf"(?P<day>{NUM})日",
+        rf"(?:(?P<ampm>{_alt(PERIODS)})の?)?(?P<hour>{NUM})時(?:(?P<half>半)|(?P<minute>{NUM})分)?",
+        r"(?P<clock_h>\d{1,2}):(?P<clock_m>\d{2})",
+        rf"(?P<period>{_alt(PERIODS)})",
+        r"(?P<filler>[\sの、,・]+|頃|ごろ|くらい|ぐらい|から|まで|に|より|以降|ちょうど)",
+    ])
+)
+
+
+# =============================
+# 解析
+# =============================
+class _Parts:
+    """字句から集めた日時の部品"""
+
+    def __init__(self):
+        self.year = self.month = self.day = None
+        self.day_offset = None           # 今日からの日数
+        self.week_offset = None          # 今週からの週数
+        self.month_offset = None
+        self.year_offset = None
+        self.scope_end = None            # "week" / "month" / "year"（〜末）
+        self.upcoming = False            # 過ぎていれば次の週末にする（「週末」だけの場合）
+        self.weekday = None
+        self.delta = None                # 〜後/〜前
+        self.hour = self.minute = None
+        self.period = None
+
+
+def _tokenize(text):
+    """全体を字句に分けられれば部品を返し、分けられない文字があれば None"""
+    parts = _Parts()
+    pos = 0
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if m is None or m.end() == pos:
+            return None
+        pos = m.end()
+        g = m.groupdict()
+
+        if g["era"]:
+            year = 1 if g["era_year"] == "元" else to_int(g["era_year"])
+            parts.year = ERAS[g["era"]] + year
+            if g["era_m"]:
+                parts.month = to_int(g["era_m"])
+            if g["era_d"]:
+                parts.day = to_int(g["era_d"])
+        elif g["ymd_y"]:
+            parts.year, parts.month = int(g["ymd_y"]), to_int(g["ymd_m"])
+            if g["ymd_d"]:
+                parts.day = to_int(g["ymd_d"])
+        elif g["rel_n"]:
+            n = to_int(g["rel_n"])
+            if n > MAX_RELATIVE:
+                return None
+            parts.delta = relativedelta(**{UNIT_ALIASES[g["rel_unit"]]: n if g["rel_dir"] == "後" else -n})
+        elif g["today_period"]:
+            parts.day_offset = 0
+            parts.period = TODAY_PERIODS[g["today_period"]]
+        elif g["rel_day"]:
+            parts.day_offset = RELATIVE_DAYS[g["rel_day"]]
+        elif g["rel_prefix"]:
+            n = RELATIVE_PREFIX[g["rel_prefix"]]
+            scope = g["rel_scope"]
+            if scope.startswith("週"):
+                parts.week_offset = n
+            elif scope.startswith("月"):
+                parts.month_offset = n
+            else:
+                parts.year_offset = n
+            if scope.endswith("末"):
+                parts.scope_end = {"週": "week", "月": "month", "年": "year"}[scope[0]]
+        elif g["bare_end"]:
+            # 「週末」「月末」だけなら、これから来る最初のもの
+            scope = {"週末": "week", "月末": "month", "年末": "year"}[g["bare_end"]]
+            parts.scope_end = scope
+            parts.upcoming = True
+            if scope == "week":
+                parts.week_offset = 0
+            elif scope == "month":
+                parts.month_offset = 0
+            else:
+                parts.year_offset = 0
+        elif g["md_m"]:
+            parts.month, parts.day = to_int(g["md_m"]), to_int(g["md_d"])
+        elif g["slash_m"]:
+            parts.month, parts.day = int(g["slash_m"]), int(g["slash_d"])
+        elif g["paren_wd"] or g["wd"]:
+            parts.weekday = WEEKDAYS[g["paren_wd"] or g["wd"]]
+        elif g["month"]:
+            parts.month = to_int(g["month"])
+        elif g["day"]:
+            parts.day = to_int(g["day"])
+        elif g["hour"]:
+            parts.hour = to_int(g["hour"])
+            parts.minute = 30 if g["half"] else to_int(g["minute"]) if g["minute"] else 0
+            if g["ampm"]:
+                parts.period = g["ampm"]
+            if parts.hour > MAX_HOUR or parts.minute > 59:
+                return None
+        elif g["clock_h"]:
+            parts.hour, parts.minute = int(g["clock_h"]), int(g["clock_m"])
+            if parts.minute > 59:
+                return None
+        elif g["period"]:
+            parts.period = g["period"]
+    return parts
+
+
+def _resolve_date(parts, now):
+    """
+    部品から日付を決める。
+
+    返り値は (datetime, 相対表現か)。相対表現（明日・来週など）は
+    時刻が無ければ基準時刻の時刻を引き継ぐ（dateparser と同じ扱い）。
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # 年・月・日の指定（和暦・絶対日付・「来年の4月」「来月15日」など）
+    if parts.year or parts.month or parts.day:
+        base = today
+        if parts.year_offset is not None:
+            base = base + relativedelta(years=parts.year_offset)
+        if parts.month_offset is not None:
+            base = base + relativedelta(months=parts.month_offset)
+        year = parts.year or base.year
+        month = parts.month or base.month
+        day = parts.day or 1
+        date = datetime(year, month, day, tzinfo=now.tzinfo)
+
+        # 年（や月）が省略された過去の日付は、未来側に寄せる
+        # （「8月」のように日が無ければ、今月も過去扱いにしない）
+        current = today if parts.day else today.replace(day=1)
+        if date < current and parts.year is None and parts.year_offset is None:
+            if parts.month is None and parts.month_offset is None:
+                date = date + relativedelta(months=1)
+            else:
+                date = date + relativedelta(years=1)
+        return date, False
+
+    if parts.week_offset is not None:
+        monday = today - timedelta(days=today.weekday()) + timedelta(weeks=parts.week_offset)
+        if parts.weekday is not None:
+            return monday + timedelta(days=parts.weekday), False
+        if parts.scope_end == "week":
+            saturday = monday + timedelta(days=5)       # 週末 = 土曜日
+            if saturday < today:
+                if parts.upcoming:
+                    saturday = saturday + timedelta(weeks=1)
+                elif parts.week_offset == 0:
+                    saturday = today                     # 日曜日の「今週末」は今日（日曜日）
+            return saturday, False
+        return now + timedelta(weeks=parts.week_offset), True
+
+    if parts.month_offset is not None:
+        date = now + relativedelta(months=parts.month_offset)
+        if parts.scope_end == "month":
+            return today + relativedelta(months=parts.month_offset, day=31), False
+        return date, True
+
+    if parts.year_offset is not None:
+        if parts.scope_end == "year":
+            return datetime(today.year + parts.year_offset, 12, 31, tzinfo=now.tzinfo), False
+        return now + relativedelta(years=parts.year_offset), True
+
+    if parts.day_offset is not None:
+        return now + timedelta(days=parts.day_offset), True
+
+    if parts.weekday is not None:
+        return today + timedelta(days=(parts.weekday - today.weekday()) % 7), False
+
+    return None, False
+
+
+def _resolve_time(parts):
+    """時刻の部品から (時, 分) を決める（指定が無ければ None）"""
+    default_hour, pm = PERIODS.get(parts.period, (None, False))
+    if parts.hour is not None:
+        hour = parts.hour
+        if pm and hour < 12:
+            hour += 12
+        elif hour == 12 and parts.period in MIDNIGHT_PERIODS:
+            hour = 24                                    # 「夜12時」は翌日の 0:00
+        return hour, parts.minute or 0
+    if default_hour is not None:
+        return default_hour, 0
+    return None
+
+
+def parse_time(text):
+    """
+    時刻だけの表現（「19時」「夜」「午前10時半」）を (時, 分) にする。
+
+    日付の部品を含む場合や解釈できない場合は None（毎週金曜の19時 などの時刻部分に使う）。
+    """
+    text = unicodedata.normalize("NFKC", text).strip()
+    parts = _tokenize(text) if text else None
+    if parts is None:
+        return None
+    date_parts = (
+        parts.year, parts.month, parts.day, parts.day_offset, parts.week_offset,
+        parts.month_offset, parts.year_offset, parts.weekday, parts.delta,
+    )
+    if any(p is not None for p in date_parts):
+        return None
+    return _resolve_time(parts)
+
+
+def parse(text, now):
+    """
+    日本語の日時表現を now 基準で datetime に変換する。
+
+    規則で解釈できない場合は None を返す。
+    """
+    text = unicodedata.normalize("NFKC", text).strip()
+    if not text:
+        return None
+    parts = _tokenize(text)
+    if parts is None:
+        return None
+
+    try:
+        if parts.delta is not None:
+            date, relative = now + parts.delta, True
+            # 「3日後の夜」のように日付の部品が他にもあれば、そちらは無視しない
+            if parts.day_offset is not None:
+                date = date + timedelta(days=parts.day_offset)
+        else:
+            date, relative = _resolve_date(parts, now)
+
+        time_of_day = _resolve_time(parts)
+        if date is None:
+            if time_of_day is None:
+                return None
+            # 時刻だけ（「午後3時」「夜」）は今日の時刻とする
+            date = now
+
+        if relative and time_of_day is None:
+            return date
+        midnight = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if time_of_day is None:
+            return midnight
+        # 「25時」のような 24 時以降の表記は翌日に繰り越す
+        hour, minute = time_of_day
+        return midnight + timedelta(hours=hour, minutes=minute)
+    except (ValueError, OverflowError):
+        # 2月30日・13月 など存在しない日時、範囲外の年
+        return None
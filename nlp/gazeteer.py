@@ -8,18 +8,29 @@ CSVファイルから「学校」「駅」「病院」などの名前を読み
 import csv
 from rapidfuzz import fuzz
 
+from .gazeteer_artifact import open_artifact
+
 # =============================
-# グローバル変数
+# 設定
 # =============================
-PLACES = []  # 全施設データを格納
+# 「入力が施設名に含まれる」方向の部分一致も候補にするカテゴリ
+BIDIRECTIONAL_CATEGORIES = ("学校", "病院", "観光地")
+
+# 読み込む CSV とカテゴリ（この順で施設番号が振られる）
+CSV_SOURCES = [
+    ("data/schools.csv", "学校"),
+    ("data/stations.csv", "駅"),
+    ("data/hospital.csv", "病院"),
+    ("data/touristspots.csv", "観光地"),  # 観光地も追加
+]
 
 
 # =============================
 # CSV 読み込み関数
 # =============================
-def load_csv(file_path, category):
+def load_csv(file_path, category, places):
     """
-    指定した CSV ファイルを読み込み、PLACES に追加する。
+    指定した CSV ファイルを読み込み、places に追加する。
 
     Parameters
     ----------
@@ -27,6 +38,8 @@ def load_csv(file_path, category):
         CSV ファイルのパス
     category : str
         「学校」「駅」「病院」などのカテゴリ
+    places : list
+        施設データの追加先
 
     Notes
     -----
@@ -48,7 +61,7 @@ def load_csv(file_path, category):
             reader = csv.reader(csvfile)
             for row in reader:
                 name = row[0]  # CSVの1列目が施設名と想定
-                PLACES.append({
+                places.append({
                     "name": name,
                     "category": category,
                     "size": size_fixed
@@ -57,18 +70,37 @@ def load_csv(file_path, category):
         print(f"[ERROR] {file_path} が見つかりません。")
 
 
-# =============================
-# CSV データ読み込み（初期化）
-# =============================
-load_csv("data/schools.csv", "学校")
-load_csv("data/stations.csv", "駅")
-load_csv("data/hospital.csv", "病院")
-load_csv("data/touristspots.csv", "観光地")  # 観光地も追加
+def load_places():
+    """
+    CSV_SOURCES の CSV をすべて読み込み、施設データのリストとカテゴリ一覧を返す。
+
+    検索には使わず、バイナリファイルを作る時（とベンチマーク）だけ呼ばれる。
+    """
+    places = []
+    for path, category in CSV_SOURCES:
+        load_csv(path, category, places)
+    categories = [category for _, category in CSV_SOURCES]
+    return places, categories
 
 
 # =============================
-# 場所検索関数
+# 検索インデックス
 # =============================
+_INDEX = None
+
+
+def get_index():
+    """
+    data/*.csv をまとめたバイナリファイルを mmap で開き、以降は同じものを返す。
+
+    ファイルが古い・無い場合は gazeteer_artifact が作り直す。
+    """
+    global _INDEX
+    if _INDEX is None:
+        _INDEX = open_artifact(load_places, CSV_SOURCES)
+    return _INDEX
+
+
 # =============================
 # 場所検索関数（完全一致 → 部分一致 → 類似度で選出）
 # =============================
@@ -81,53 +113,32 @@ def lookup_place(name):
     2. 完全一致がなければ部分一致で候補リスト作成
     3. 複数候補がある場合は RapidFuzz 類似度で最適候補を返す
     4. 一致が無ければ {"category": "不明", "size": None} を返す
+
+    全件走査はせず、get_index() の索引から候補だけを取り出す。
+    候補は CSV の並び順で評価するので、同点時の結果も全件走査と同じ。
     """
+    index = get_index()
 
     # 1. 完全一致検索
-    for place in PLACES:
-        if place["category"] == "駅":
-            if name == place["name"]:
-                return {"category": place["category"]}
-
-        elif place["category"] == "病院":
-            if name == place["name"]:
-                return {"category": place["category"]}
-
-        elif place["category"] == "観光地":
-            if name == place["name"]:
-                return {"category": place["category"]}
-
-        elif place["category"] == "学校":
-            if name == place["name"]:
-                return {"category": place["category"]}
+    found = index.find_exact(name)
+    if found is not None:
+        return {"category": index.category(found)}
 
     # 2. 部分一致候補リスト作成
-    candidates = []
-    for place in PLACES:
-        if place["category"] == "駅":
-            if name.endswith("駅") and place["name"] in name:
-                candidates.append(place)
-
-        elif place["category"] == "病院":
-            if place["name"] in name or name in place["name"]:
-                candidates.append(place)
-
-        elif place["category"] == "観光地":
-            if place["name"] in name or name in place["name"]:
-                candidates.append(place)
-
-        elif place["category"] == "学校":
-            if place["name"] in name or name in place["name"]:
-                candidates.append(place)
-
-        else:
-            if place["name"] in name:
-                candidates.append(place)
+    #    駅   : 入力が「駅」で終わり、駅名が入力に含まれる
+    #    その他: 施設名が入力に含まれる、または入力が施設名に含まれる
+    ids = set(index.names_in(name))
+    ids.update(
+        i for i in index.containing(name)
+        if index.category(i) in BIDIRECTIONAL_CATEGORIES
+    )
+    if not name.endswith("駅"):
+        ids = {i for i in ids if index.category(i) != "駅"}
 
     # 3. 候補がある場合
-    if candidates:
-        best_place = max(candidates, key=lambda p: fuzz.ratio(name, p["name"]))
-        return {"category": best_place["category"]}
+    if ids:
+        best = max(sorted(ids), key=lambda i: fuzz.ratio(name, index.name(i)))
+        return {"category": index.category(best)}
 
     # 4. 一致がない場合は "不明" を返す
     return {"category": "不明"}
@@ -0,0 +1,313 @@
+# gazeteer_artifact.py
+"""
+地名・施設名データ（data/*.csv）を 1 つのバイナリファイルにまとめ、
+mmap で開いて検索するためのモジュール。
+
+CSV を各ワーカーが Python の dict に読み込む代わりに、
+事前に作ったファイルを mmap で開くだけにする。
+ファイルの中身は OS のページキャッシュとして uvicorn の全ワーカーで共有される。
+
+ファイル構成（リトルエンディアン）
+--------------------------------
+ヘッダ   : magic, 形式バージョン, チェックサム(sha256), 件数, 最大名前長
+セクション表: (offset, length) × SECTION_COUNT
+セクション :
+    0 categories   カテゴリ名を "\\n" で連結した UTF-8
+    1 strings      全施設名を連結した UTF-8
+    2 offsets      uint32[n+1]  strings 内の各施設名の開始位置
+    3 cats         uint8[n]     カテゴリ番号
+    4 sorted       uint32[n]    (名前, 番号) 順に並べた施設番号
+    5 hashtable    uint32[T]    名前の crc32 → sorted 内の位置 + 1（0 は空き）
+    6 gram_keys    uint64[G]    2-gram（2文字のコードポイント）を昇順に
+    7 gram_offsets uint32[G+1]  gram_postings 内の開始位置
+    8 gram_postings uint32[P]   2-gram を含む施設番号
+
+作り直しは次のコマンドで行う（チェックサムが合わない場合は自動で作り直す）:
+    python -m nlp.gazeteer_artifact
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+
+# =============================
+# 定数
+# =============================
+MAGIC = b"GAZ1"
+FORMAT_VERSION = 1
+SECTION_COUNT = 9
+
+# magic, version, checksum, 件数, 最大名前長
+HEADER = struct.Struct("<4sI32sII")
+SECTION = struct.Struct("<QQ")
+
+DEFAULT_PATH = os.getenv("GAZETTEER_ARTIFACT", "data/gazetteer.bin")
+
+
+# =============================
+# チェックサム
+# =============================
+def source_checksum(sources):
+    """
+    元 CSV の内容と形式バージョンから sha256 を計算する。
+
+    ファイルが無いソースも「無い」ことを含めてハッシュするので、
+    CSV を追加・削除・編集すると値が変わる。
+    """
+    h = hashlib.sha256()
+    h.update(MAGIC + struct.pack("<I", FORMAT_VERSION))
+    for path, category in sources:
+        h.update(f"{path}\0{category}\0".encode("utf-8"))
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except FileNotFoundError:
+            h.update(b"\0missing\0")
+    return h.digest()
+
+
+# =============================
+# 作成
+# =============================
+def _gram_key(a, b):
+    return (ord(a) << 32) | ord(b)
+
+
+def build_artifact(places, categories, checksum, path):
+    """
+    施設データ（name / category を持つ dict）の並びからバイナリファイルを作成する。
+
+    一時ファイルに書いてから os.replace で置き換えるので、
+    他のワーカーが読み込み中でも壊れたファイルは見えない。
+    """
+    cat_code = {c: i for i, c in enumerate(categories)}
+    names = [place["name"] for place in places]
+    n = len(names)
+
+    # 文字列表とオフセット
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = array("I", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    strings = b"".join(encoded)
+    cats = bytes(cat_code[place["category"]] for place in places)
+
+    # 名前順の並びとハッシュ表（同名のまとまりの先頭位置を引く）
+    order = sorted(range(n), key=lambda i: (encoded[i], i))
+    sorted_ids = array("I", order)
+    size = 1
+    while size < 2 * n:
+        size <<= 1
+    table = array("I", bytes(4 * size))
+    mask = size - 1
+    prev = None
+    for pos, i in enumerate(order):
+        if encoded[i] == prev:
+            continue
+        prev = encoded[i]
+        slot = zlib.crc32(prev) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = pos + 1
+
+    # 2-gram 転置索引
+    grams = {}
+    for i, name in enumerate(names):
+        for key in {_gram_key(name[j], name[j + 1]) for j in range(len(name) - 1)}:
+            grams.setdefault(key, []).append(i)
+    gram_keys = array("Q", sorted(grams))
+    gram_offsets = array("I", [0])
+    gram_postings = array("I")
+    for key in gram_keys:
+        gram_postings.extend(grams[key])
+        gram_offsets.append(len(gram_postings))
+
+    sections = [
+        "\n".join(categories).encode("utf-8"),
+        strings,
+        offsets.tobytes(),
+        cats,
+        sorted_ids.tobytes(),
+        table.tobytes(),
+        gram_keys.tobytes(),
+        gram_offsets.tobytes(),
+        gram_postings.tobytes(),
+    ]
+
+    # 各セクションは 8 バイト境界に揃える（memoryview.cast のため）
+    header_size = HEADER.size + SECTION.size * SECTION_COUNT
+    pos = (header_size + 7) & ~7
+    table_entries = []
+    body = bytearray()
+    for data in sections:
+        pad = (-pos) & 7
+        body += b"\0" * pad
+        pos += pad
+        table_entries.append((pos, len(data)))
+        body += data
+        pos += len(data)
+
+    max_len = max((len(name) for name in names), default=0)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, checksum, n, max_len)
+    header += b"".join(SECTION.pack(off, length) for off, length in table_entries)
+    header += b"\0" * (((header_size + 7) & ~7) - header_size)
+
+    directory = os.path.dirname(path) or "."
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def read_checksum(path):
+    """ファイルのヘッダからチェックサムを読む（読めなければ None）"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(head) < HEADER.size:
+        return None
+    magic, version, checksum, _, _ = HEADER.unpack(head)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    return checksum
+
+
+# =============================
+# 読み込み
+# =============================
+class GazetteerArtifact:
+    """
+    mmap したバイナリファイルに対する検索インデックス。
+
+    施設の情報は番号で扱い、名前やカテゴリは必要になった時だけ取り出す。
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+
+        _, _, self.checksum, self.count, self.max_len = HEADER.unpack_from(view, 0)
+        spans = [
+            SECTION.unpack_from(view, HEADER.size + SECTION.size * k)
+            for k in range(SECTION_COUNT)
+        ]
+        sec = [view[off:off + length] for off, length in spans]
+
+        self.categories = bytes(sec[0]).decode("utf-8").split("\n")
+        self._strings = sec[1]
+        self._offsets = sec[2].cast("I")
+        self._cats = sec[3]
+        self._sorted = sec[4].cast("I")
+        self._table = sec[5].cast("I")
+        self._mask = len(self._table) - 1
+        self._gram_keys = sec[6].cast("Q")
+        self._gram_offsets = sec[7].cast("I")
+        self._gram_postings = sec[8].cast("I")
+
+    def __len__(self):
+        return self.count
+
+    def _name_bytes(self, i):
+        return self._strings[self._offsets[i]:self._offsets[i + 1]]
+
+    def name(self, i):
+        return bytes(self._name_bytes(i)).decode("utf-8")
+
+    def category(self, i):
+        return self.categories[self._cats[i]]
+
+    def _group(self, name):
+        """同じ名前を持つ施設番号を番号順に返す"""
+        b = name.encode("utf-8")
+        slot = zlib.crc32(b) & self._mask
+        while True:
+            entry = self._table[slot]
+            if not entry:
+                return []
+            pos = entry - 1
+            if self._name_bytes(self._sorted[pos]) == b:
+                break
+            slot = (slot + 1) & self._mask
+        ids = []
+        while pos < self.count and self._name_bytes(self._sorted[pos]) == b:
+            ids.append(self._sorted[pos])
+            pos += 1
+        return ids
+
+    def find_exact(self, name):
+        """完全一致する最初の施設番号を返す（無ければ None）"""
+        ids = self._group(name)
+        return ids[0] if ids else None
+
+    def names_in(self, name):
+        """施設名が name に含まれる施設番号を返す"""
+        hits = []
+        n = len(name)
+        for start in range(n):
+            for end in range(start + 1, min(n, start + self.max_len) + 1):
+                hits.extend(self._group(name[start:end]))
+        return hits
+
+    def containing(self, name):
+        """name を含む施設名を持つ施設番号を返す"""
+        if len(name) < 2:
+            # 1文字以下は 2-gram で絞れないので全件から探す（稀なケース）
+            return [i for i in range(self.count) if name in self.name(i)]
+
+        rarest = None
+        for key in {_gram_key(name[j], name[j + 1]) for j in range(len(name) - 1)}:
+            k = bisect_left(self._gram_keys, key)
+            if k == len(self._gram_keys) or self._gram_keys[k] != key:
+                return []
+            span = (self._gram_offsets[k], self._gram_offsets[k + 1])
+            if rarest is None or span[1] - span[0] < rarest[1] - rarest[0]:
+                rarest = span
+        # UTF-8 はバイト列のままでも部分一致を判定できるので decode しない
+        b = name.encode("utf-8")
+        postings = self._gram_postings[rarest[0]:rarest[1]]
+        return [i for i in postings if b in bytes(self._name_bytes(i))]
+
+
+def open_artifact(places_loader, sources, path=DEFAULT_PATH):
+    """
+    チェックサムが元 CSV と一致すればファイルをそのまま開き、
+    一致しない（古い・壊れている・無い）場合は作り直してから開く。
+
+    places_loader は施設データの並びとカテゴリ一覧を返す関数
+    （作り直す時だけ呼ばれる）。
+    """
+    checksum = source_checksum(sources)
+    if read_checksum(path) != checksum:
+        places, categories = places_loader()
+        build_artifact(places, categories, checksum, path)
+    return GazetteerArtifact(path)
+
+
+# =============================
+# CLI
+# =============================
+def main(argv=None):
+    from . import gazeteer
+
+    ap = argparse.ArgumentParser(description="data/*.csv から地名・施設名のバイナリファイルを作成する")
+    ap.add_argument("--output", default=DEFAULT_PATH, help="出力先")
+    args = ap.parse_args(argv)
+
+    checksum = source_checksum(gazeteer.CSV_SOURCES)
+    places, categories = gazeteer.load_places()
+    build_artifact(places, categories, checksum, args.output)
+    size = os.path.getsize(args.output)
+    print(f"{args.output}: {len(places)} 件, {size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# gazetteer_matcher.py
+"""
+gazetteer（data/*.csv の学校・駅・病院・観光地の名前）と完全一致する箇所を
+固有表現にする spaCy コンポーネント（"gazetteer_matcher"）。
+
+    nlp.add_pipe("gazetteer_matcher", after="ner")
+
+トークンの区切りで始まり・終わる部分文字列を、長いものから gazetteer のハッシュ表で引く
+（トークンの並びの trie をたどるのと同じ結果を、文字列のまま引いている）。
+一致した箇所はラベル GAZETTEER_LABEL、kb_id にカテゴリ（"駅" など）を付けて doc.ents に入れる。
+NER の結果と重なる場合は長い方、同じ長さなら gazetteer の方を残す。
+processor はカテゴリを kb_id から読むので、lookup_place でもう一度探さない。
+
+照合の表は gazeteer_artifact のバイナリファイル（mmap）をそのまま使う。
+PhraseMatcher に 71k 件のパターンを入れる場合、Sudachi でのトークン化に約 9 秒、
+pickle した 57 MB の読み込みに約 3.6 秒かかるが、こちらは開くだけなので数ミリ秒。
+to_disk / from_disk は設定と、作った時の gazetteer のチェックサムだけを保存する。
+"""
+
+import logging
+
+import srsly
+from spacy.language import Language
+from spacy.tokens import Span
+from spacy.util import ensure_path, filter_spans
+
+from .gazeteer import get_index
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_LABEL = "Gazetteer"
+
+
+@Language.factory("gazetteer_matcher", default_config={"min_chars": 3, "max_tokens": 8})
+def make_gazetteer_matcher(nlp, name, min_chars, max_tokens):
+    return GazetteerMatcher(name, min_chars, max_tokens)
+
+
+class GazetteerMatcher:
+    """
+    Parameters
+    ----------
+    min_chars : int
+        これより短い名前は照合しない（「駅」1 文字などの誤検出を避ける）
+    max_tokens : int
+        1 つの名前に含められるトークン数の上限
+    """
+
+    def __init__(self, name="gazetteer_matcher", min_chars=3, max_tokens=8):
+        self.name = name
+        self.min_chars = min_chars
+        self.max_tokens = max_tokens
+
+    def __call__(self, doc):
+        index = get_index()
+        text = doc.text
+        matches = []
+        i, n = 0, len(doc)
+        while i < n:
+            start_char = doc[i].idx
+            best = None
+            # 最長一致（gazetteer の最大の名前長を超えたら打ち切る）
+            for j in range(i, min(n, i + self.max_tokens)):
+                end_char = doc[j].idx + len(doc[j])
+                length = end_char - start_char
+                if length > index.max_len:
+                    break
+                if length >= self.min_chars:
+                    found = index.find_exact(text[start_char:end_char])
+                    if found is not None:
+                        best = (j + 1, found)
+            if best is None:
+                i += 1
+                continue
+            end, found = best
+            matches.append(Span(doc, i, end, label=GAZETTEER_LABEL, kb_id=index.category(found)))
+            i = end
+
+        if matches:
+            # filter_spans は同じ長さなら先に並んだ方を残す
+            doc.ents = filter_spans(matches + list(doc.ents))
+        return doc
+
+    def to_disk(self, path, exclude=tuple()):
+        path = ensure_path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        srsly.write_json(path / "cfg.json", {
+            "min_chars": self.min_chars,
+            "max_tokens": self.max_tokens,
+            "checksum": get_index().checksum.hex(),
+        })
+
+    def from_disk(self, path, exclude=tuple()):
+        cfg = srsly.read_json(ensure_path(path) / "cfg.json")
+        self.min_chars = cfg["min_chars"]
+        self.max_tokens = cfg["max_tokens"]
+        if cfg["checksum"] != get_index().checksum.hex():
+            logger.warning("保存時と gazetteer のデータが違います（現在のデータで照合します）")
+        return self
@@ -0,0 +1,220 @@
+# jp_holidays.py
+"""
+日本の祝日を O(1) で判定するための索引。
+
+年ごとに「1月1日からの日数」をビット位置にしたビットマップを 1 度だけ作り、
+is_holiday は辞書引き 1 回とビット演算だけで判定する。
+
+祝日の出どころ
+- data/syukujitsu.csv に「日付,名称」の行があれば、その年はそれを使う
+  （内閣府の CSV の形式。BOM 付き・"2025/8/11" のような日付に対応）
+- CSV に無い年は、祝日法の規則（ハッピーマンデー・春分/秋分の近似式・
+  振替休日・国民の休日・2019〜2021 年の特例）から計算する
+
+リポジトリの data/syukujitsu.csv は名称の列しか無いので、
+現状はすべての年を計算で求めている。
+"""
+
+import csv
+import os
+import re
+import threading
+from datetime import date, timedelta
+
+# =============================
+# 設定
+# =============================
+HOLIDAY_CSV = os.getenv("HOLIDAY_CSV", "data/syukujitsu.csv")
+
+# 計算で求める年の範囲（春分・秋分の近似式が使える範囲）
+MIN_YEAR = 1980
+MAX_YEAR = 2099
+
+DATE_PATTERN = re.compile(r"^\s*(\d{4})[/\-年](\d{1,2})[/\-月](\d{1,2})日?\s*$")
+
+
+# =============================
+# 規則による計算
+# =============================
+def _nth_weekday(year, month, n, weekday=0):
+    """year 年 month 月の第 n 週の曜日（既定は月曜）"""
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _equinox_day(year, base):
+    """春分（base=20.8431）・秋分（base=23.2488）の日（1980〜2099 年の近似式）"""
+    return int(base + 0.242194 * (year - 1980) - (year - 1980) // 4)
+
+
+def compute_holidays(year):
+    """
+    祝日法の規則から year 年の祝日を計算する。
+
+    Returns
+    -------
+    dict[date, str]
+        日付 → 祝日名
+    """
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        return {}
+
+    days = {
+        date(year, 1, 1): "元日",
+        date(year, 2, 11): "建国記念の日",
+        date(year, 3, _equinox_day(year, 20.8431)): "春分の日",
+        date(year, 5, 3): "憲法記念日",
+        date(year, 5, 5): "こどもの日",
+        date(year, 9, _equinox_day(year, 23.2488)): "秋分の日",
+        date(year, 11, 3): "文化の日",
+        date(year, 11, 23): "勤労感謝の日",
+    }
+
+    # 成人の日・体育の日（2000 年からハッピーマンデー）
+    if year >= 2000:
+        days[_nth_weekday(year, 1, 2)] = "成人の日"
+    else:
+        days[date(year, 1, 15)] = "成人の日"
+
+    if year >= 2020:
+        days[date(year, 2, 23)] = "天皇誕生日"
+    elif 1989 <= year <= 2018:
+        days[date(year, 12, 23)] = "天皇誕生日"
+    elif year < 1989:
+        days[date(year, 4, 29)] = "天皇誕生日"
+
+    if 1989 <= year:
+        days[date(year, 4, 29)] = "昭和の日" if year >= 2007 else "みどりの日"
+    if year >= 2007:
+        days[date(year, 5, 4)] = "みどりの日"
+
+    # 海の日・山の日・スポーツの日（2020・2021 年は東京五輪の特例）
+    special = {
+        2020: {"海の日": date(2020, 7, 23), "スポーツの日": date(2020, 7, 24), "山の日": date(2020, 8, 10)},
+        2021: {"海の日": date(2021, 7, 22), "スポーツの日": date(2021, 7, 23), "山の日": date(2021, 8, 8)},
+    }.get(year, {})
+    if year >= 1996:
+        days[special.get("海の日") or (_nth_weekday(year, 7, 3) if year >= 2003 else date(year, 7, 20))] = "海の日"
+    if year >= 2016:
+        days[special.get("山の日") or date(year, 8, 11)] = "山の日"
+    if year >= 1966:
+        days[_nth_weekday(year, 9, 3) if year >= 2003 else date(year, 9, 15)] = "敬老の日"
+        name = "スポーツの日" if year >= 2020 else "体育の日"
+        days[special.get("スポーツの日") or (_nth_weekday(year, 10, 2) if year >= 2000 else date(year, 10, 10))] = name
+
+    # 天皇の即位に伴う 2019 年の特例
+    if year == 2019:
+        days[date(2019, 5, 1)] = "休日（祝日扱い）"
+        days[date(2019, 10, 22)] = "休日（祝日扱い）"
+
+    # 国民の休日: 前後を祝日に挟まれた平日
+    for day in sorted(days):
+        middle = day + timedelta(days=1)
+        if middle not in days and day + timedelta(days=2) in days and middle.weekday() != 6:
+            days[middle] = "休日"
+
+    # 振替休日: 日曜の祝日の後の最初の平日（2007 年以降の規則）
+    for day in sorted(days):
+        if day.weekday() == 6:
+            substitute = day + timedelta(days=1)
+            while substitute in days:
+                substitute += timedelta(days=1)
+            days[substitute] = "休日"
+
+    return days
+
+
+# =============================
+# CSV
+# =============================
+def load_holiday_csv(path=HOLIDAY_CSV):
+    """
+    内閣府形式の祝日 CSV を読み込む。
+
+    日付の列が無い行（見出し・名称だけの行）は読み飛ばす。
+
+    Returns
+    -------
+    dict[int, dict[date, str]]
+        年 → (日付 → 祝日名)
+    """
+    by_year = {}
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.reader(f):
+                if not row:
+                    continue
+                m = DATE_PATTERN.match(row[0])
+                if m is None:
+                    continue
+                day = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+                name = row[1].strip() if len(row) > 1 else "祝日"
+                by_year.setdefault(day.year, {})[day] = name
+    except FileNotFoundError:
+        pass
+    return by_year
+
+
+# =============================
+# 索引
+# =============================
+class HolidayIndex:
+    """
+    年ごとの祝日ビットマップ。
+
+    年のビットマップは最初に問い合わせがあった時に 1 度だけ作る
+    （CSV にある年は CSV、無い年は compute_holidays）。
+    """
+
+    def __init__(self, csv_days=None):
+        self._csv_days = csv_days or {}
+        self._bitmaps = {}   # 年 → int（ビット i = 1月1日から i 日目）
+        self._names = {}     # 年 → dict[date, str]
+        self._lock = threading.Lock()
+
+    def _year(self, year):
+        bitmap = self._bitmaps.get(year)
+        if bitmap is None:
+            with self._lock:
+                if year not in self._bitmaps:
+                    names = self._csv_days.get(year) or compute_holidays(year)
+                    bitmap = 0
+                    for day in names:
+                        bitmap |= 1 << (day.timetuple().tm_yday - 1)
+                    self._names[year] = names
+                    self._bitmaps[year] = bitmap
+                bitmap = self._bitmaps[year]
+        return bitmap
+
+    def is_holiday(self, day):
+        """day（date / datetime）が祝日・休日かどうか"""
+        return bool(self._year(day.year) >> (day.timetuple().tm_yday - 1) & 1)
+
+    def name(self, day):
+        """祝日名（祝日でなければ None）"""
+        if not self.is_holiday(day):
+            return None
+        return self._names[day.year].get(day if type(day) is date else date(day.year, day.month, day.day))
+
+    def holidays(self, year):
+        """year 年の祝日（日付順）"""
+        self._year(year)
+        return sorted(self._names[year].items())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_holiday_index():
+    """プロセスで共有する HolidayIndex（CSV は最初の 1 回だけ読む）"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = HolidayIndex(load_holiday_csv())
+    return _index
+
+
+def is_holiday(day):
+    return get_holiday_index().is_holiday(day)
@@ -0,0 +1,126 @@
+# logs.py
+"""
+ログの設定と、リクエストごとの詳細ログの間引き・投稿文の伏せ字。
+
+- configure(level, fmt): ルートロガーに QueueHandler を付け、整形と書き出しは
+  QueueListener のスレッドで行う（リクエストを処理するスレッドは書き出しを待たない）
+- start_request() / end_request(token): リクエストの詳細ログを出すかを
+  LOG_SAMPLE_RATE で決める（main.py のミドルウェアから呼ぶ）
+- detail_enabled(logger): レベルと間引きの両方を満たすか。満たさなければ
+  呼び出し側はログの引数も作らない
+- redact(text): 投稿文などを長さとハッシュだけにして出す（整形する時に初めて計算する）
+
+    if logs.detail_enabled(logger):
+        logger.debug("入力: %s", logs.redact(tweet))
+
+設定（環境変数）
+- LOG_QUEUE      : "0" でキューを使わず、呼び出したスレッドで書き出す
+- LOG_SAMPLE_RATE: 詳細ログを出すリクエストの割合（0〜1、既定 1）
+- LOG_RAW_TEXT   : "1" で投稿文・抽出したテキストを伏せずに出す（手元のデバッグ用）
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import random
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# =============================
+# 設定
+# =============================
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") != "0"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+LOG_RAW_TEXT = os.getenv("LOG_RAW_TEXT", "0") == "1"
+
+_listener = None
+
+
+# =============================
+# ハンドラー
+# =============================
+class _DeferredQueueHandler(QueueHandler):
+    """
+    LogRecord を整形せずにキューへ入れる QueueHandler。
+
+    標準の QueueHandler は別プロセスへ送れるように呼び出したスレッドで整形するが、
+    同じプロセスの QueueListener が受け取るので、整形も向こうのスレッドに任せる。
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure(level, fmt):
+    """ルートロガーを設定する（2 回目以降は何もしない）"""
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None or root.handlers:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt))
+    if not LOG_QUEUE:
+        root.addHandler(handler)
+        return
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """キューに残ったログを書き出して QueueListener を止める"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# =============================
+# 間引き
+# =============================
+# リクエストの外（ウォームアップ・ベンチマークなど）では間引かない
+_sampled = ContextVar("log_sampled", default=True)
+
+
+def start_request():
+    """このリクエストの詳細ログを出すかを決める。end_request に渡すトークンを返す"""
+    return _sampled.set(LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE)
+
+
+def end_request(token):
+    _sampled.reset(token)
+
+
+def detail_enabled(logger, level=logging.DEBUG):
+    """logger が level を出力し、かつこのリクエストが間引かれていないか"""
+    return logger.isEnabledFor(level) and _sampled.get()
+
+
+# =============================
+# 伏せ字
+# =============================
+class _Redacted:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        if LOG_RAW_TEXT:
+            return self.text
+        digest = hashlib.blake2b(self.text.encode("utf-8"), digest_size=4).hexdigest()
+        return f"<{len(self.text)}文字 {digest}>"
+
+    __repr__ = __str__
+
+
+def redact(text):
+    """ログに出す時だけ長さとハッシュにする（LOG_RAW_TEXT=1 ならそのまま）"""
+    return _Redacted(text)
@@ -0,0 +1,146 @@
+# metrics.py
+"""
+処理の段階ごとの時間を測り、ヒストグラムに集計するモジュール。
+
+    with metrics.stage("nlp"):
+        doc = parse_text(tweet)
+
+集計結果は main.py の GET /metrics から Prometheus のテキスト形式で返す。
+リクエストの処理中（start_request 〜 end_request）に測った時間は、
+リクエストごとにも合計しておき、Server-Timing ヘッダーに使う。
+
+NLP_EXECUTION_MODE=process の場合、ワーカープロセス内の段階（nlp・date_norm など）は
+そのプロセスで集計されるため /metrics には出ない（diagnosis にまとめて現れる）。
+
+設定（環境変数）
+- METRICS_ENABLED: "0" で計測しない（stage は何もしない共有のコンテキストを返す）
+- SERVER_TIMING  : "1" で応答に Server-Timing ヘッダーを付ける
+"""
+
+import os
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+
+# =============================
+# 設定
+# =============================
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+# ヒストグラムの区切り（秒）
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_NAME = "sns_stage_seconds"
+
+
+# =============================
+# ヒストグラム
+# =============================
+class Histogram:
+    """区切りごとの件数・合計・件数を持つヒストグラム（スレッドセーフ）"""
+
+    __slots__ = ("counts", "sum", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+# リクエストごとの段階の合計（Server-Timing 用。リクエスト外では None）
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def observe(name, seconds):
+    """段階 name に seconds を記録する"""
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, Histogram())
+    hist.observe(seconds)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+# =============================
+# 計測
+# =============================
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, perf_counter() - self.start)
+        return False
+
+
+_DISABLED = nullcontext()
+
+
+def stage(name):
+    """with で囲んだ処理の時間を段階 name として記録する（無効なら何もしない）"""
+    if not METRICS_ENABLED:
+        return _DISABLED
+    return _Stage(name)
+
+
+def start_request():
+    """リクエストの処理を始める時に呼ぶ。(段階ごとの合計, end_request に渡すトークン) を返す"""
+    timings = {}
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token):
+    _request_timings.reset(token)
+
+
+def server_timing(timings):
+    """段階ごとの合計から Server-Timing ヘッダーの値を作る"""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+
+
+# =============================
+# Prometheus のテキスト形式
+# =============================
+def render_prometheus():
+    lines = [
+        f"# HELP {METRIC_NAME} Time spent in each processing stage.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    for name, hist in items:
+        counts, total, count = hist.snapshot()
+        cumulative = 0
+        for le, n in zip((*map(str, BUCKETS), "+Inf"), counts):
+            cumulative += n
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{name}"}} {total}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
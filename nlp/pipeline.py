@@ -1,26 +1,87 @@
+import os
+import threading
 import spacy
 from spacy.pipeline import EntityRuler
 from pathlib import Path
 import yaml
 
+from . import gazetteer_matcher  # "gazetteer_matcher" コンポーネントの登録
+
+# =============================
+# 設定
+# =============================
+# 使うモデル: "ja_ginza"（CNN・軽量）または "ja_ginza_electra"（Transformer・高精度）
+NLP_MODEL = os.getenv("NLP_MODEL", "ja_ginza")
+
+# パイプラインのプロファイル
+#   full    : モデルの全コンポーネントを読み込む
+#   entities: tweet_diagnosis が使うのは doc.ents だけなので、
+#             固有表現抽出に不要なコンポーネントを読み込まない
+#             （ja_ginza では 1 件あたり 15% ほど速い。外すコンポーネントの重みは 2 MB ほどで、
+#             メモリの大半は Sudachi の辞書・語彙・tok2vec なので RSS はほぼ変わらない。
+#             python -m bench.pipeline_profiles で確認）
+NLP_PROFILE = os.getenv("NLP_PROFILE", "entities")
+
+# gazetteer の名前と完全一致する箇所を固有表現にするか（nlp/gazetteer_matcher.py）
+GAZETTEER_MATCHER = os.getenv("NLP_GAZETTEER_MATCHER", "1") != "0"
+
+# プロファイルごとに読み込まないコンポーネント（モデルに無い名前は無視される）
+PROFILE_EXCLUDES = {
+    "full": [],
+    "entities": [
+        "parser",              # 係り受け解析
+        "bunsetu_recognizer",  # 文節の認識（parser の結果を使う）
+        "compound_splitter",   # 複合語の分割
+        "morphologizer",       # 品詞・活用形
+        "attribute_ruler",     # タグ → 品詞の対応付け（ja_ginza_electra のみ）
+    ],
+}
+
 _nlp = None
+_nlp_lock = threading.Lock()
 
 def get_nlp():
     """
     GiNZAモデル + EntityRulerを入れたNLPを返す。
     最初に呼び出したときだけ作り、その後は同じインスタンスを返す。
+    複数スレッドから同時に呼ばれても、モデルの読み込みは 1 プロセスで 1 回だけ。
     """
     global _nlp
     if _nlp is None:
-        # GiNZAモデルをロード
-        _nlp = spacy.load("ja_ginza")
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = load_nlp(NLP_MODEL, NLP_PROFILE)
+    return _nlp
 
-        # EntityRuler のパターンファイルを読み込み
-        patterns_path = Path("nlp/patterns/entity_ruler.yml")
-        if patterns_path.exists():
-            with open(patterns_path, "r", encoding="utf-8") as f:
-                patterns = yaml.safe_load(f)
-            ruler = _nlp.add_pipe("entity_ruler", before="ner")
-            ruler.add_patterns(patterns)
 
-    return _nlp
+def load_nlp(model=NLP_MODEL, profile=NLP_PROFILE, gazetteer=GAZETTEER_MATCHER):
+    """
+    指定したモデルとプロファイルで NLP を作る（get_nlp と違い毎回新しく作る）。
+
+    Parameters
+    ----------
+    model : str
+        spaCy のモデル名（"ja_ginza" / "ja_ginza_electra"）
+    profile : str
+        PROFILE_EXCLUDES のキー
+    gazetteer : bool
+        gazetteer_matcher を NER の後ろに入れるか
+    """
+    if profile not in PROFILE_EXCLUDES:
+        raise ValueError(f"未知のプロファイルです: {profile}（{', '.join(PROFILE_EXCLUDES)} のいずれか）")
+
+    # GiNZAモデルをロード
+    nlp = spacy.load(model, exclude=PROFILE_EXCLUDES[profile])
+
+    # EntityRuler のパターンファイルを読み込み
+    patterns_path = Path("nlp/patterns/entity_ruler.yml")
+    if patterns_path.exists():
+        with open(patterns_path, "r", encoding="utf-8") as f:
+            patterns = yaml.safe_load(f)
+        ruler = nlp.add_pipe("entity_ruler", before="ner")
+        ruler.add_patterns(patterns)
+
+    if gazetteer:
+        nlp.add_pipe("gazetteer_matcher", after="ner" if "ner" in nlp.pipe_names else None)
+
+    return nlp
@@ -0,0 +1,159 @@
+# prenorm.py
+"""
+spaCy に渡す前にテキストを短くする正規化（NLP_PRENORM=1 の場合に processor が使う）。
+
+- NFKC（全角英数字・半角カナなどをそろえる。濁点などの結合文字は直前の文字とまとめて変換）
+- URL・@メンションを URL_MASK / MENTION_MASK に置き換える（その位置の固有表現は結果に含めない）
+- ハッシュタグの「#」を取る（タグの中身は地名などを含むので残す）
+- 絵文字の並びを 1 つの空白に、空白の並びを 1 つの空白にする
+- 同じ文字の繰り返し（「ｗｗｗｗ」「！！！！」）を MAX_RUN 文字までにする（数字はそのまま）
+
+正規化後の 1 文字ごとに、元のテキストでの (開始, 終了) を持つので、
+正規化後のテキストで見つけた固有表現の位置を元のテキストの位置に戻せる。
+連絡先（正規表現）は元のテキストで探すので、URL などを置き換えても結果は変わらない。
+"""
+
+import os
+import re
+import unicodedata
+from dataclasses import replace
+from typing import List, NamedTuple, Tuple
+
+# =============================
+# 設定
+# =============================
+# 同じ文字の繰り返しを何文字まで残すか
+MAX_RUN = int(os.getenv("NLP_PRENORM_MAX_RUN", "2"))
+
+URL_MASK = "URL"
+MENTION_MASK = "@user"
+
+# 置き換える箇所（URL・@メンション）
+# （URL は ASCII の URL に使える文字まで。日本語の文が空白なしで続くことが多いため。
+#   メールアドレスの「@」はメンションにしない）
+URL_CHARS = r"[A-Za-z0-9\-._~:/?#\[\]@!$&'()*+,;=%]+"
+MASK_PATTERN = re.compile(
+    rf"(?P<url>https?://{URL_CHARS}|www\.{URL_CHARS})"
+    r"|(?P<mention>(?<![A-Za-z0-9_.])[@＠][A-Za-z0-9_]{1,15})"
+)
+# ハッシュタグの「#」（後ろに空白以外が続くもの）
+HASHTAG_MARKS = frozenset("#＃")
+
+# 絵文字として取り除く文字（異体字セレクタ・ZWJ・囲み記号を含む）
+EMOJI_RANGES = (
+    (0x1F000, 0x1FAFF),  # 絵文字・国旗・肌の色など
+    (0x2600, 0x27BF),    # その他の記号・装飾記号（☀ ★ ♪ ✨ など）
+    (0x2B00, 0x2BFF),    # 矢印・⭐ など
+    (0xFE00, 0xFE0F),    # 異体字セレクタ
+    (0x200D, 0x200D),    # ZWJ
+    (0x20E3, 0x20E3),    # 囲み記号（キーキャップ）
+)
+# 直前の文字とまとめて NFKC にかける文字（半角カナの濁点・半濁点）
+JOINING_MARKS = frozenset("ﾞﾟ")
+
+
+def is_emoji(ch):
+    cp = ord(ch)
+    return any(lo <= cp <= hi for lo, hi in EMOJI_RANGES)
+
+
+class Normalized(NamedTuple):
+    """
+    正規化の結果。
+
+    text   : 正規化後のテキスト
+    starts : 正規化後の各文字の、元のテキストでの開始位置
+    ends   : 正規化後の各文字の、元のテキストでの終了位置
+    masks  : 置き換えた箇所（正規化後のテキストでの (開始, 終了)）
+    """
+    text: str
+    starts: List[int]
+    ends: List[int]
+    masks: List[Tuple[int, int]]
+
+    def original_span(self, start, end):
+        """正規化後の [start, end) を元のテキストの位置にする"""
+        return self.starts[start], self.ends[end - 1]
+
+    def map_spans(self, spans, original):
+        """
+        正規化後のテキストの EntitySpan を、元のテキストの位置・テキストにする。
+
+        置き換えた箇所（URL・@メンション）に重なるものは除く。
+        """
+        result = []
+        for span in spans:
+            if span.end <= span.start or any(s < span.end and span.start < e for s, e in self.masks):
+                continue
+            start, end = self.original_span(span.start, span.end)
+            result.append(replace(span, start=start, end=end, text=original[start:end]))
+        return result
+
+
+def prenormalize(text, max_run=MAX_RUN):
+    """テキストを正規化し、元のテキストへの位置の対応と一緒に返す（Normalized）"""
+    out, starts, ends, masks = [], [], [], []
+
+    def emit(chars, start, end):
+        for ch in chars:
+            out.append(ch)
+            starts.append(start)
+            ends.append(end)
+
+    def space(start, end):
+        # 先頭と、空白の直後には入れない（範囲は直前の空白に含める）
+        if not out:
+            return
+        if out[-1] == " ":
+            ends[-1] = end
+        else:
+            emit(" ", start, end)
+
+    mask_iter = MASK_PATTERN.finditer(text)
+    mask = next(mask_iter, None)
+    run = 0
+    i, n = 0, len(text)
+    while i < n:
+        while mask is not None and mask.start() < i:
+            mask = next(mask_iter, None)
+        ch = text[i]
+
+        if mask is not None and mask.start() == i:
+            masked = URL_MASK if mask.lastgroup == "url" else MENTION_MASK
+            masks.append((len(out), len(out) + len(masked)))
+            emit(masked, i, mask.end())
+            i, run = mask.end(), 0
+            continue
+
+        if ch in HASHTAG_MARKS and i + 1 < n and not text[i + 1].isspace():
+            i += 1
+            continue
+
+        if ch.isspace() or is_emoji(ch):
+            j = i + 1
+            while j < n and (text[j].isspace() or is_emoji(text[j])):
+                j += 1
+            space(i, j)
+            i, run = j, 0
+            continue
+
+        # 結合文字を直前の文字とまとめて NFKC にかける
+        j = i + 1
+        while j < n and (unicodedata.combining(text[j]) or text[j] in JOINING_MARKS):
+            j += 1
+        for norm in unicodedata.normalize("NFKC", text[i:j]):
+            if out and norm == out[-1] and not norm.isdigit():
+                run += 1
+                if run > max_run:
+                    ends[-1] = j  # 取り除いた繰り返しは最後に残した文字の範囲に含める
+                    continue
+            else:
+                run = 1
+            emit(norm, i, j)
+        i = j
+
+    if out and out[-1] == " ":
+        out.pop()
+        starts.pop()
+        ends.pop()
+    return Normalized("".join(out), starts, ends, masks)
@@ -1,13 +1,23 @@
 # processor.py
 
-import sys, os, traceback, pprint,dateparser
+import sys, os, logging, dateparser
+from collections import deque
+from dataclasses import replace
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
-from collections import defaultdict
-from .regex_rules import extract_all       # 正規表現でメール/電話/郵便番号を抽出する関数
+from .regex_rules import scan_contacts, NORMALIZE_TABLE  # 正規表現でメール/電話/郵便番号を抽出する関数
 from .date_norm import normalize_datetime  # DATE表現をISO形式に正規化する関数
-from .gazeteer import lookup_place         # 場所名をカテゴリ/規模に正規化する関数
+from .recurrence import PATTERN as RECURRENCE_PATTERN  # 繰り返しの予定（毎週金曜 など）の語
+from .gazeteer import lookup_place, get_index  # 場所名をカテゴリ/規模に正規化する関数
 from .pipeline import get_nlp              # spaCyのNLPモデルを取得する関数
+from .batcher import parse_texts           # 同時リクエストをまとめて解析する関数
+from .spans import EntitySpan, resolve_overlaps, result_dict  # 位置付きの結果
+from .gazetteer_matcher import GAZETTEER_LABEL  # gazetteer と一致した箇所のラベル
+from .metrics import stage                 # 段階ごとの時間の計測
+from .prenorm import prenormalize          # spaCy に渡す前の正規化（位置の対応付き）
+from .sentences import chunk_bounds        # 長いテキストを文の区切りで分ける
+from . import logs                         # 詳細ログの間引き・伏せ字
 
 
 # ===== 定数 =====
@@ -16,151 +26,336 @@ BASE_ISO = datetime(2025, 8, 17, 12, 0, tzinfo=ZoneInfo("Asia/Tokyo")).isoformat
 
 # 場所に関するエンティティラベルの一覧 (spaCyやカスタムモデルが出力するラベル)
 PLACE_LABELS = ["GPE", "Province", "FAC", "City", "ORG", "GOE_Other", "Organization_Other","station", "hospital"]
+# gazeteer のカテゴリ → 結果のラベル（ここに無いカテゴリは結果に含めない）
+PLACE_CATEGORY_LABELS = {"駅": "station", "病院": "hospital", "観光地": "tourristspot", "不明": "place"}
+# 日付として normalize_datetime で正規化するラベル（DATE は EntityRuler、ほかは GiNZA の NER）
+DATE_LABELS = ("DATE", "Date", "Day_Of_Week")
+# 繰り返しの語（毎週・毎朝 など）とつなげて 1 つの日時にするラベル
+# （GiNZA は「毎週金曜の夜」を 金曜=Day_Of_Week・夜=Time に分け、「毎週」を含めない）
+TEMPORAL_LABELS = DATE_LABELS + ("Time", "Period_Day")
+# 繰り返しの語と日時のエンティティの間に入ってよい文字列
+TEMPORAL_JOINERS = ("", "の")
 # 数字に関するエンティティラベル (カスタムNERが出力するラベル)
 
+# 起動時のウォームアップに使う文章（モデル・gazetteer・日付正規化を一通り通す）
+WARMUP_TEXT = "明日の10時に渋谷駅で田中さんと会います。連絡は090-1234-5678まで。"
 
+# tweet_diagnosis_many で nlp.pipe に 1 度に渡す件数
+PIPE_BATCH_SIZE = int(os.getenv("NLP_PIPE_BATCH_SIZE", "32"))
 
-# ===== ユーティリティ =====
-def pretty_print(title, data):
-    """見やすい形で結果を出力するヘルパー関数"""
-    print("\n" + "="*60)   # 区切り線
-    print(title)           # タイトル
-    print("="*60)          # 区切り線
-    pprint.pprint(data)    # データを見やすく整形して出力
+# 段階的な解析（NLP_CASCADE=1 の場合、tweet_spans・tweet_spans_many は先にルールだけで解析し、
+# 人名・年齢・地名などの兆候がある時だけ NER を含むモデル全体で解析し直す）
+CASCADE_ENABLED = os.getenv("NLP_CASCADE", "0") == "1"
+# モデル全体で解析し直す兆候（person / age / place / proper_noun をカンマ区切り）
+CASCADE_SIGNALS = frozenset(
+    s.strip() for s in os.getenv("NLP_CASCADE_SIGNALS", "person,age,place,proper_noun").split(",") if s.strip()
+)
+# 長いテキストは文の区切りで、この文字数以下のまとまりに分けて nlp.pipe でまとめて解析する
+# （Transformer の入力の上限 512 wordpiece に収まり、計算量が文字数に比例するように）
+# （1 未満は 1 にする。0 以下では分割が終わらないため）
+CHUNK_CHARS = max(1, int(os.getenv("NLP_CHUNK_CHARS", "400")))
+# 1 件あたり NLP で解析する文字数の上限（超えた部分は正規表現の連絡先だけを探す）。
+# AnalyzeReq の上限（10000 文字）より小さくして、1 件の最悪の解析時間をまとまり 10 個程度の分に抑える
+CHAR_BUDGET = int(os.getenv("NLP_CHAR_BUDGET", "4000"))
+
+# spaCy に渡す前にテキストを正規化するか（NFKC・URL/@メンションの置き換え・絵文字と繰り返しの除去。
+# 固有表現の位置は元のテキストに戻す。nlp/prenorm.py）
+PRENORM_ENABLED = os.getenv("NLP_PRENORM", "0") == "1"
+
+# 段階 1 で動かすルールのコンポーネント（トークン化の後に、この順で動かす）
+RULE_COMPONENTS = ("entity_ruler", "gazetteer_matcher")
+
+# 兆候の判定に使う語（品詞は Sudachi の品詞）
+NAME_SUFFIXES = frozenset({"さん", "くん", "君", "ちゃん", "様", "さま", "氏", "先生", "先輩", "殿"})
+AGE_COUNTERS = frozenset({"歳", "才", "代"})
+PLACE_WORDS = frozenset({
+    "駅", "病院", "医院", "学校", "小学校", "中学", "中学校", "高校", "大学", "公園",
+    "都", "道", "府", "県", "市", "区", "町", "村", "丁目", "番地",
+})
+
+
+
+logger = logging.getLogger(__name__)
 
 
 # ===== 処理 =====
 
 
 def analyze_entities(tweet, nlp):
-    """spaCyを使って固有表現抽出を行い、ラベルごとにまとめる"""
-    doc = nlp(tweet)                  # NLP解析を実行
-    entities = defaultdict(list)     # ラベルごとにリストを保持
-    for ent in doc.ents:             # doc.ents = 抽出されたエンティティ一覧
-        entities[ent.label_].append(ent.text)  # ラベルをキーにしてテキストを追加
-    return entities
+    """spaCyを使って固有表現抽出を行い、EntitySpan の並びにする"""
+    norm = prenormalize(tweet) if PRENORM_ENABLED else None
+    text = norm.text if norm else tweet
+    bounds = chunk_bounds(text[:CHAR_BUDGET], CHUNK_CHARS)
+    docs = nlp.pipe([text[start:end] for start, end in bounds])  # NLP解析を実行
+    return diagnose_spans(tweet, chunk_spans(docs, bounds), norm)
+
+
+@lru_cache(maxsize=4096)
+def normalize_date(text):
+    """
+    基準日時 BASE_ISO で日付を正規化する。
+
+    基準日時が固定なので結果はテキストだけで決まる。「明日」「来週」のように
+    同じ表現が何度も出てくるので、結果の辞書を使い回す（呼び出し側で書き換えないこと）。
+    """
+    return normalize_datetime(text, now_iso=BASE_ISO)
+
 
+def recurrence_spans(doc):
+    """
+    繰り返しの予定（「毎週金曜の夜」「毎朝7時」「毎月15日」）を date の EntitySpan にする。
+
+    recurrence.PATTERN に一致した箇所に、重なる・「の」でつながる日時のエンティティ
+    （TEMPORAL_LABELS）を足して 1 つの表現にし、normalize_datetime で繰り返しと
+    判定されたものだけを返す。
+    """
+    text = doc.text
+    temporal = [(ent.start_char, ent.end_char) for ent in doc.ents if ent.label_ in TEMPORAL_LABELS]
+    spans = []
+    for m in RECURRENCE_PATTERN.finditer(text):
+        start, end = m.span()
+        joined = True
+        while joined:
+            joined = False
+            for s, e in temporal:
+                if (s < end and start < e and (s < start or e > end)) \
+                        or (s >= end and text[end:s] in TEMPORAL_JOINERS) \
+                        or (e <= start and text[e:start] in TEMPORAL_JOINERS):
+                    start, end = min(start, s), max(end, e)
+                    joined = True
+        if spans and start < spans[-1].end:
+            continue
+        with stage("date_norm"):
+            norm = normalize_date(text[start:end])
+        if norm is not None and norm["is_repeated"]:
+            spans.append(EntitySpan(start, end, "date", text[start:end], norm))
+    return spans
+
+
+def ner_spans(doc):
+    """
+    解析済みの Doc のエンティティを EntitySpan にする。
 
-def extract_contacts(tweet):
-    """テキストからメール・電話番号・郵便番号を抽出する"""
+    結果に使うラベルだけを残し、日付は normalize_datetime、
+    場所は gazeteer でカテゴリに正規化する（gazetteer_matcher が付けた箇所は kb_id のカテゴリを使う）。
+    繰り返しの予定は recurrence_spans で 1 つの date にし、重なる日時のエンティティは使わない。
+    """
+    spans = recurrence_spans(doc)
+    repeated = [(span.start, span.end) for span in spans]
+    for ent in doc.ents:             # doc.ents = 抽出されたエンティティ一覧
+        label = ent.label_
+        if label in TEMPORAL_LABELS and any(s < ent.end_char and ent.start_char < e for s, e in repeated):
+            continue
+        if label == "Person":
+            spans.append(EntitySpan(ent.start_char, ent.end_char, "person", ent.text))
+        elif label == "Age":
+            if "-" not in ent.text:  # '-' を含むものは除外
+                spans.append(EntitySpan(ent.start_char, ent.end_char, "age", ent.text))
+        elif label in DATE_LABELS:
+            with stage("date_norm"):
+                norm = normalize_date(ent.text)                    # 正規化
+            spans.append(EntitySpan(ent.start_char, ent.end_char, "date", ent.text, norm))
+        elif label == GAZETTEER_LABEL:
+            result_label = PLACE_CATEGORY_LABELS.get(ent.kb_id_)
+            if result_label is not None:
+                spans.append(EntitySpan(ent.start_char, ent.end_char, result_label, ent.text, ent.kb_id_))
+        elif label in PLACE_LABELS:
+            with stage("gazetteer"):
+                category = lookup_place(ent.text)["category"]      # gazeteer辞書を使って正規化
+            result_label = PLACE_CATEGORY_LABELS.get(category)
+            if result_label is not None:
+                spans.append(EntitySpan(ent.start_char, ent.end_char, result_label, ent.text, category))
+    return spans
+
+
+def contact_spans(tweet):
+    """テキストからメール・電話番号・郵便番号を EntitySpan として抽出する"""
     if not tweet:
-        return None  # テキストが空の場合はNoneを返す
-    return extract_all(tweet)
-
-
-def normalize_dates(entities):
-    """DATEエンティティをISO形式に正規化する"""
-    results = []
-    for date_tweet in entities.get("DATE", []):   # DATEラベルがある場合のみ処理
-        norm = normalize_datetime(date_tweet, now_iso=BASE_ISO)  # 正規化
-        results.append((date_tweet, norm))
-        if not results:
-                return None     
-        else: return results        # 元テキストと正規化結果をタプルで保存
-    
-
-
-def normalize_places(entities):
-    """場所エンティティを gazeteer を使ってカテゴリ/規模に正規化する"""
-    results = []
-    for label in PLACE_LABELS:                        # 場所関連のラベルを順番に確認
-        for place_tweet in entities.get(label, []):    # そのラベルに属するテキストを取り出す
-            norm = lookup_place(place_tweet)           # gazeteer辞書を使って正規化
-            results.append((place_tweet, norm))  
-            
-            if not results:
-                return None     
-            else: return results
-
-def build_result_dict(entities, contacts, normalized_dates, normalized_places):
-    """
-    抽出・正規化された結果を指定のフォーマットで辞書にまとめる
-    """
-    results = {}
-
-    # 1. person（SpaCyが抽出した "Person" ラベルを格納）
-    persons = entities.get("Person", [])
-    if persons:
-        results["person"] = [persons, len(persons)]
-
-    # 2. age（カスタムNERで "Age" ラベルを格納）
-    ages = entities.get("Age", [])
-    # '-' を含むものは除外
-    valid_ages = [age for age in ages if "-" not in age]
-    if valid_ages:
-        results["age"] = [valid_ages, len(valid_ages)]
-
-
-    # 3. date（正規化日付を格納）
-    if normalized_dates:
-        norm_dates = [norm for _, norm in normalized_dates]
-        if norm_dates:
-            results["date"] = [norm_dates, len(norm_dates)]
-
-    # 4. contacts（メール・電話・郵便番号を格納）
-    if contacts:
-        if contacts.get("emails"):
-            results["email"] = [contacts["emails"], len(contacts["emails"])]
-        if contacts.get("phones"):
-            results["phone"] = [contacts["phones"], len(contacts["phones"])]
-        if contacts.get("postals"):
-            results["postal"] = [contacts["postals"], len(contacts["postals"])]
-
-    # 5. places（場所の正規化結果をカテゴリごとに格納）
-    if normalized_places:
-        stations, hospitals, spots, unknowns = [], [], [], []
-        for tweet, norm in normalized_places:
-            cat = norm["category"]
-            if cat == "駅":
-                stations.append(tweet)
-            elif cat == "病院":
-                hospitals.append(tweet)
-            elif cat == "観光地":
-                spots.append(tweet)
-            elif cat == "不明":
-                unknowns.append(tweet)
-
-        if stations:
-            results["station"] = [stations, len(stations)]
-        if hospitals:
-            results["hospital"] = [hospitals, len(hospitals)]
-        if spots:
-            results["tourristspot"] = [spots, len(spots)]
-        if unknowns:
-            results["place"] = [unknowns, len(unknowns)]
-
-    return results
+        return []    # テキストが空の場合は空
+    with stage("contacts"):
+        return [
+            EntitySpan(m.start, m.end, m.kind, m.text, m.text.translate(NORMALIZE_TABLE), "regex")
+            for m in scan_contacts(tweet)
+        ]
 
 
+def chunk_spans(docs, bounds):
+    """まとまりごとの Doc の ner_spans を、分ける前のテキストの位置にしてつなげる"""
+    spans = []
+    for doc, (start, _) in zip(docs, bounds):
+        for span in ner_spans(doc):
+            spans.append(replace(span, start=span.start + start, end=span.end + start) if start else span)
+    return spans
 
 
-def tweet_diagnosis(tweet):
-    """全体の処理の流れをまとめた関数"""
+def diagnose_spans(tweet, spans, norm=None):
+    """
+    固有表現の EntitySpan と正規表現の結果をまとめ、重なりを除いた EntitySpan の並びを返す。
+
+    spaCy と正規表現の結果が重なる場合は正規表現（連絡先）を残す。
+    spans が正規化後のテキストの位置なら、その Normalized を norm に渡す
+    （固有表現の位置を元のテキストに戻す。正規表現は元のテキストで探す）。
+    """
+    if norm is not None:
+        spans = norm.map_spans(spans, tweet)
+    return resolve_overlaps(spans + contact_spans(tweet))
+
+
+def diagnose_doc(tweet, doc, norm=None):
+    """解析済みの Doc（tweet 全体）と正規表現の結果をまとめる（diagnose_spans を参照）"""
+    return diagnose_spans(tweet, ner_spans(doc), norm)
+
+
+def rule_doc(tweet):
+    """段階 1: Sudachi のトークン化と RULE_COMPONENTS（EntityRuler・gazetteer_matcher）だけで解析する"""
+    nlp = get_nlp()
+    doc = nlp.make_doc(tweet)
+    for name in RULE_COMPONENTS:
+        if name in nlp.pipe_names:
+            doc = nlp.get_pipe(name)(doc)
+    return doc
+
+
+def cascade_signals(doc, signals=None):
+    """
+    段階 1 の Doc から、モデル全体で解析し直すべき兆候の名前の集合を返す。
+
+    person     : 人名（品詞）、「さん」「くん」などの敬称
+    age        : 数詞 +「歳」「才」「代」
+    place      : 地名（品詞）、「駅」「市」などの場所を表す語
+    proper_noun: その他の固有名詞（組織名など。ルールだけでは場所かどうか決められない）
+
+    signals（既定は CASCADE_SIGNALS）に含まれる兆候だけを見る。
+    """
+    signals = CASCADE_SIGNALS if signals is None else signals
+    found = set()
+    prev_tag = ""
+    for token in doc:
+        tag, text = token.tag_, token.text
+        if tag.startswith("名詞-固有名詞-人名") or (text in NAME_SUFFIXES and tag.startswith("接尾辞")):
+            found.add("person")
+        elif tag.startswith("名詞-固有名詞-地名") or text in PLACE_WORDS:
+            found.add("place")
+        elif tag.startswith("名詞-固有名詞"):
+            found.add("proper_noun")
+        elif text in AGE_COUNTERS and prev_tag.startswith("名詞-数詞"):
+            found.add("age")
+        prev_tag = tag
+    return found & signals
+
+
+def prepare_chunks(tweet):
+    """
+    NLP の前の処理（正規化・まとまりへの分割・段階的な解析の段階 1）をする。
+
+    (Normalized または None, まとまりの位置の並び, まとまりの並び, Doc の並び) を返す。
+    Doc の並びは、段階 1 のルールだけの Doc で済んだまとまりはその Doc、
+    モデル全体での解析が必要なまとまりは None。
+    tweet_spans と tweet_spans_many の両方が使うので、どちらでも同じ結果になる。
+    """
+    norm = None
+    if PRENORM_ENABLED:
+        with stage("prenorm"):
+            norm = prenormalize(tweet)
+    text = norm.text if norm else tweet
+    if len(text) > CHAR_BUDGET and logs.detail_enabled(logger):
+        logger.debug("NLP で解析する文字数の上限を超えました: %d 文字中 %d 文字", len(text), CHAR_BUDGET)
+    # 長いテキストは文の区切りで分ける（短いテキストはそのまま 1 つ）
+    bounds = chunk_bounds(text[:CHAR_BUDGET], CHUNK_CHARS)
+    chunks = [text[start:end] for start, end in bounds]
+    docs = [None] * len(chunks)
+    if CASCADE_ENABLED:
+        # 段階 1: ルールだけで解析し、兆候が無ければそのまま使う
+        with stage("rules"):
+            for k, chunk in enumerate(chunks):
+                doc = rule_doc(chunk)
+                if not cascade_signals(doc):
+                    docs[k] = doc
+    return norm, bounds, chunks, docs
+
+
+def tweet_spans(tweet):
+    """全体の処理の流れをまとめた関数（結果は EntitySpan の並び）"""
 
     try:
-        # NLP解析で固有表現を抽出
-        nlp = get_nlp()
-        entities = analyze_entities(tweet, nlp)
+        norm, bounds, chunks, docs = prepare_chunks(tweet)
+        pending = [k for k, doc in enumerate(docs) if doc is None]
+        if pending:
+            # NLP解析で固有表現を抽出（同時リクエスト・同じテキストの他のまとまりと一緒に nlp.pipe で解析）
+            with stage("nlp"):
+                for k, doc in zip(pending, parse_texts([chunks[k] for k in pending])):
+                    docs[k] = doc
     except Exception:
-        print("NLP解析でエラーが発生しました")
-        traceback.print_exc()
-        return {}
-    pretty_print("抽出された固有表現", entities)
+        logger.exception("NLP解析でエラーが発生しました")
+        return []
 
-    # メール/電話/郵便番号の抽出
-    contacts = extract_contacts(tweet)
+    spans = diagnose_spans(tweet, chunk_spans(docs, bounds), norm)
 
-    # DATEの正規化
-    normalized_dates = normalize_dates(entities)
+    if logs.detail_enabled(logger):
+        logger.debug(
+            "抽出されたエンティティ: %s",
+            [(span.label, span.start, span.end, logs.redact(span.text)) for span in spans],
+        )
 
-    # 場所の正規化
-    normalized_places = normalize_places(entities)
+    return spans
 
-    # 新しい辞書にまとめる
-    final_results = build_result_dict(entities, contacts, normalized_dates, normalized_places)
 
-    # 表示
-    pretty_print("最終結果", final_results)
+def tweet_diagnosis(tweet):
+    """tweet_spans の結果を従来の形 {"label": [list, count]} で返す"""
+    final_results = result_dict(tweet_spans(tweet))
+
+    if logs.detail_enabled(logger):
+        logger.debug("最終結果: %s", {label: count for label, (_, count) in final_results.items()})
 
     return final_results
 
+
+def tweet_spans_many(tweets, batch_size=PIPE_BATCH_SIZE):
+    """
+    複数のテキストを nlp.pipe でまとめて解析し、
+    入力順に (テキスト, EntitySpan の並び) を 1 件ずつ返すジェネレーター。
+
+    全件の解析を待たずに、解析できたものから順に返す。
+    長いテキストは tweet_spans と同じく文の区切りで分けて、他のテキストと同じ nlp.pipe に流す。
+    段階的な解析（NLP_CASCADE=1）も tweet_spans と同じで、段階 1 で済んだまとまりは nlp.pipe に流さない。
+    """
+    nlp = get_nlp()
+    waiting = deque()   # 入力順の (テキスト, Normalized, まとまりの位置, Doc の並び)
+
+    def pending_chunks():
+        for tweet in tweets:
+            norm, bounds, chunks, docs = prepare_chunks(tweet)
+            waiting.append((tweet, norm, bounds, docs))
+            for k, doc in enumerate(docs):
+                if doc is None:
+                    yield chunks[k], (docs, k)
+
+    def finished():
+        # 先頭から、全てのまとまりの Doc がそろったものを返す
+        while waiting and all(doc is not None for doc in waiting[0][3]):
+            tweet, norm, bounds, docs = waiting.popleft()
+            yield tweet, diagnose_spans(tweet, chunk_spans(docs, bounds), norm)
+
+    for doc, (docs, k) in nlp.pipe(pending_chunks(), as_tuples=True, batch_size=batch_size):
+        docs[k] = doc
+        yield from finished()
+    yield from finished()
+
+
+def tweet_diagnosis_many(tweets, batch_size=PIPE_BATCH_SIZE):
+    """tweet_spans_many の結果を (テキスト, 最終結果の辞書) で返すジェネレーター"""
+    for tweet, spans in tweet_spans_many(tweets, batch_size):
+        yield tweet, result_dict(spans)
+
+
+def warm_up():
+    """
+    起動時に重い初期化をまとめて済ませる。
+
+    spaCy モデル・gazetteer のファイル・dateparser の日本語データを読み込み、
+    1 件解析して最初のリクエストが遅くならないようにする。
+    """
+    get_nlp()
+    get_index()
+    normalize_datetime("明日", now_iso=BASE_ISO)
+    tweet_diagnosis(WARMUP_TEXT)
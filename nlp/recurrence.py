@@ -0,0 +1,220 @@
+# recurrence.py
+"""
+繰り返しの予定（毎週金曜・毎朝・毎月15日 など）を見つけて、次の N 回を求めるモジュール。
+
+繰り返しの予定は、1 回きりの日時よりも生活パターンや居場所を特定されやすいので、
+date_norm で is_repeated を立て、直近の発生日時も返す。
+
+対応する表現の例
+- 毎日 毎朝 毎晩 毎夜 毎夕（+ 7時 などの時刻）
+- 平日 毎平日（土日と祝日を除く）
+- 毎週 毎週金曜 毎週月・水・金曜日 毎金曜 金曜ごと 隔週土曜 毎週末 週末ごと
+- 毎月 毎月15日 毎月末 毎月第2土曜
+- 毎年 毎年8月15日
+- 1日おき 3日ごと
+"""
+
+import re
+import unicodedata
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from nlp import date_rules
+from nlp.jp_holidays import is_holiday
+
+WD = "[月火水木金土日]"
+NUM = date_rules.NUM
+
+# 候補日を探す範囲（これより先に発生日が無ければ打ち切る。2月29日 は 8 年空くことがある）
+SEARCH_YEARS = 8
+# 「N日ごと」の N の上限
+MAX_INTERVAL = 366
+# 「毎月第N土曜」の N の範囲
+MAX_NTH = 5
+
+# 毎朝・毎晩 → date_rules の時間帯の語（「日々」は「日々の積み重ね」のように予定でないことが多いので入れない）
+DAILY_WORDS = {"毎日": "", "毎朝": "朝", "毎昼": "昼", "毎夕": "夕方", "毎晩": "夜", "毎夜": "夜"}
+
+# 先に書いたものが優先（毎月15日・毎日 を 毎+月曜・毎+日曜 と読まないように先に置く）
+PATTERN = re.compile(
+    "|".join([
+        rf"(?P<yearly>毎年)(?:(?P<y_month>{NUM})月(?:(?P<y_day>{NUM})日)?)?",
+        rf"(?P<monthly>毎月)(?:第(?P<m_nth>{NUM})(?P<m_wd>{WD})曜日?|(?P<m_day>{NUM})日|(?P<m_end>末))?(?!曜)",
+        rf"(?P<daily>{'|'.join(DAILY_WORDS)})(?!曜)",
+        r"(?P<weekend>毎週末|週末ごと|毎週土日|土日ごと)",
+        rf"(?P<w_prefix>毎週|隔週|毎)(?P<w_days>(?:{WD}(?:曜日?)?[・、,と]?)*)",
+        # 最後の曜日には「曜」を必須にする（「日毎に寒くなる」を 日曜ごと と読まないように）
+        rf"(?P<s_days>(?:{WD}(?:曜日?)?[・、,と]?)*{WD}曜日?)(?:ごと|毎)",
+        r"(?P<weekday_only>毎平日|平日)",
+        rf"(?P<interval>{NUM})日(?P<interval_kind>おき|ごと)",
+    ])
+)
+
+
+class Recurrence:
+    """
+    繰り返しの規則。
+
+    freq は "daily" / "weekly" / "monthly" / "yearly"。
+    time は (時, 分)、時刻の指定が無ければ None（その日の 0:00 とする）。
+    """
+
+    def __init__(self, freq, interval=1, weekdays=None, monthday=None, nth=None,
+                 month=None, time=None, skip_holidays=False):
+        self.freq = freq
+        self.interval = interval
+        self.weekdays = weekdays          # 曜日の集合（0=月曜）
+        self.monthday = monthday          # 日（-1 は月末）
+        self.nth = nth                    # 第 n 週（weekdays と組み合わせ）
+        self.month = month
+        self.time = time
+        self.skip_holidays = skip_holidays
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v not in (None, False))
+        return f"Recurrence({fields})"
+
+    # =============================
+    # 候補日の列挙
+    # =============================
+    def _days(self, start):
+        """start 以降 SEARCH_YEARS 年以内の候補日を順に返す"""
+        limit = start + relativedelta(years=SEARCH_YEARS)
+        if self.freq == "monthly":
+            month = start.replace(day=1)
+            while month <= limit:
+                day = self._monthly_day(month)
+                if day is not None and day >= start:
+                    yield day
+                month += relativedelta(months=1)
+        elif self.freq == "yearly":
+            year = start.year
+            while year <= limit.year:
+                try:
+                    day = start.replace(year=year, month=self.month, day=self.monthday)
+                except ValueError:        # 2月29日 がない年
+                    day = None
+                if day is not None and day >= start:
+                    yield day
+                year += 1
+        else:
+            day = start
+            anchor = None                 # 隔週の基準にする週の月曜日
+            while day <= limit:
+                if self._daily_match(day):
+                    monday = day - timedelta(days=day.weekday())
+                    if anchor is None:
+                        anchor = monday
+                    if self.freq != "weekly" or (monday - anchor).days // 7 % self.interval == 0:
+                        yield day
+                day += timedelta(days=self.interval if self.freq == "daily" else 1)
+
+    def _daily_match(self, day):
+        if self.weekdays is not None and day.weekday() not in self.weekdays:
+            return False
+        return not (self.skip_holidays and is_holiday(day))
+
+    def _monthly_day(self, month):
+        """month（その月の 1 日）の何日目か。存在しない日（2月30日 など）は None"""
+        if self.nth is not None:
+            (weekday,) = self.weekdays
+            day = month + timedelta(days=(weekday - month.weekday()) % 7 + 7 * (self.nth - 1))
+            return day if day.month == month.month else None
+        if self.monthday == -1:
+            return month + relativedelta(day=31)
+        try:
+            return month.replace(day=self.monthday)
+        except ValueError:
+            return None
+
+    def occurrences(self, now, count):
+        """
+        now 以降の発生日時を最大 count 件返す。
+
+        時刻の指定が無い場合は、今日も含める（日付だけの比較）。
+        SEARCH_YEARS 年以内に無ければ、その分だけ少なくなる（空の場合もある）。
+        """
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        results = []
+        for day in self._days(today):
+            if self.time is None:
+                results.append(day)
+            else:
+                at = day + timedelta(hours=self.time[0], minutes=self.time[1])
+                if at < now:
+                    continue
+                results.append(at)
+            if len(results) >= count:
+                break
+        return results
+
+
+def _weekdays(text):
+    text = re.sub("曜日?", "", text)
+    return frozenset(date_rules.WEEKDAYS[ch] for ch in text if ch in date_rules.WEEKDAYS)
+
+
+def _from_match(m, now):
+    """一致した繰り返しの語から Recurrence を作る（月・日・第N・間隔が範囲外なら None）"""
+    g = m.groupdict()
+    if g["yearly"]:
+        month = date_rules.to_int(g["y_month"]) if g["y_month"] else now.month
+        day = date_rules.to_int(g["y_day"]) if g["y_day"] else (now.day if not g["y_month"] else 1)
+        if not (1 <= month <= 12 and 1 <= day <= 31):
+            return None
+        return Recurrence("yearly", month=month, monthday=day)
+    if g["monthly"]:
+        if g["m_nth"]:
+            nth = date_rules.to_int(g["m_nth"])
+            if not 1 <= nth <= MAX_NTH:
+                return None
+            return Recurrence("monthly", nth=nth, weekdays=_weekdays(g["m_wd"]))
+        if g["m_end"]:
+            return Recurrence("monthly", monthday=-1)
+        day = date_rules.to_int(g["m_day"]) if g["m_day"] else now.day
+        if not 1 <= day <= 31:
+            return None
+        return Recurrence("monthly", monthday=day)
+    if g["weekend"]:
+        return Recurrence("weekly", weekdays=frozenset({5, 6}))
+    if g["w_prefix"]:
+        days = _weekdays(g["w_days"])
+        if not days:
+            if g["w_prefix"] == "毎":       # 「毎」だけでは繰り返しとは言えない
+                return None
+            days = frozenset({now.weekday()})
+        return Recurrence("weekly", interval=2 if g["w_prefix"] == "隔週" else 1, weekdays=days)
+    if g["s_days"]:
+        return Recurrence("weekly", weekdays=_weekdays(g["s_days"]))
+    if g["weekday_only"]:
+        return Recurrence("daily", weekdays=frozenset(range(5)), skip_holidays=True)
+    if g["interval"]:
+        n = date_rules.to_int(g["interval"])
+        interval = n + 1 if g["interval_kind"] == "おき" else n
+        if not (1 <= n and interval <= MAX_INTERVAL):
+            return None
+        return Recurrence("daily", interval=interval)
+    return Recurrence("daily")   # 毎日・毎朝 など
+
+
+def parse(text, now):
+    """
+    text が繰り返しの予定なら Recurrence を返す（そうでなければ None）。
+
+    繰り返しの語以外の部分は時刻として解釈する（「毎週金曜の19時」「毎朝7時」）。
+    """
+    text = unicodedata.normalize("NFKC", text).strip()
+    m = PATTERN.search(text)
+    if m is None:
+        return None
+    recurrence = _from_match(m, now)
+    if recurrence is None:
+        return None
+
+    period = DAILY_WORDS.get(m.group("daily") or "", "")
+    rest = (text[:m.start()] + text[m.end():]).strip(" のに、")
+    if period or rest:
+        # 「毎晩9時」は「夜9時」として 21 時にする
+        recurrence.time = date_rules.parse_time(period + rest)
+    return recurrence
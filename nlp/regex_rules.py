@@ -6,9 +6,14 @@
   - 特殊な記号（メタ文字）と通常文字を組み合わせて、
     文字列のパターンを表現・検索するための仕組み。
   - 例: メールアドレス、電話番号、郵便番号の検出など。
+
+scan_contacts は、全角の数字・英字・ハイフンを半角にそろえた文字列を
+1 回だけ走査して、メール・電話番号・郵便番号を位置（span）付きで返す。
+全角→半角は 1 文字 → 1 文字の置き換えなので、位置は元の文字列とそのまま対応する。
 """
 
 import re  # 正規表現ライブラリ
+from typing import NamedTuple
 
 
 # =============================
@@ -76,23 +81,104 @@ POSTAL_PATTERN = re.compile(
 """
 
 
+# =============================
+# 全角 → 半角（1 文字 → 1 文字）
+# =============================
+# 全角英数記号（！〜～）を半角に、ハイフンに見える文字を "-" にする。
+# 文字数が変わらないので、正規化後の位置がそのまま元の文字列の位置になる。
+HYPHENS = "‐‑‒–—―−﹣ー－"
+NORMALIZE_TABLE = str.maketrans(
+    {**{chr(c): chr(c - 0xFEE0) for c in range(0xFF01, 0xFF5F)}, **{h: "-" for h in HYPHENS}}
+)
+# 検出に関係する全角文字の並び（「！」「ｗ」の 1 文字ごとに辞書を引かないよう、並びごとに置き換える）。
+# 長音符「ー」は普通の文章に多いので、ここでは見ずに数字の並びの中でだけ置き換える
+FULLWIDTH_RUN = re.compile("[０-９Ａ-Ｚａ-ｚ＠．＿％＋" + HYPHENS.replace("ー", "") + "]+")
+
+# 電話番号・郵便番号の最短の長さ（これより短い数字の並びは調べない）
+MIN_NUMBER_LENGTH = 7
+
+
+def normalize_for_scan(text: str):
+    """全角の数字・英字・記号とハイフン類を半角にそろえる（長さは変わらない）"""
+    return FULLWIDTH_RUN.sub(lambda m: m.group().translate(NORMALIZE_TABLE), text)
+
+
+# =============================
+# 1 回の走査でまとめて検出
+# =============================
+# メールアドレスか、数字とハイフンの並び（電話番号・郵便番号の候補）。
+# 先頭の先読みで、英数字以外の位置（日本語の大半）では選択肢を試さない。
+# メールはユーザー名部分の途中から始めない（長い英数字の並びで何度も試さないため）。
+NUMBER_PATTERN = r"(?P<digits>\d[\dー-]*)"
+SCAN_PATTERN = re.compile(
+    r"(?=[a-zA-Z0-9._%+-])(?:(?P<email>(?<![a-zA-Z0-9._%+-])" + EMAIL_PATTERN.pattern + r")|" + NUMBER_PATTERN + ")"
+)
+# 「@」が無ければメールは無いので、数字の並びだけを探す
+NUMBER_SCAN_PATTERN = re.compile(NUMBER_PATTERN)
+
+
+class ContactMatch(NamedTuple):
+    """検出した連絡先（kind は "email" / "phone" / "postal"、start/end は元の文字列の位置）"""
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+def scan_contacts(text: str):
+    """
+    メール・電話番号・郵便番号を 1 回の走査で検出し、出現順に返す。
+
+    数字の並びごとに電話番号を先に探し、電話番号と位置が重なる郵便番号は除く
+    （郵便番号と電話番号が重複する場合 → 電話番号を優先）。
+    """
+    normalized = normalize_for_scan(text)
+    matches = []
+    pattern = SCAN_PATTERN if "@" in normalized else NUMBER_SCAN_PATTERN
+    for m in pattern.finditer(normalized):
+        if m.lastgroup == "email":
+            matches.append(ContactMatch("email", text[m.start():m.end()], m.start(), m.end()))
+            continue
+
+        run, offset = m.group(), m.start()
+        if len(run) < MIN_NUMBER_LENGTH:
+            continue
+        if "ー" in run:
+            run = run.translate(NORMALIZE_TABLE)
+        phones = [(p.start(), p.end()) for p in PHONE_PATTERN.finditer(run)]
+        found = [("phone", start, end) for start, end in phones]
+
+        # 電話番号も郵便番号も左から順に見つかるので、重なりは先頭から順に比べるだけでよい
+        i = 0
+        for p in POSTAL_PATTERN.finditer(run):
+            while i < len(phones) and phones[i][1] <= p.start():
+                i += 1
+            if i < len(phones) and phones[i][0] < p.end():
+                continue
+            found.append(("postal", p.start(), p.end()))
+
+        for kind, start, end in sorted(found, key=lambda f: f[1]):
+            matches.append(ContactMatch(kind, text[offset + start:offset + end], offset + start, offset + end))
+    return matches
+
+
 # =============================
 # 検出関数群
 # =============================
 
 def extract_emails(text: str):
     """文章からすべてのメールアドレスを抽出して返す"""
-    return EMAIL_PATTERN.findall(text)
+    return [m.text for m in scan_contacts(text) if m.kind == "email"]
 
 
 def extract_phones(text: str):
     """文章からすべての電話番号を抽出して返す"""
-    return PHONE_PATTERN.findall(text)
+    return [m.text for m in scan_contacts(text) if m.kind == "phone"]
 
 
 def extract_postals(text: str):
-    """文章からすべての郵便番号を抽出して返す"""
-    return POSTAL_PATTERN.findall(text)
+    """文章からすべての郵便番号を抽出して返す（電話番号と重なるものは除く）"""
+    return [m.text for m in scan_contacts(text) if m.kind == "postal"]
 
 
 def extract_all(text: str):
@@ -100,29 +186,15 @@ def extract_all(text: str):
     メール・電話番号・郵便番号をまとめて抽出し、
     件数が1以上のものだけ返す
     """
-    emails = extract_emails(text)
-    phones = extract_phones(text)
-    postals_raw = extract_postals(text)
-
-    # 郵便番号と電話番号が重複する場合 → 電話番号を優先
-    postals = [
-        p for p in postals_raw
-        if all(
-            re.sub(r"\D", "", p) not in re.sub(r"\D", "", phone)
-            for phone in phones
-        )
-    ]
+    found = {"emails": [], "phones": [], "postals": []}
+    for m in scan_contacts(text):
+        found[m.kind + "s"].append(m.text)
 
     # 件数1以上のものだけ辞書に追加
     result = {}
-    if len(emails) > 0:
-        result["emails"] = emails
-        result["emails_count"] = len(emails)
-    if len(phones) > 0:
-        result["phones"] = phones
-        result["phones_count"] = len(phones)
-    if len(postals) > 0:
-        result["postals"] = postals
-        result["postals_count"] = len(postals)
+    for key, values in found.items():
+        if len(values) > 0:
+            result[key] = values
+            result[key + "_count"] = len(values)
 
     return result if result else None
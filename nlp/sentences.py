@@ -0,0 +1,63 @@
+# sentences.py
+"""
+テキストを文に区切るモジュール（spaCy を使わない簡単な規則）。
+長いテキストを文の区切りで一定の長さ以下のまとまりに分ける chunk_bounds もここに置く。
+
+「。」「！」「？」（全角・半角）と改行で区切る。閉じかっこは直前の文に含める。
+"." は URL・メールアドレス・小数に出てくるので区切りにしない。
+"""
+
+import re
+
+# 文の終わり（記号の連続 + 閉じかっこ + 後ろの空白）または改行の連続
+SENTENCE_END = re.compile(r"[。．！？!?]+[」』）)】]*[ \t　]*|\n+")
+
+
+def split_sentences(text):
+    """文ごとの (開始位置, 終了位置) の並びを返す（つなげると元のテキストに戻る）"""
+    bounds = []
+    start = 0
+    for m in SENTENCE_END.finditer(text):
+        if m.end() > start:
+            bounds.append((start, m.end()))
+            start = m.end()
+    if start < len(text):
+        bounds.append((start, len(text)))
+    return bounds
+
+
+# 1 文が長すぎる場合に区切る位置の候補（読点・空白の直後）
+SOFT_BREAK = re.compile(r"[、，,\s]")
+
+
+def chunk_bounds(text, max_chars):
+    """
+    文の区切りで、max_chars 文字以下のまとまりに分けた (開始位置, 終了位置) の並びを返す。
+
+    文はなるべく途中で分けない。1 文が max_chars より長い場合だけ、
+    後ろ半分にある最後の読点・空白の直後（無ければ max_chars 文字目）で分ける。
+    max_chars 以下のテキスト（空を含む）は 1 つのまとまりになる。max_chars が 1 未満なら 1 とする。
+    """
+    max_chars = max(1, max_chars)
+    if len(text) <= max_chars:
+        return [(0, len(text))]
+    chunks = []
+    start = end = 0
+    for _, sentence_end in split_sentences(text):
+        if sentence_end - start <= max_chars:
+            end = sentence_end
+            continue
+        if end > start:
+            chunks.append((start, end))
+            start = end
+        while sentence_end - start > max_chars:
+            limit = start + max_chars
+            cut = limit
+            for m in SOFT_BREAK.finditer(text, start + max_chars // 2, limit):
+                cut = m.end()
+            chunks.append((start, cut))
+            start = cut
+        end = sentence_end
+    if end > start:
+        chunks.append((start, end))
+    return chunks
@@ -0,0 +1,100 @@
+# spans.py
+"""
+解析結果を、文字位置付きのエンティティ（EntitySpan）の並びで表すモジュール。
+
+spaCy の固有表現と正規表現の連絡先を同じ形で持ち、
+位置が重なるものは区間の走査（interval sweep）で 1 つにまとめる。
+フロントエンドは start/end で危険な箇所をそのまま強調表示できる。
+
+スコア計算・説明文で使う従来の形 {"label": [list, count]} は result_dict で作る。
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# result_dict のキーの並び（従来の build_result_dict と同じ順）
+RESULT_LABELS = (
+    "person", "age", "date", "email", "phone", "postal",
+    "station", "hospital", "tourristspot", "place",
+)
+
+# 重なった時に残す優先度（大きい方を残す。同じなら長い方、さらに同じなら先に出た方）
+SOURCE_PRIORITY = {"regex": 1, "ner": 0}
+
+
+@dataclass(slots=True)
+class EntitySpan:
+    """
+    文字位置付きのエンティティ。
+
+    start / end : 元のテキストでの位置（text[start:end] == self.text）
+    label       : RESULT_LABELS のいずれか
+    text        : 元のテキストの該当部分
+    value       : 正規化した値（日付は normalize_datetime の結果、場所は gazetteer のカテゴリ、
+                  連絡先は全角をそろえた文字列。無ければ None）
+    source      : "ner"（spaCy・EntityRuler）/ "regex"（正規表現）
+    """
+    start: int
+    end: int
+    label: str
+    text: str
+    value: Optional[Any] = None
+    source: str = "ner"
+
+    def to_dict(self):
+        """API の応答用"""
+        return {
+            "start": self.start, "end": self.end, "label": self.label,
+            "text": self.text, "value": self.value, "source": self.source,
+        }
+
+    def to_list(self):
+        """キャッシュ・プロセス間の受け渡し用の JSON にできる形"""
+        return [self.start, self.end, self.label, self.text, self.value, self.source]
+
+    @classmethod
+    def from_list(cls, item):
+        return cls(*item)
+
+
+def _wins(a, b):
+    """重なった a と b のうち a を残すか"""
+    pa, pb = SOURCE_PRIORITY.get(a.source, 0), SOURCE_PRIORITY.get(b.source, 0)
+    if pa != pb:
+        return pa > pb
+    return a.end - a.start > b.end - b.start
+
+
+def resolve_overlaps(spans):
+    """
+    位置が重なるエンティティを 1 つにまとめ、開始位置の順に返す。
+
+    開始位置で並べて 1 回走査し、直前に残したものと重なれば優先度の高い方だけを残す
+    （正規表現の電話番号と、spaCy が "090-" を Person とした結果が重なる場合など）。
+    """
+    spans = sorted(spans, key=lambda s: (s.start, s.start - s.end))
+    kept = []
+    for span in spans:
+        if kept and span.start < kept[-1].end:
+            if _wins(span, kept[-1]):
+                kept[-1] = span
+            continue
+        kept.append(span)
+    return kept
+
+
+def result_dict(spans):
+    """
+    EntitySpan の並びから従来の形 {"label": [list, count]} を作る。
+
+    日付は正規化した値（normalize_datetime の結果）、それ以外はテキストを並べる。
+    """
+    grouped = {}
+    for span in spans:
+        item = span.value if span.label == "date" else span.text
+        values = grouped.get(span.label)
+        if values is None:
+            grouped[span.label] = [item]
+        else:
+            values.append(item)
+    return {label: [grouped[label], len(grouped[label])] for label in RESULT_LABELS if label in grouped}
@@ -1,55 +1,400 @@
-from typing import Dict, List
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-import traceback
+from typing import Annotated, Any, Dict, List, NamedTuple, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+import json
+import os
+import logging
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from collections import defaultdict
 
-from nlp.processor import tweet_diagnosis
+from nlp.processor import (
+    CASCADE_ENABLED, CASCADE_SIGNALS, CHAR_BUDGET, CHUNK_CHARS, PRENORM_ENABLED, tweet_diagnosis_many,
+)
+from nlp.pipeline import GAZETTEER_MATCHER, NLP_MODEL, NLP_PROFILE
+from nlp.gazeteer import get_index
+from nlp.prenorm import MAX_RUN as PRENORM_MAX_RUN
+from nlp.spans import EntitySpan, result_dict
+from nlp.metrics import stage
+from nlp import logs
 from . import scoring
 from . import gpt_cliant
+from . import worker_pool
+from . import result_cache
+from . import explain_templates
+from . import drafts
 import random
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# /analyze/batch で 1 リクエストに含められる最大件数
+BATCH_MAX_TEXTS = int(os.getenv("ANALYZE_BATCH_MAX_TEXTS", "10000"))
+
+# キャッシュに置く解析結果の形（変えたら上げる）
+DIAGNOSIS_FORMAT = "spans-2"
 
 # リクエスト/レスポンス定義
 class AnalyzeReq(BaseModel):
     text: str = Field(..., description="解析対象テキスト", max_length=10000)
+    rich: bool = Field(False, description="詳しい説明文（LLM）を求めるか。false ならよくある結果はテンプレートで即時に返す")
+    spans: bool = Field(False, description="検出した箇所の位置（spans）も返すか")
+
+class AnalyzeBatchReq(BaseModel):
+    texts: List[Annotated[str, Field(max_length=10000)]] = Field(
+        ..., description="解析対象テキストの一覧", max_length=BATCH_MAX_TEXTS
+    )
+    explain: bool = Field(False, description="説明文（LLM）も生成するか")
+
+class AnalyzeDraftReq(AnalyzeReq):
+    draft_id: str = Field(..., description="下書きの ID（クライアントが決め、同じ下書きの間は同じ値を送る）", min_length=1, max_length=128)
+
+class SpanRes(BaseModel):
+    start: int = Field(..., description="開始位置（文字単位）")
+    end: int = Field(..., description="終了位置（文字単位、この位置は含まない）")
+    label: str = Field(..., description="種類（person / age / date / email / phone / postal / station / hospital / tourristspot / place）")
+    text: str = Field(..., description="該当部分のテキスト")
+    value: Optional[Any] = Field(None, description="正規化した値（日付・場所のカテゴリなど）")
+    source: str = Field(..., description="検出元（ner / regex）")
 
 class AnalyzeRes(BaseModel):
     detail: str = Field(..., description="評価の要約説明（日本語）")
     direct_percent: float = Field(..., description="個人情報（直接）の割合％（0-100）", ge=0, le=100)
     indirect_percent: float = Field(..., description="個人情報（間接）の割合％（0-100）", ge=0, le=100)
+    spans: Optional[List[SpanRes]] = Field(None, description="検出した箇所（spans=true の場合のみ）")
 
-# エンドポイント フロントに返す
-@router.post("/analyze", response_model=AnalyzeRes, summary="テキスト解析（説明と割合）")
-def analyze_text(req: AnalyzeReq) -> AnalyzeRes:
-    tweet = req.text
-    print({tweet})
+class AnalyzeDraftRes(AnalyzeRes):
+    sentences: int = Field(..., description="文の数")
+    reused_sentences: int = Field(..., description="前回の解析結果を使い回した文の数")
 
-    try:
-        # 用意したデータを引数としてtweet_diagnosis関数に渡し、処理を実行
-        nlp_result = tweet_diagnosis(tweet)
-        
-        # nlp_result を簡単に変更する
-        
-        #nlp_result_correction = {key: value[1] for key, value in nlp_result.items()}
-        
+# キャッシュ
+def _nlp_versions():
+    """NLP の結果に影響する設定・データのバージョン（キャッシュキー用）"""
+    cascade = ",".join(sorted(CASCADE_SIGNALS)) if CASCADE_ENABLED else ""
+    prenorm = f"prenorm-{PRENORM_MAX_RUN}" if PRENORM_ENABLED else ""
+    return (
+        NLP_MODEL, NLP_PROFILE, GAZETTEER_MATCHER, cascade, prenorm, CHUNK_CHARS, CHAR_BUDGET,
+        get_index().checksum.hex(), DIAGNOSIS_FORMAT,
+    )
+
+
+def _cached_diagnosis(tweet):
+    """キャッシュにあれば NLP を実行せずに tweet_spans の結果（EntitySpan の並び）を返す"""
+    cache = result_cache.get_cache("diagnosis")
+    if cache is None:
+        return worker_pool.diagnose(tweet)
+
+    key = result_cache.cache_key(tweet, *_nlp_versions())
+    cached = cache.get(key)
+    if cached is not None:
+        return [EntitySpan.from_list(item) for item in cached]
+
+    # 用意したデータを引数としてtweet_spans関数に渡し、処理を実行
+    # （NLP_EXECUTION_MODE=process の場合はワーカープロセスで実行）
+    spans = worker_pool.diagnose(tweet)
+    cache.set(key, [span.to_list() for span in spans])
+    return spans
+
+
+def _analysis_key(tweet, rich):
+    return result_cache.cache_key(
+        tweet, *_nlp_versions(), scoring.CONFIG_VERSION, gpt_cliant.PROMPT_VERSION,
+        explain_templates.TEMPLATE_VERSION, rich,
+    )
+
+
+class _Scored(NamedTuple):
+    """説明文の生成前までの結果"""
+    nlp_result: dict
+    direct_scores: float
+    indirect_scores: float
+    spans: list                 # SpanRes に渡せる dict の並び
+    cached: Optional[dict]      # スコアと説明文のキャッシュ（あれば）
+
+
+def _score(tweet, rich):
+    """
+    キャッシュの確認・NLP・スコア計算までを行う。
+    CPU を使う同期処理なので、非同期ルートからはスレッドプールで呼ぶ。
+    """
+    # スコアと説明文までキャッシュにあれば、NLP も OpenAI も呼ばない
+    analysis_cache = result_cache.get_cache("analysis")
+    if analysis_cache is not None:
+        with stage("analysis_cache"):
+            cached = analysis_cache.get(_analysis_key(tweet, rich))
+        if cached is not None:
+            return _Scored({}, cached["direct_percent"], cached["indirect_percent"], cached["spans"], cached)
+
+    with stage("diagnosis"):
+        spans = _cached_diagnosis(tweet)
+    return _score_spans(spans)
+
+
+def _score_draft(draft_id, tweet):
+    """下書きの変わった文だけを解析してスコアを計算する。(_Scored, 文の数, 使い回した文の数) を返す"""
+    with stage("draft_diagnosis"):
+        spans, sentences, reused = drafts.draft_spans(draft_id, tweet)
+    return _score_spans(spans), sentences, reused
+
+
+def _score_spans(spans):
+    """EntitySpan の並びからスコアを計算する"""
+    nlp_result = result_dict(spans)
+
+    # nlp_result を簡単に変更する
+
+    #nlp_result_correction = {key: value[1] for key, value in nlp_result.items()}
+
+    with stage("scoring"):
         # 直接スコア計算
         direct_scores = scoring.direct_scores(nlp_result)
         # 間接スコア計算
         indirect_scores = scoring.indirect_scores(nlp_result)
-        
+    return _Scored(nlp_result, direct_scores, indirect_scores, [span.to_dict() for span in spans], None)
+
+
+def _store_analysis(tweet, rich, res):
+    analysis_cache = result_cache.get_cache("analysis")
+    if analysis_cache is not None:
+        analysis_cache.set(_analysis_key(tweet, rich), res.model_dump())
+
+
+def _response(res, want_spans):
+    """spans を求められていなければ応答から外す（キャッシュには spans 付きで置く）"""
+    return res if want_spans else AnalyzeRes(**res.model_dump(exclude={"spans"}))
+
+
+def _template_detail(scored, rich):
+    """よくある結果の形ならテンプレートの説明文を返す（LLM が必要なら None）"""
+    with stage("template"):
+        return explain_templates.render(scored.nlp_result, scored.direct_scores, scored.indirect_scores, rich=rich)
+
+
+async def _detail(scored, rich):
+    """説明文を生成する（よくある形はテンプレート、それ以外は非同期クライアントで LLM）"""
+    detail = _template_detail(scored, rich)
+    if detail is None:
+        with stage("llm"):
+            detail = await gpt_cliant.gpt_function_async(
+                scored.nlp_result, scored.direct_scores, scored.indirect_scores
+            )
+    return detail
+
+
+# エンドポイント フロントに返す
+@router.post(
+    "/analyze",
+    response_model=AnalyzeRes,
+    response_model_exclude_unset=True,
+    summary="テキスト解析（説明と割合）",
+)
+async def analyze_text(req: AnalyzeReq) -> AnalyzeRes:
+    tweet = req.text
+    if logs.detail_enabled(logger):
+        logger.debug("analyze: %s", logs.redact(tweet))
+
+    try:
+        scored = await run_in_threadpool(_score, tweet, req.rich)
+        if scored.cached is not None:
+            return _response(AnalyzeRes(**scored.cached), req.spans)
+
         # 説明文 生成
-        detail = gpt_cliant.gpt_function(nlp_result, direct_scores, indirect_scores)
+        detail = await _detail(scored, req.rich)
+
+        res = AnalyzeRes(
+            detail=detail,
+            direct_percent=scored.direct_scores,
+            indirect_percent=scored.indirect_scores,
+            spans=scored.spans,
+        )
+        await run_in_threadpool(_store_analysis, tweet, req.rich, res)
+        return _response(res, req.spans)
+
+    except worker_pool.PoolSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    except Exception as e:
+        logger.exception("解析でエラーが発生しました")
+        raise HTTPException(status_code=500, detail=f"NLP解析でエラー: {str(e)}")
+
+
+# 入力中の下書き 変わった文だけ解析し直す
+@router.post(
+    "/analyze/draft",
+    response_model=AnalyzeDraftRes,
+    response_model_exclude_unset=True,
+    summary="下書きの差分解析（前回から変わった文だけ解析し直す）",
+)
+async def analyze_draft(req: AnalyzeDraftReq) -> AnalyzeDraftRes:
+    """
+    同じ draft_id で送られた前回のテキストと比べ、変わっていない文は前回の解析結果を使う。
+    入力のたびに呼んでも、解析の量は変わった文の分だけになる。
+    """
+    try:
+        scored, sentences, reused = await run_in_threadpool(_score_draft, req.draft_id, req.text)
+        res = {
+            "detail": await _detail(scored, req.rich),
+            "direct_percent": scored.direct_scores,
+            "indirect_percent": scored.indirect_scores,
+            "sentences": sentences,
+            "reused_sentences": reused,
+        }
+        if req.spans:
+            res["spans"] = scored.spans
+        return AnalyzeDraftRes(**res)
+
+    except worker_pool.PoolSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    except Exception as e:
+        logger.exception("下書きの解析でエラーが発生しました")
+        raise HTTPException(status_code=500, detail=f"NLP解析でエラー: {str(e)}")
+
+
+# スコアを先に返し、説明文は生成しながら返す（Server-Sent Events）
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        return AnalyzeRes(
+
+@router.post(
+    "/analyze/stream",
+    summary="テキスト解析（スコアを即時返却し、説明文をSSEで逐次返却）",
+    response_class=StreamingResponse,
+)
+async def analyze_stream(req: AnalyzeReq) -> StreamingResponse:
+    """
+    text/event-stream で次のイベントを順に返す。
+
+    - scores: {"direct_percent": ..., "indirect_percent": ...}（spans=true なら "spans" も）
+    - delta : {"text": "説明文の断片"}（複数回）
+    - done  : {"detail": "説明文の全文"}
+    - error : {"detail": "エラー内容"}（失敗した場合のみ、ここで終了）
+    """
+    tweet = req.text
+
+    try:
+        scored = await run_in_threadpool(_score, tweet, req.rich)
+    except worker_pool.PoolSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.exception("解析でエラーが発生しました")
+        raise HTTPException(status_code=500, detail=f"NLP解析でエラー: {str(e)}")
+
+    async def events():
+        scores = {
+            "direct_percent": scored.direct_scores,
+            "indirect_percent": scored.indirect_scores,
+        }
+        if req.spans:
+            scores["spans"] = scored.spans
+        yield _sse("scores", scores)
+        if scored.cached is not None:
+            yield _sse("delta", {"text": scored.cached["detail"]})
+            yield _sse("done", {"detail": scored.cached["detail"]})
+            return
+
+        template = _template_detail(scored, req.rich)
+        if template is not None:
+            yield _sse("delta", {"text": template})
+            yield _sse("done", {"detail": template})
+            return
+
+        parts = []
+        try:
+            async for text in gpt_cliant.stream_explanation(
+                scored.nlp_result, scored.direct_scores, scored.indirect_scores
+            ):
+                parts.append(text)
+                yield _sse("delta", {"text": text})
+        except Exception as e:
+            logger.exception("説明文の生成でエラーが発生しました")
+            yield _sse("error", {"detail": f"説明文の生成でエラー: {str(e)}"})
+            return
+
+        detail = "".join(parts)
+        yield _sse("done", {"detail": detail})
+        res = AnalyzeRes(
             detail=detail,
-            direct_percent=direct_scores,
-            indirect_percent=indirect_scores,
+            direct_percent=scored.direct_scores,
+            indirect_percent=scored.indirect_scores,
+            spans=scored.spans,
         )
+        await run_in_threadpool(_store_analysis, tweet, req.rich, res)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+# まとめて解析 結果を1行ずつ返す
+@router.post(
+    "/analyze/batch",
+    summary="複数テキストの一括解析（NDJSONで逐次返却）",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": AnalyzeBatchReq.model_json_schema()},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def analyze_batch(request: Request, explain: bool = False) -> StreamingResponse:
+    """
+    次のどちらかの形式で複数テキストを受け取り、解析できたものから順に
+    1 行 1 件の JSON（NDJSON）で返す。
+
+    - application/json    : {"texts": [...], "explain": false}
+    - application/x-ndjson: 1 行ごとに {"text": "..."} または JSON 文字列
+                            （説明文の有無はクエリ ?explain=true で指定）
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            texts = []
+            for line in body.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                texts.append(item["text"] if isinstance(item, dict) else item)
+            req = AnalyzeBatchReq(texts=texts, explain=explain)
+        else:
+            req = AnalyzeBatchReq.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"リクエストの形式が不正です: {e}")
+
+    return StreamingResponse(_iter_batch_results(req.texts, req.explain), media_type="application/x-ndjson")
+
+
+def _iter_batch_results(texts, explain):
+    """tweet_diagnosis_many の結果にスコア（と説明文）を付けて NDJSON の行にする"""
+    try:
+        for index, (tweet, nlp_result) in enumerate(tweet_diagnosis_many(texts)):
+            direct = scoring.direct_scores(nlp_result)
+            indirect = scoring.indirect_scores(nlp_result)
+            line = {
+                "index": index,
+                "direct_percent": direct,
+                "indirect_percent": indirect,
+                "result": nlp_result,
+            }
+            if explain:
+                try:
+                    line["detail"] = (
+                        explain_templates.render(nlp_result, direct, indirect)
+                        or gpt_cliant.gpt_function(nlp_result, direct, indirect)
+                    )
+                except Exception as e:
+                    line["detail_error"] = str(e)
+            yield json.dumps(line, ensure_ascii=False) + "\n"
     except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"NLP解析でエラー: {str(e)}")
\ No newline at end of file
+        logger.exception("まとめて解析でエラーが発生しました")
+        yield json.dumps({"error": f"NLP解析でエラー: {str(e)}"}, ensure_ascii=False) + "\n"
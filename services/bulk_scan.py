@@ -0,0 +1,401 @@
+# bulk_scan.py
+"""
+投稿のアーカイブ（X のデータエクスポート・JSONL のダンプなど）をまとめて診断する CLI。
+
+入力を少しずつ読みながら（全件をメモリに載せない）--chunk-size 件ずつワーカープロセスに渡し、
+各ワーカーは nlp.pipe（tweet_diagnosis_many）で解析して score_many でスコアを付ける。
+結果は入力の順に少しずつ書き出し、書き出すたびにチェックポイントを保存するので、
+途中で止まっても --resume で続きから再開できる。
+
+入力の形式（--input-format。既定は拡張子から判断）
+- jsonl: 1 行 1 オブジェクト（.jsonl / .ndjson）
+- json : オブジェクトの配列（.json / .js）。X のデータエクスポートの tweets.js
+         （"window.YTD.tweets.part0 = [...]"）もそのまま読める
+- text : 1 行 1 投稿（それ以外）
+本文・ID は --text-field / --id-field（"tweet.full_text" のように . でたどれる）。
+指定しなければ text / full_text / tweet.full_text、id / id_str / tweet.id_str の順に探す。
+
+出力の形式（--output-format。既定は拡張子から判断）
+- jsonl  : 1 行 1 件 {"id", "direct_percent", "indirect_percent", "counts"}
+           （--entities で抽出したエンティティ "entities" も）
+- parquet: ディレクトリに part-00000.parquet, ... を書く。ラベルごとの個数はラベル名の列
+           （pyarrow が必要。--part-size 件ごとに 1 ファイル）
+
+チェックポイントは jsonl なら <出力>.checkpoint.json、parquet なら <出力>/checkpoint.json。
+
+実行方法（プロジェクト直下で）:
+    python -m services.bulk_scan posts.jsonl results.jsonl
+    python -m services.bulk_scan data/tweets.js results.jsonl --workers 8
+    python -m services.bulk_scan dump.jsonl results/ --output-format parquet --resume
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from nlp import logs
+from nlp.pipeline import get_nlp
+from nlp.processor import tweet_diagnosis_many
+from nlp.spans import RESULT_LABELS
+from services import scoring, worker_pool
+
+logger = logging.getLogger("bulk_scan")
+
+TEXT_FIELDS = ("text", "full_text", "tweet.full_text")
+ID_FIELDS = ("id", "id_str", "tweet.id_str")
+
+# json の配列を読む時に 1 度に読む文字数
+READ_CHARS = 1 << 20
+# 進み具合を表示する間隔（秒）
+PROGRESS_INTERVAL = 10
+
+
+# =============================
+# 入力
+# =============================
+def _field(obj, path):
+    for key in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _first_field(obj, paths):
+    for path in paths:
+        value = _field(obj, path)
+        if value is not None:
+            return value
+    return None
+
+
+def _read_lines(path, start):
+    """(この行の後ろのバイト位置, 行) を返す"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        for line in iter(f.readline, b""):
+            yield f.tell(), line.decode("utf-8").removeprefix("\ufeff").rstrip("\r\n")
+
+
+_SEPARATOR = re.compile(r"[\s,]*")
+
+
+def _read_json_array(path, start):
+    """
+    配列の要素を 1 つずつ (何番目まで読んだか, 要素) で返す。
+
+    全体を json.load せず、READ_CHARS ずつ読んで raw_decode するのでメモリは増えない。
+    配列の前の "window.YTD.tweets.part0 = " のような前置きは読み飛ばす。
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buf = f.read(READ_CHARS)
+        while "[" not in buf:
+            more = f.read(READ_CHARS)
+            if not more:
+                return
+            buf += more
+        pos = buf.index("[") + 1
+        index = 0
+        while True:
+            pos = _SEPARATOR.match(buf, pos).end()
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos == len(buf):
+                    raise ValueError
+                obj, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                # 要素が読んだ範囲の外まで続いている
+                more = f.read(READ_CHARS)
+                if not more:
+                    if pos < len(buf):
+                        raise
+                    return
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            index += 1
+            if index > start:
+                yield index, obj
+
+
+def read_records(path, input_format, start=0, done=0, text_fields=TEXT_FIELDS, id_fields=ID_FIELDS):
+    """
+    (入力の位置, ID, 本文) を 1 件ずつ返す。
+
+    入力の位置は、そこから読み直せば次の件から続けられる値
+    （jsonl / text はバイト位置、json は配列の何番目まで読んだか）。
+    ID が無い場合は、先頭から何件目か（done 件は読み終えている）を ID にする。
+    """
+    if input_format == "json":
+        items = _read_json_array(path, start)
+    elif input_format == "jsonl":
+        items = _parse_jsonl(_read_lines(path, start))
+    else:
+        items = ((offset, {"text": line}) for offset, line in _read_lines(path, start))
+
+    for number, (position, obj) in enumerate(items, done + 1):
+        text = _first_field(obj, text_fields)
+        record_id = _first_field(obj, id_fields)
+        yield position, number if record_id is None else record_id, text if isinstance(text, str) else ""
+
+
+def _parse_jsonl(lines):
+    for offset, line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield offset, json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("JSON として読めない行を飛ばしました（%d バイト目の前）", offset)
+
+
+def chunked(records, size):
+    """(最後の件の入力の位置, ID の並び, 本文の並び) にまとめる"""
+    ids, texts = [], []
+    for position, record_id, text in records:
+        ids.append(record_id)
+        texts.append(text)
+        if len(texts) >= size:
+            yield position, ids, texts
+            ids, texts = [], []
+    if texts:
+        yield position, ids, texts
+
+
+# =============================
+# 解析（ワーカー側）
+# =============================
+def _init_worker():
+    logging.getLogger().setLevel(logging.WARNING)
+    get_nlp()
+
+
+def analyze_chunk(ids, texts, with_entities=False):
+    """本文の並びを nlp.pipe で解析し、スコアを付けた行の並びを返す"""
+    results = [result for _, result in tweet_diagnosis_many(texts)]
+    direct, indirect = scoring.score_many(results)
+    rows = []
+    for record_id, result, d, i in zip(ids, results, direct.tolist(), indirect.tolist()):
+        row = {
+            "id": record_id,
+            "direct_percent": d,
+            "indirect_percent": int(i),
+            "counts": {label: count for label, (_, count) in result.items()},
+        }
+        if with_entities:
+            row["entities"] = result
+        rows.append(row)
+    return rows
+
+
+def analyze_chunks(chunks, workers, with_entities):
+    """(最後の件の入力の位置, 行の並び) を入力の順に返す。先に投げておくのは workers の 2 倍まで"""
+    if workers <= 1:
+        get_nlp()
+        for position, ids, texts in chunks:
+            yield position, analyze_chunk(ids, texts, with_entities)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=worker_pool.mp_context(), initializer=_init_worker
+    ) as executor:
+        pending = deque()
+        for position, ids, texts in chunks:
+            pending.append((position, executor.submit(analyze_chunk, ids, texts, with_entities)))
+            if len(pending) >= 2 * workers:
+                position, future = pending.popleft()
+                yield position, future.result()
+        while pending:
+            position, future = pending.popleft()
+            yield position, future.result()
+
+
+# =============================
+# 出力
+# =============================
+class JsonlWriter:
+    def __init__(self, path, state=None):
+        self.path = Path(path)
+        if state:
+            # チェックポイントより後ろに書かれた分は捨てて続きから書く
+            self._file = open(self.path, "r+b")
+            self._file.truncate(state["output_bytes"])
+            self._file.seek(state["output_bytes"])
+        else:
+            self._file = open(self.path, "wb")
+
+    def write(self, rows):
+        """書き出して、チェックポイントに残す状態を返す"""
+        self._file.write(b"".join(
+            json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n" for row in rows
+        ))
+        self._file.flush()
+        return {"output_bytes": self._file.tell()}
+
+    def close(self):
+        self._file.close()
+        return {"output_bytes": os.path.getsize(self.path)}
+
+
+class ParquetWriter:
+    def __init__(self, path, state=None, part_size=100_000, with_entities=False):
+        try:
+            import pyarrow  # 任意の依存
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("--output-format parquet には pyarrow が必要です（pip install pyarrow）")
+
+        self._pa = pyarrow
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.part_size = part_size
+        self.with_entities = with_entities
+        self.parts = state["parts"] if state else 0
+        self._rows = []
+
+    def write(self, rows):
+        """part_size 件たまったら 1 ファイル書き出して状態を返す（書き出さなければ None）"""
+        self._rows.extend(rows)
+        if len(self._rows) < self.part_size:
+            return None
+        return self._flush()
+
+    def _flush(self):
+        rows, self._rows = self._rows, []
+        columns = {
+            "id": [None if row["id"] is None else str(row["id"]) for row in rows],
+            "direct_percent": [row["direct_percent"] for row in rows],
+            "indirect_percent": [row["indirect_percent"] for row in rows],
+        }
+        for label in RESULT_LABELS:
+            columns[label] = [row["counts"].get(label, 0) for row in rows]
+        if self.with_entities:
+            columns["entities"] = [json.dumps(row["entities"], ensure_ascii=False) for row in rows]
+
+        table = self._pa.table(columns)
+        self._pa.parquet.write_table(table, self.path / f"part-{self.parts:05d}.parquet")
+        self.parts += 1
+        return {"parts": self.parts}
+
+    def close(self):
+        if self._rows:
+            self._flush()
+        return {"parts": self.parts}
+
+
+# =============================
+# チェックポイント
+# =============================
+class Checkpoint:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        # 書きかけのファイルが残らないように、別名で書いてから置き換える
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+# =============================
+# CLI
+# =============================
+def _guess_input_format(path):
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix in (".json", ".js"):
+        return "json"
+    return "text"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("input", help="入力ファイル")
+    ap.add_argument("output", help="出力ファイル（parquet の場合はディレクトリ）")
+    ap.add_argument("--input-format", choices=["jsonl", "json", "text"])
+    ap.add_argument("--output-format", choices=["jsonl", "parquet"])
+    ap.add_argument("--text-field", action="append", help="本文の項目（複数指定すると順に探す）")
+    ap.add_argument("--id-field", action="append", help="ID の項目（複数指定すると順に探す）")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="ワーカープロセス数（1 なら同じプロセスで解析）")
+    ap.add_argument("--chunk-size", type=int, default=256, help="1 度にワーカーに渡す件数")
+    ap.add_argument("--part-size", type=int, default=100_000, help="parquet の 1 ファイルの件数")
+    ap.add_argument("--entities", action="store_true", help="抽出したエンティティも出力する")
+    ap.add_argument("--resume", action="store_true", help="チェックポイントから続ける")
+    args = ap.parse_args(argv)
+
+    logs.configure("INFO", "%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    input_format = args.input_format or _guess_input_format(args.input)
+    output_format = args.output_format or ("parquet" if Path(args.output).suffix == "" else "jsonl")
+    if output_format == "parquet":
+        checkpoint = Checkpoint(Path(args.output) / "checkpoint.json")
+    else:
+        checkpoint = Checkpoint(args.output + ".checkpoint.json")
+
+    source = {"input": str(Path(args.input).resolve()), "input_format": input_format, "output_format": output_format}
+    state = checkpoint.load() if args.resume else None
+    if state is not None and state["source"] != source:
+        raise SystemExit(f"チェックポイントの入力・形式が違います: {state['source']}")
+    if state is not None and state.get("done"):
+        logger.info("完了済みです（%d 件）", state["records"])
+        return
+    if state is None:
+        checkpoint.remove()
+        state = {"source": source, "position": 0, "records": 0, "output": None, "done": False}
+    else:
+        logger.info("%d 件目の後ろから再開します", state["records"])
+
+    if output_format == "parquet":
+        writer = ParquetWriter(args.output, state["output"], args.part_size, args.entities)
+    else:
+        writer = JsonlWriter(args.output, state["output"])
+
+    records = read_records(
+        args.input, input_format, state["position"], state["records"],
+        tuple(args.text_field or TEXT_FIELDS), tuple(args.id_field or ID_FIELDS),
+    )
+    chunks = chunked(records, args.chunk_size)
+
+    started = last_report = time.perf_counter()
+    done, records_total = 0, state["records"]
+    for position, rows in analyze_chunks(chunks, args.workers, args.entities):
+        records_total += len(rows)
+        done += len(rows)
+        flushed = writer.write(rows)
+        if flushed is not None:
+            state.update(position=position, records=records_total, output=flushed)
+            checkpoint.save(state)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            logger.info("%d 件（%.1f 件/秒）", records_total, done / (now - started))
+            last_report = now
+
+    state.update(records=records_total, output=writer.close(), done=True)
+    if done:
+        state["position"] = position
+    checkpoint.save(state)
+    logger.info("完了: %d 件 → %s", records_total, args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
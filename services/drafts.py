@@ -0,0 +1,89 @@
+"""
+下書きの差分解析（/analyze/draft）。
+
+入力中の下書きは 1 文字ずつしか変わらないのに、毎回全文を解析し直すのは無駄なので、
+テキストを文に区切り、前回の解析から変わっていない文は結果をそのまま使う。
+変わった文（と新しい文）だけを spaCy・正規表現・日付・gazetteer にかけ、
+全体のスコアは組み直した結果から計算し直す。
+
+- 下書きごと（draft_id）に、前回の文のハッシュ → その文の EntitySpan の並び
+  （文の先頭からの位置）を LRU に置く。今回のテキストに無い文は捨てる
+- 文ごとに解析するので、文をまたぐエンティティは取れない（区切りは「。」「！」「？」と改行）
+
+設定（環境変数）
+- DRAFT_MAX_SESSIONS: 覚えておく下書きの数
+- DRAFT_TTL         : 最後の解析から下書きを忘れるまでの秒数
+"""
+
+import hashlib
+import os
+import threading
+
+from nlp.sentences import split_sentences
+from nlp.spans import EntitySpan
+from . import worker_pool
+from .result_cache import LRUCache
+
+# =============================
+# 設定
+# =============================
+DRAFT_MAX_SESSIONS = int(os.getenv("DRAFT_MAX_SESSIONS", "10000"))
+DRAFT_TTL = float(os.getenv("DRAFT_TTL", "1800"))
+
+_drafts = LRUCache(DRAFT_MAX_SESSIONS, DRAFT_TTL)
+
+_stats = {"requests": 0, "sentences": 0, "reused": 0}
+_stats_lock = threading.Lock()
+
+
+def _sentence_key(sentence):
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+
+
+def draft_spans(draft_id, text):
+    """
+    下書き draft_id の今回のテキストの EntitySpan の並びと、(文の数, 使い回した文の数) を返す。
+
+    前回の結果に無い文だけを worker_pool.diagnose_many でまとめて解析する。
+    """
+    previous = _drafts.get(draft_id) or {}
+    bounds = split_sentences(text)
+    keys = [_sentence_key(text[start:end]) for start, end in bounds]
+
+    current = {}
+    missing = {}     # 文のハッシュ → 文（同じ文が 2 回出てきても 1 回だけ解析する）
+    for key, (start, end) in zip(keys, bounds):
+        if key in previous:
+            current[key] = previous[key]
+        elif text[start:end].strip():
+            missing.setdefault(key, text[start:end])
+        else:
+            current[key] = []
+
+    if missing:
+        for key, spans in zip(missing, worker_pool.diagnose_many(list(missing.values()))):
+            current[key] = spans
+    _drafts.set(draft_id, current)
+
+    spans = [
+        EntitySpan(span.start + start, span.end + start, span.label, span.text, span.value, span.source)
+        for key, (start, _) in zip(keys, bounds)
+        for span in current[key]
+    ]
+    reused = len(bounds) - sum(1 for key in keys if key in missing)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["sentences"] += len(bounds)
+        _stats["reused"] += reused
+    return spans, len(bounds), reused
+
+
+def stats():
+    """文を使い回せた割合など"""
+    with _stats_lock:
+        sentences = _stats["sentences"]
+        return {
+            **_stats,
+            "drafts": len(_drafts),
+            "reuse_rate": _stats["reused"] / sentences if sentences else 0.0,
+        }
@@ -0,0 +1,149 @@
+"""
+よくある結果の形には、LLM を呼ばずにテンプレートで説明文を作るモジュール。
+
+build_result_dict の結果にどのラベルが含まれるか（= 形）と、
+scoring の直接・間接スコアの帯で文面を組み立てる。
+文体は gpt_cliant.get_app_info() のマスコット（一人称『わたし』・結論→理由→対策）に合わせる。
+
+対象外の形（情報の種類が多すぎる組み合わせ）や、
+呼び出し側が詳しい説明を求めた場合は None を返し、LLM に任せる。
+"""
+
+import threading
+from collections import Counter
+
+# 文面を変えたら上げる（説明文のキャッシュを無効にするため）
+TEMPLATE_VERSION = "1"
+
+# =============================
+# ラベルのまとまり
+# =============================
+# build_result_dict のラベル → 説明文で扱うまとまり
+LABEL_GROUPS = {
+    "phone": "contact",
+    "email": "contact",
+    "postal": "contact",
+    "person": "person",
+    "age": "age",
+    "date": "date",
+    "station": "place",
+    "hospital": "place",
+    "tourristspot": "place",
+    "place": "place",
+}
+
+# テンプレートで扱う、まとまりの種類数の上限（これを超える形は LLM に任せる）
+MAX_TEMPLATE_GROUPS = 2
+
+# 理由の文で使う呼び方（並び順 = 危険度の高い順）
+GROUP_WORDS = {
+    "contact": "連絡先（電話番号・メール・郵便番号）",
+    "person": "人の名前",
+    "age": "年齢",
+    "place": "場所",
+    "date": "日時",
+}
+
+# まとまりごとの対策
+GROUP_ADVICE = {
+    "contact": "連絡先は投稿から消して、必要ならDMで伝えるようにしようね。",
+    "person": "名前はイニシャルやニックネームにしておくと安心だよ。",
+    "age": "年齢は「20代」みたいにぼかすのがおすすめだよ。",
+    "place": "場所は「都内」くらいにぼかすか、帰ってから投稿してね。",
+    "date": "日時は予定が終わってから投稿すると安心だよ。",
+}
+
+
+# =============================
+# スコアの帯
+# =============================
+def score_band(score):
+    """0-100 のスコアを none / low / mid / high に分ける"""
+    if score <= 0:
+        return "none"
+    if score < 30:
+        return "low"
+    if score < 60:
+        return "mid"
+    return "high"
+
+
+CONCLUSIONS = {
+    "low": "わたしがチェックしたよ。少しだけ気をつけたいところがあるみたい。",
+    "mid": "わたしがチェックしたよ。このままだと、ちょっと心配なところがあるの。",
+    "high": "わたしがチェックしたよ。この投稿は、個人情報が伝わりやすい状態になっているの。",
+}
+
+SAFE_TEXT = (
+    "わたしがチェックしたよ！この投稿からは、あなたを特定できそうな情報は見つからなかったの。"
+    "このまま投稿して大丈夫そうだよ。"
+    "これからも、名前や場所・連絡先を書くときは、ちょっとだけ立ち止まって見直してみてね。"
+)
+
+
+# =============================
+# 利用状況
+# =============================
+_lock = threading.Lock()
+_counts = Counter()
+
+
+def _count(name):
+    with _lock:
+        _counts[name] += 1
+
+
+def stats():
+    """テンプレートで済んだ割合（トラフィックのうち LLM を省けた割合）"""
+    with _lock:
+        counts = dict(_counts)
+    template = counts.get("template", 0)
+    total = template + counts.get("llm_uncovered", 0) + counts.get("llm_rich", 0)
+    return {
+        "template": template,
+        "llm_uncovered": counts.get("llm_uncovered", 0),
+        "llm_rich": counts.get("llm_rich", 0),
+        "template_rate": template / total if total else 0.0,
+        "by_shape": {k[len("shape:"):]: v for k, v in sorted(counts.items()) if k.startswith("shape:")},
+    }
+
+
+# =============================
+# 説明文の組み立て
+# =============================
+def result_shape(nlp_result):
+    """結果に含まれるまとまりを危険度の高い順に返す"""
+    groups = {LABEL_GROUPS[label] for label in nlp_result if label in LABEL_GROUPS}
+    return [group for group in GROUP_WORDS if group in groups]
+
+
+def render(nlp_result, direct_scores, indirect_scores, rich=False):
+    """
+    テンプレートで説明文を作る。
+
+    rich=True の場合や、テンプレートで扱わない形の場合は None を返す
+    （呼び出し側で LLM を使う）。
+    """
+    if rich:
+        _count("llm_rich")
+        return None
+
+    shape = result_shape(nlp_result)
+    if len(shape) > MAX_TEMPLATE_GROUPS:
+        _count("llm_uncovered")
+        return None
+
+    _count("template")
+    _count("shape:" + ("+".join(shape) or "none"))
+
+    band = score_band(max(direct_scores, indirect_scores))
+    if not shape or band == "none":
+        return SAFE_TEXT
+
+    words = "と".join(GROUP_WORDS[group] for group in shape)
+    if len(shape) > 1:
+        reason = f"{words}が一緒に書かれていて、組み合わせるとあなたのことが分かっちゃうかもしれないの。"
+    else:
+        reason = f"{words}が書かれていて、そこからあなたのことが分かっちゃうかもしれないの。"
+    advice = "".join(GROUP_ADVICE[group] for group in shape)
+    return CONCLUSIONS[band] + reason + advice
@@ -1,9 +1,42 @@
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+import asyncio
+import logging
 import os
+import random
+import threading
+import httpx
 from dotenv import load_dotenv
 
+from nlp import logs
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 説明文のプロンプトを変えたら上げる（説明文のキャッシュを無効にするため）
+PROMPT_VERSION = "1"
+
+# =============================
+# 設定
+# =============================
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-5-mini")
+# OpenAI 互換サーバーの URL（空なら OpenAI 本家。ローカルの偽サーバーで試験する時に指定）
+LLM_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))              # 1 回の呼び出しの上限（秒）
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))         # 失敗時の再試行回数
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))       # 再試行の待ち時間の基準（秒）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # 同時に投げる呼び出し数の上限
+
+# 再試行する例外（一時的な失敗）
+RETRYABLE_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
 
 def get_app_info():
     return {
@@ -18,9 +51,9 @@ def get_app_info():
         )
     }
 
-def gpt_function(nlp_result, direct_scores, indirect_scores):
 
-    client = OpenAI(api_key=os.getenv("gpt_api_key"))
+def build_messages(nlp_result, direct_scores, indirect_scores):
+    """説明文を作らせるための messages を組み立てる"""
     app_info = get_app_info()
 
     prompt = f"""
@@ -36,20 +69,136 @@ def gpt_function(nlp_result, direct_scores, indirect_scores):
     出力は説明文のみ。
     """
 
-    response = client.chat.completions.create(
-        model="gpt-5-mini",
-        messages=[
-            {"role": "system", "content": f"""
-                あなたはTwitter,Xの投稿から個人情報が漏洩するリスクを診断するアプリの結果に使用する説明文を作成するプロのコピーライターです。
-                以下の検査結果をもとに、ユーザーにわかりやすく説明文を作成してください。
-                {nlp_result}
-                個人情報（直接）の割合: {direct_scores}%
-                個人情報（間接）の割合: {indirect_scores}%
-                """},
-            {"role": "user", "content": prompt}
-        ]
+    return [
+        {"role": "system", "content": f"""
+            あなたはTwitter,Xの投稿から個人情報が漏洩するリスクを診断するアプリの結果に使用する説明文を作成するプロのコピーライターです。
+            以下の検査結果をもとに、ユーザーにわかりやすく説明文を作成してください。
+            {nlp_result}
+            個人情報（直接）の割合: {direct_scores}%
+            個人情報（間接）の割合: {indirect_scores}%
+            """},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _backoff(attempt):
+    """attempt 回目の再試行までの待ち時間（指数バックオフ + ジッター）"""
+    return random.uniform(0, LLM_RETRY_BASE * (2 ** attempt))
+
+
+# =============================
+# 同期クライアント（/analyze/batch などスレッドから呼ぶ場合）
+# =============================
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """プロセスで共有する同期クライアント（接続を使い回す）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=os.getenv("gpt_api_key"),
+                    base_url=LLM_BASE_URL,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=LLM_MAX_RETRIES,
+                )
+    return _client
+
+
+def gpt_function(nlp_result, direct_scores, indirect_scores):
+
+    response = get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=build_messages(nlp_result, direct_scores, indirect_scores),
     )
 
-    print(response.choices[0].message.content)
+    content = response.choices[0].message.content
+    if logs.detail_enabled(logger):
+        logger.debug("説明文: %s", logs.redact(content))
+
+    return content
+
+
+# =============================
+# 非同期クライアント（/analyze・/analyze/stream）
+# =============================
+_async_client = None
+_semaphore = None
+
 
-    return response.choices[0].message.content
\ No newline at end of file
+def init_async_client():
+    """
+    非同期クライアントを作る（起動時に 1 度だけ呼ぶ）。
+
+    接続プールは httpx.AsyncClient に任せ、再試行は _with_retry で
+    ジッター付きで行うので、SDK 側の再試行は無効にする。
+    """
+    global _async_client, _semaphore
+    if _async_client is None:
+        _async_client = AsyncOpenAI(
+            api_key=os.getenv("gpt_api_key"),
+            base_url=LLM_BASE_URL,
+            timeout=LLM_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONCURRENCY,
+                    max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                ),
+            ),
+        )
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client, _semaphore
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+        _semaphore = None
+
+
+async def _with_retry(call):
+    """一時的な失敗は LLM_MAX_RETRIES 回まで待ってから再試行する"""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return await call()
+        except RETRYABLE_ERRORS:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(_backoff(attempt))
+
+
+async def gpt_function_async(nlp_result, direct_scores, indirect_scores):
+    """gpt_function の非同期版。同時実行数は LLM_MAX_CONCURRENCY までに抑える"""
+    client = init_async_client()
+    messages = build_messages(nlp_result, direct_scores, indirect_scores)
+
+    async with _semaphore:
+        response = await _with_retry(
+            lambda: client.chat.completions.create(model=LLM_MODEL, messages=messages)
+        )
+    return response.choices[0].message.content
+
+
+async def stream_explanation(nlp_result, direct_scores, indirect_scores):
+    """
+    説明文を生成しながら、届いた断片を順に返す非同期ジェネレーター。
+
+    再試行するのは最初の断片が届く前の失敗だけ（途中で失敗したら例外を投げる）。
+    """
+    client = init_async_client()
+    messages = build_messages(nlp_result, direct_scores, indirect_scores)
+
+    async with _semaphore:
+        stream = await _with_retry(
+            lambda: client.chat.completions.create(model=LLM_MODEL, messages=messages, stream=True)
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
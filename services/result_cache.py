@@ -0,0 +1,250 @@
+"""
+同じテキストの解析結果を再利用するためのキャッシュ。
+
+リポスト・引用・下書きの再チェックでは同じ文章が何度も届くので、
+テキストのハッシュをキーに tweet_diagnosis の結果と
+スコア + 説明文をキャッシュし、ヒットしたら NLP と OpenAI 呼び出しを省く。
+結果には文字位置（spans）を含むので、キーのテキストは正規化せず、そのまま使う
+（前後の空白や NFC の違いで位置がずれた結果を返さないように）。
+
+キーには次の値も含めるので、どれかが変わると自動的に別のキーになる。
+- NLP モデル・プロファイル（NLP_MODEL / NLP_PROFILE）
+- gazetteer ファイルのチェックサム
+- 説明文プロンプトのバージョン（gpt_cliant.PROMPT_VERSION、説明文のキャッシュのみ）
+
+構成
+- 1 段目: プロセス内の LRU（件数上限 + TTL）
+- 2 段目: 共有キャッシュ（任意）。sqlite（ローカル・複数ワーカーで共有）または redis
+
+設定（環境変数）
+- RESULT_CACHE_ENABLED    : "0" で無効化
+- RESULT_CACHE_MAX_ENTRIES: LRU の最大件数
+- RESULT_CACHE_TTL        : 有効期限（秒）
+- RESULT_CACHE_BACKEND    : 共有キャッシュ ""（なし）/ "sqlite" / "redis"
+- RESULT_CACHE_PATH       : sqlite のファイル
+- RESULT_CACHE_REDIS_URL  : redis の URL（redis パッケージが必要）
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# =============================
+# 設定
+# =============================
+CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") != "0"
+CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))
+CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "")
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "data/result_cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL") or "redis://localhost:6379/0"
+
+# キーの作り方のバージョン（変えたら上げる。以前のキーの共有キャッシュを使わないように）
+KEY_FORMAT = "exact-1"
+
+
+# =============================
+# キー
+# =============================
+def cache_key(text, *versions):
+    """テキスト（そのまま）とバージョン情報から sha256 のキーを作る"""
+    h = hashlib.sha256()
+    for part in (KEY_FORMAT, *versions):
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+# =============================
+# 1 段目: プロセス内 LRU
+# =============================
+class LRUCache:
+    """件数上限と TTL 付きの LRU キャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()   # key → (期限, 値)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+# =============================
+# 2 段目: 共有キャッシュ
+# =============================
+class SQLiteTier:
+    """sqlite ファイルに JSON で保存する共有キャッシュ（同じホストのワーカー間で共有）"""
+
+    PURGE_EVERY = 256  # この回数 set したら期限切れの行を消す
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sets = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, value TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires >= ?", (key, time.time())
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires, value) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, json.dumps(value, ensure_ascii=False)),
+            )
+            self._sets += 1
+            if self._sets % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+            self._conn.commit()
+
+
+class RedisTier:
+    """Redis（互換サーバー）に JSON で保存する共有キャッシュ"""
+
+    def __init__(self, url=CACHE_REDIS_URL, ttl=CACHE_TTL):
+        import redis  # 任意の依存
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self._client.set(key, json.dumps(value, ensure_ascii=False), ex=max(1, int(self.ttl)))
+
+
+def make_shared_tier(backend=CACHE_BACKEND):
+    if not backend:
+        return None
+    if backend == "sqlite":
+        return SQLiteTier()
+    if backend == "redis":
+        return RedisTier()
+    raise ValueError(f"未知のキャッシュバックエンドです: {backend}（sqlite / redis）")
+
+
+# =============================
+# 2 段構成のキャッシュ
+# =============================
+class ResultCache:
+    """
+    LRU → 共有キャッシュの順に探し、共有キャッシュでヒットしたら LRU にも載せる。
+
+    namespace ごとにキーを分けるので、1 つの共有キャッシュに複数種類の結果を置ける。
+    """
+
+    def __init__(self, namespace, shared=None):
+        self.namespace = namespace
+        self.local = LRUCache()
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.shared is not None:
+            value = self.shared.get(f"{self.namespace}:{key}")
+            if value is not None:
+                self._count("shared_hits")
+                self.local.set(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(f"{self.namespace}:{key}", value)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self.local),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_shared = None
+
+
+def get_cache(namespace):
+    """namespace ごとの共有 ResultCache を返す（無効化されている場合は None）"""
+    global _shared
+    if not CACHE_ENABLED:
+        return None
+    cache = _caches.get(namespace)
+    if cache is None:
+        with _caches_lock:
+            if namespace not in _caches:
+                if _shared is None and CACHE_BACKEND:
+                    _shared = make_shared_tier()
+                _caches[namespace] = ResultCache(namespace, _shared)
+            cache = _caches[namespace]
+    return cache
+
+
+def cache_stats():
+    if not CACHE_ENABLED:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "backend": CACHE_BACKEND or "memory",
+        "caches": {name: cache.stats() for name, cache in _caches.items()},
+    }
@@ -1,82 +1,132 @@
+# scoring.py
+"""
+直接・間接スコアの計算。
+
+重みは scoring.yml（SCORING_CONFIG で変更可）から読み込む。
+複数の結果は個数の行列（ラベル × 文書）にして NumPy でまとめて計算し（score_many）、
+1 件の direct_scores / indirect_scores も同じ計算を 1 列の行列で行う。
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from nlp import logs
+
+logger = logging.getLogger(__name__)
+
+# =============================
+# 設定
+# =============================
+SCORING_CONFIG = Path(os.getenv("SCORING_CONFIG") or Path(__file__).with_name("scoring.yml"))
+
+
+class ScoringConfig:
+    """scoring.yml の内容を、個数の行列に掛けられる形にしたもの"""
+
+    def __init__(self, config):
+        direct, indirect = config["direct"], config["indirect"]
+        self.direct_labels = list(direct["weights"])
+        self.indirect_labels = list(indirect["labels"])
+        # 行列の行の並び（直接 → 間接の順。重複は 1 行にまとめる）
+        self.labels = tuple(dict.fromkeys(self.direct_labels + self.indirect_labels))
+        self.index = {label: i for i, label in enumerate(self.labels)}
+
+        self.direct_weights = np.array([direct["weights"].get(label, 0) for label in self.labels], dtype=np.float64)
+        self.direct_cap = float(direct["cap"])
+        self.indirect_mask = np.array([label in self.indirect_labels for label in self.labels], dtype=np.float64)
+        self.indirect_base = float(indirect["base_weight"])
+        self.indirect_exponent = float(indirect["exponent"])
+        self.indirect_cap = float(indirect["cap"])
+
+
+def load_config(path=SCORING_CONFIG):
+    """(ScoringConfig, 設定ファイルのハッシュ) を返す"""
+    raw = Path(path).read_bytes()
+    return ScoringConfig(yaml.safe_load(raw)), hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+# 設定ファイルのハッシュは、解析結果のキャッシュキーに使う
+CONFIG, CONFIG_VERSION = load_config()
+
+
+# =============================
+# まとめて計算
+# =============================
+def count_matrix(nlp_results, config=CONFIG):
+    """結果 {"label": [list, count]} の並びから個数の行列（ラベル × 文書）を作る"""
+    rows, cols, values = [], [], []
+    index = config.index
+    for j, nlp_result in enumerate(nlp_results):
+        for label, result_value in nlp_result.items():
+            i = index.get(label)
+            if i is not None and result_value and isinstance(result_value, list) and len(result_value) >= 2:
+                rows.append(i)
+                cols.append(j)
+                values.append(result_value[1])
+
+    counts = np.zeros((len(config.labels), len(nlp_results)), dtype=np.float64)
+    counts[rows, cols] = values
+    return counts
+
+
+def direct_matrix(counts, config=CONFIG):
+    """直接スコア = min(Σ 個数 × 重み, 上限)（文書ごと）"""
+    return np.minimum(config.direct_weights @ counts, config.direct_cap)
+
+
+def indirect_matrix(counts, config=CONFIG):
+    """間接スコア = 切り捨て(min(基準 × 個数の合計 ** 指数, 上限))（文書ごと）"""
+    total = config.indirect_mask @ counts
+    raw = config.indirect_base * np.power(total, config.indirect_exponent)
+    return np.floor(np.minimum(raw, config.indirect_cap))
+
+
+def score_many(nlp_results, config=CONFIG):
+    """複数の結果の (直接スコアの配列, 間接スコアの配列) を返す"""
+    counts = count_matrix(nlp_results, config)
+    return direct_matrix(counts, config), indirect_matrix(counts, config)
+
+
+# =============================
+# 1 件
+# =============================
+def _number(value):
+    """整数になる値は int で返す（応答の JSON を従来と同じ形にする）"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
 
 # 直接的スコア計算
 def direct_scores(nlp_result):
-    weights = {
-        "phone": 35,
-        "email": 30,
-        "person": 15,
-        "postal": 40,
-        "date": 10,
-        "age": 5
-    }
-    target_labels = ["phone", "email", "person", "postal", "date", "age"]
-    total_raw_score = 0
-    
-    # --- デバッグ用PRINT ---
-    print("--- direct_scores デバッグ開始 ---")
-    print(f"入力データ: {nlp_result}")
-    
-    for label in target_labels:
-        result_value = nlp_result.get(label)
-        
-        if result_value and isinstance(result_value, list) and len(result_value) >= 2:
-            count = result_value[1]
-        else:
-            count = 0
-            
-        weight = weights.get(label, 0)
-        total_raw_score += count * weight
-        
-        # --- デバッグ用PRINT ---
-        print(f"ラベル: '{label}', 個数: {count}, 重み: {weight}, 現在の合計スコア: {total_raw_score}")
-
-    final_score = min(total_raw_score, 100)
-    
-    # --- デバッグ用PRINT ---
-    print(f"最終的な生スコア: {total_raw_score}")
-    print(f"最終スコア (上限100): {final_score}")
-    print("--- direct_scores デバッグ終了 ---\n")
-    
+    counts = count_matrix([nlp_result])
+    final_score = _number(direct_matrix(counts)[0])
+
+    if logs.detail_enabled(logger):
+        logger.debug(
+            "direct_scores 個数: %s, 最終スコア (上限%s): %s",
+            _counts(nlp_result, CONFIG.direct_labels), _number(CONFIG.direct_cap), final_score,
+        )
+
     return final_score
 
 # 間接的スコア計算
 def indirect_scores(nlp_result):
-    base_weight = 10
-    exponent = 1.5
-    target_labels = ["station", "hospital", "tourristspot", "place", "date"]
-    
-    total_indirect_count = 0
-    
-    # --- デバッグ用PRINT ---
-    print("--- indirect_scores デバッグ開始 ---")
-    print(f"入力データ: {nlp_result}")
-    
-    for label in target_labels:
-        result_value = nlp_result.get(label)
-        
-        if result_value and isinstance(result_value, list) and len(result_value) >= 2:
-            count = result_value[1]
-        else:
-            count = 0
-            
-        total_indirect_count += count
-        
-        # --- デバッグ用PRINT ---
-        print(f"ラベル: '{label}', 個数: {count}, 現在の合計個数: {total_indirect_count}")
-
-    # --- デバッグ用PRINT ---
-    print(f"最終的な合計個数: {total_indirect_count}")
-
-    if total_indirect_count == 0:
-        print("--- indirect_scores デバッグ終了 ---\n")
-        return 0
-    
-    raw_score = base_weight * (total_indirect_count ** exponent)
-    final_score = min(raw_score, 100) # スコアの上限を100に設定
-
-    # --- デバッグ用PRINT ---
-    print(f"最終的な生スコア: {raw_score}")
-    print(f"最終スコア (上限100): {final_score}")
-    print("--- indirect_scores デバッグ終了 ---\n")
-    
-    return int(final_score)
\ No newline at end of file
+    counts = count_matrix([nlp_result])
+    final_score = int(indirect_matrix(counts)[0])
+
+    if logs.detail_enabled(logger):
+        logger.debug(
+            "indirect_scores 個数: %s, 最終スコア (上限%s): %s",
+            _counts(nlp_result, CONFIG.indirect_labels), _number(CONFIG.indirect_cap), final_score,
+        )
+
+    return final_score
+
+def _counts(nlp_result, labels):
+    """デバッグ用: ラベルごとの個数（抽出したテキストはログに出さない）"""
+    return {label: nlp_result[label][1] for label in labels if label in nlp_result}
@@ -0,0 +1,172 @@
+"""
+tweet_spans（tweet_diagnosis の位置付き版）を別プロセスのワーカーで実行するためのモジュール。
+
+既定（NLP_EXECUTION_MODE=thread）では FastAPI のスレッドプールで解析するが、
+spaCy/Sudachi・正規表現・gazetteer・dateparser は GIL で直列化されるため
+スレッドを増やしてもスループットは伸びない。
+NLP_EXECUTION_MODE=process にすると、起動済みのワーカープロセスで解析する。
+
+- モデルは forkserver の親プロセスで 1 度だけ読み込み、各ワーカーは fork して
+  コピーオンライトで共有する（forkserver が使えない環境では各ワーカーで読み込む）
+- 実行中 + 待ち行列の件数が上限に達したら PoolSaturated を投げる（/analyze は 429）
+- 各ワーカーは NLP_POOL_MAX_TASKS_PER_CHILD 件処理したら入れ替える（メモリ増加対策）
+
+設定（環境変数）
+- NLP_EXECUTION_MODE          : "thread"（既定）または "process"
+- NLP_POOL_WORKERS            : ワーカープロセス数（既定は CPU コア数）
+- NLP_POOL_MAX_QUEUE          : 実行中の分とは別に待たせられる件数
+- NLP_POOL_MAX_TASKS_PER_CHILD: ワーカーを入れ替えるまでの処理件数
+"""
+
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from nlp.processor import tweet_spans, tweet_spans_many
+
+# =============================
+# 設定
+# =============================
+EXECUTION_MODE = os.getenv("NLP_EXECUTION_MODE", "thread")
+# 空の値（.env の「NLP_POOL_WORKERS=」）は未設定として既定値を使う
+POOL_WORKERS = int(os.getenv("NLP_POOL_WORKERS") or os.cpu_count() or 1)
+POOL_MAX_QUEUE = int(os.getenv("NLP_POOL_MAX_QUEUE") or 2 * POOL_WORKERS)
+POOL_MAX_TASKS_PER_CHILD = int(os.getenv("NLP_POOL_MAX_TASKS_PER_CHILD") or 1000)
+
+# forkserver の親プロセスで読み込んでおくモジュール（import 時にモデルを読み込む）
+PRELOAD_MODULE = "services.worker_preload"
+
+
+class PoolSaturated(Exception):
+    """ワーカーも待ち行列も埋まっていて、これ以上受け付けられない"""
+
+
+# =============================
+# ワーカー側
+# =============================
+def _init_worker():
+    """ワーカー起動時に 1 度だけ呼ばれる。モデルを準備してウォームアップする"""
+    from nlp import batcher
+    from nlp.pipeline import get_nlp
+
+    # ワーカー内の解析は 1 件ずつなので、まとめ処理の待ち時間は無駄になる
+    batcher.BATCH_ENABLED = False
+    get_nlp()("ウォームアップ")
+
+
+def _run_diagnosis(tweet):
+    return tweet_spans(tweet)
+
+
+def _run_diagnosis_many(tweets):
+    return [spans for _, spans in tweet_spans_many(tweets)]
+
+
+# =============================
+# 親プロセス側
+# =============================
+def mp_context():
+    """forkserver が使えればモデルを先読みさせて使う。使えなければ spawn"""
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload([PRELOAD_MODULE])
+        return ctx
+    return mp.get_context("spawn")
+
+
+class DiagnosisPool:
+    """上限付きの待ち行列を持つ ProcessPoolExecutor のラッパー"""
+
+    def __init__(self, workers=POOL_WORKERS, max_queue=POOL_MAX_QUEUE, max_tasks_per_child=POOL_MAX_TASKS_PER_CHILD):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, max_queue)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp_context(),
+            initializer=_init_worker,
+            max_tasks_per_child=max_tasks_per_child or None,
+        )
+
+    def warm_up(self):
+        """全ワーカーを起動させ、モデルの準備が終わるまで待つ"""
+        futures = [self._executor.submit(_run_diagnosis, "") for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, tweet):
+        """解析を依頼して Future を返す。空きが無ければ PoolSaturated"""
+        return self._submit(_run_diagnosis, tweet)
+
+    def submit_many(self, tweets):
+        """
+        複数のテキストの解析を 1 件分の枠で 1 つのワーカーに依頼し、Future を返す。
+
+        結果は入力順の EntitySpan の並びのリスト。空きが無ければ PoolSaturated。
+        """
+        return self._submit(_run_diagnosis_many, list(tweets))
+
+    def _submit(self, fn, arg):
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated(f"解析待ちが上限（{self.capacity} 件）に達しています")
+        try:
+            future = self._executor.submit(fn, arg)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_mode():
+    return EXECUTION_MODE == "process"
+
+
+def get_pool():
+    """共有の DiagnosisPool を返す（最初の呼び出しで起動する）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DiagnosisPool()
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def diagnose(tweet):
+    """
+    実行モードに応じて tweet_spans を実行し、EntitySpan の並びを返す。
+
+    process モードではワーカーの結果を待って返す。
+    空きが無い場合は PoolSaturated を投げる。
+    """
+    if not process_mode():
+        return tweet_spans(tweet)
+    return get_pool().submit(tweet).result()
+
+
+def diagnose_many(tweets):
+    """
+    複数のテキストの EntitySpan の並びを入力順に返す。
+
+    thread モードでは nlp.pipe でまとめて解析し、process モードでは 1 つのワーカーに
+    まとめて依頼する（待ち行列の枠は件数に関係なく 1 つだけ使う。空きが無ければ PoolSaturated）。
+    """
+    if not process_mode():
+        return _run_diagnosis_many(tweets)
+    return get_pool().submit_many(tweets).result()
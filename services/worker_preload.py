@@ -0,0 +1,13 @@
+"""
+forkserver の親プロセスで import されるモジュール。
+
+import した時点で spaCy モデルと gazetteer を読み込んでおくことで、
+そこから fork される各ワーカーがモデルをコピーオンライトで共有できる。
+（services.worker_pool 以外から import しないこと）
+"""
+
+from nlp.gazeteer import get_index
+from nlp.pipeline import get_nlp
+
+get_nlp()
+get_index()